@@ -1,16 +1,21 @@
 from __future__ import annotations
 
-import base64
 import json
 import logging
+import threading
 import time
-from typing import Callable, Dict, List, Optional, Tuple
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple, Union
 
 from PySide6.QtCore import QObject, Signal
 
 from Core.routing.message_router import MessageRouter
 from Core.models.message import Message
 from Core.models.peer_info import PeerInfo
+from Core.models.message_view import MessageViewCache
+from Core.models.change import (
+    Change, ChangeFeed, CONVERSATION_UPDATED, PEER_ADDED, PEER_REMOVED, PEER_STATUS, PEER_UPDATED,
+)
 from Core.call.call_manager import CallManager, CallType, CallState
 
 log = logging.getLogger(__name__)
@@ -28,6 +33,11 @@ class CoreSignals(QObject):
     call_rejected = Signal(str)
     call_ended = Signal(str)
     remote_video_frame = Signal(bytes)
+    
+    file_transfer_progress = Signal(str, str, object, object)
+    message_status_changed = Signal(str, str, str)
+    thumbnail_ready = Signal(str, str)
+    changes_available = Signal()
 
 def _format_time(ts: float) -> str:
     return time.strftime("%H:%M", time.localtime(ts))
@@ -42,13 +52,21 @@ class ChatCore:
         username: str,
         display_name: str,
         tcp_port: int,
+        listener_mode: Optional[str] = None,
+        thumbnail_encoder: Optional[Callable[[Path, Path], bool]] = None,
     ):
         
         self.username = username
         self.display_name = display_name
         self.tcp_port = tcp_port
+        self.listener_mode = listener_mode
+        self.thumbnail_encoder = thumbnail_encoder
         
         self.signals = CoreSignals()
+        self.changes = ChangeFeed()
+        self.message_views = MessageViewCache()
+        self._peer_states: Dict[str, Dict] = {}
+        self._peer_states_lock = threading.Lock()
 
         self.router = MessageRouter()
         self.peer_id = self.router.peer_id
@@ -64,6 +82,7 @@ class ChatCore:
             return
         
         self.router.set_peer_callback(self._handle_peer_update)
+        self.router.set_peer_removed_callback(self._handle_peer_removed)
         self.router.set_friend_request_callback(self._handle_friend_request)
         self.router.set_friend_accepted_callback(self._handle_friend_accepted)
         self.router.set_friend_rejected_callback(self._handle_friend_rejected)
@@ -72,8 +91,13 @@ class ChatCore:
         self.router.set_call_accept_callback(self._handle_call_accept)
         self.router.set_call_reject_callback(self._handle_call_reject)
         self.router.set_call_end_callback(self._handle_call_end)
+        self.router.set_file_progress_callback(self._handle_file_progress)
+        self.router.set_message_status_callback(self._handle_message_status)
+        self.router.set_thumbnail_callback(self._handle_thumbnail_ready)
+        self.router.set_thumbnail_encoder(self.thumbnail_encoder)
         
-        self.router.connect_core(self.username, self.display_name, self.tcp_port, self._handle_router_message)
+        self.router.connect_core(self.username, self.display_name, self.tcp_port, self._handle_router_message,
+                                 listener_mode=self.listener_mode)
         
         self.peer_id = self.router.peer_id
         self.tcp_port = self.router.tcp_port
@@ -96,19 +120,86 @@ class ChatCore:
 
     def send_message(self, peer_id: str, content: str, msg_type: str = "text", 
                      file_name: str = None, file_data: str = None, audio_data: str = None) -> bool:
-        success, message = self.router.send_message(peer_id, content, msg_type=msg_type, 
-                                                     file_name=file_name, file_data=file_data, audio_data=audio_data)
-        if success and message:
-            self._emit_message(message)
-        return success
+        if msg_type in ("file", "image") and file_data and file_name:
+            file_path = self.router.store_inline_attachment(peer_id, file_name, file_data)
+            return bool(file_path) and self.send_file(peer_id, file_path, msg_type=msg_type, content=content,
+                                                      file_name=file_name)
+        message = self.router.queue_message(peer_id, content, msg_type=msg_type, 
+                                            file_name=file_name, file_data=file_data, audio_data=audio_data)
+        if not message:
+            return False
+        self._emit_message(message, status="pending")
+        return True
+
+    def send_file(self, peer_id: str, file_path: str, msg_type: str = "file", content: str = "",
+                  file_name: str = None) -> bool:
+        message = self.router.queue_file(peer_id, file_path, msg_type=msg_type, content=content, file_name=file_name)
+        if not message:
+            return False
+        if msg_type == "image":
+            self.router.data_manager.request_file_thumbnail(file_path)
+        self._emit_message(message, status="pending", local_file_path=file_path)
+        return True
 
     def get_known_peers(self) -> List[Dict]:
         peers = self.router.get_known_peers()
         return [self._peer_to_dict(peer) for peer in peers]
 
-    def get_message_history(self, peer_id: str) -> List[Dict]:
-        history = self.router.get_message_history(peer_id)
-        return [self._message_to_dict(msg) for msg in history]
+    def get_conversations(self) -> List[Dict]:
+        summaries = self.router.get_conversation_summaries()
+        conversations = [self._conversation_to_dict(peer, summaries.get(peer.peer_id) or {})
+                         for peer in self.router.get_known_peers()]
+        conversations.sort(key=lambda c: c["last_message_time"], reverse=True)
+        return conversations
+
+    def get_changes(self, since: int) -> Tuple[int, Optional[List[Change]]]:
+        return self.changes.since(since)
+
+    def remove_peer(self, peer_id: str) -> bool:
+        return self.router.remove_peer(peer_id)
+
+    def mark_conversation_read(self, peer_id: str):
+        self.router.mark_conversation_read(peer_id)
+        self._publish_conversation(peer_id)
+
+    def search_messages(self, query: str, peer_id: Optional[str] = None) -> List[Dict]:
+        peers = {peer.peer_id: peer for peer in self.router.get_known_peers()}
+        results = []
+        for hit in self.router.search_messages(query, peer_id):
+            peer = peers.get(hit["peer_id"])
+            if not peer:
+                continue
+            results.append({
+                "peer_id": hit["peer_id"],
+                "peer_name": peer.display_name or "Unknown",
+                "message_id": hit["message_id"],
+                "text": hit["text"],
+                "timestamp": hit["timestamp"],
+                "time_str": f"{_format_date(hit['timestamp'])} {_format_time(hit['timestamp'])}",
+            })
+        return results
+
+    def get_message_history(self, peer_id: str, before: Union[str, float, None] = None,
+                            limit: Optional[int] = None) -> List[Dict]:
+        page_key = (before, limit)
+        version = self.router.get_history_version(peer_id)
+        history = self.message_views.get_page(peer_id, page_key, version)
+        if history is None:
+            history = [self._message_view(msg) for msg in self.router.get_message_history(peer_id, before, limit)]
+            self.message_views.put_page(peer_id, page_key, version, history)
+        else:
+            for record in history:
+                self._refresh_view(record)
+        if before is not None:
+            return history
+        for item in self.router.get_pending_messages(peer_id):
+            payload = self._message_to_dict(item.message)
+            self._request_thumbnail(payload)
+            payload["status"] = item.status
+            if item.file_path:
+                payload["local_file_path"] = item.file_path
+            history.append(payload)
+        return history
     
     def add_peer_by_ip(self, ip: str, port: int, display_name: str = "Unknown") -> Tuple[bool, Optional[str]]:
         return self.router.add_peer_by_ip(ip, port, display_name)
@@ -307,15 +398,75 @@ class ChatCore:
         
         self._emit_message(message)
 
-    def _emit_message(self, message: Message):
+    def _emit_message(self, message: Message, status: str = None, local_file_path: str = None):
         
-        payload = self._message_to_dict(message)
+        if status:
+            payload = self._message_to_dict(message)
+            self._request_thumbnail(payload)
+        else:
+            payload = self._message_view(message)
+        if status:
+            payload["status"] = status
+        if local_file_path:
+            payload["local_file_path"] = local_file_path
+            if not payload.get("thumbnail_key"):
+                payload["thumbnail_key"] = local_file_path
         self.signals.message_received.emit(payload)
+        self._publish_conversation(payload["peer_id"])
+
+    def _handle_message_status(self, peer_id: str, message_id: str, status: str):
+        
+        self.message_views.invalidate(peer_id, message_id)
+        self.signals.message_status_changed.emit(peer_id, message_id, status)
+        self._publish_conversation(peer_id)
+
+    def _handle_thumbnail_ready(self, key: str, thumbnail_path: str):
+        
+        self.message_views.set_thumbnail(key, thumbnail_path)
+        self.signals.thumbnail_ready.emit(key, thumbnail_path)
+
+    def _handle_file_progress(self, peer_id: str, transfer_id: str, done: int, total: int):
+        
+        self.signals.file_transfer_progress.emit(peer_id, transfer_id, done, total)
 
     def _handle_peer_update(self, peer_info: PeerInfo):
         
         peer_dict = self._peer_to_dict(peer_info)
         self.signals.peer_updated.emit(peer_dict)
+        
+        with self._peer_states_lock:
+            previous = self._peer_states.get(peer_info.peer_id)
+            self._peer_states[peer_info.peer_id] = peer_dict
+        if previous == peer_dict:
+            return
+        if previous is None:
+            kind = PEER_ADDED
+        elif dict(previous, status=peer_dict["status"]) == peer_dict:
+            kind = PEER_STATUS
+        else:
+            kind = PEER_UPDATED
+        data = {"peer": peer_dict}
+        if kind != PEER_STATUS:
+            data["conversation"] = self._conversation_for(peer_info)
+        self._publish(kind, peer_info.peer_id, data)
+
+    def _handle_peer_removed(self, peer_id: str):
+        
+        with self._peer_states_lock:
+            self._peer_states.pop(peer_id, None)
+        self.message_views.invalidate(peer_id)
+        self._publish(PEER_REMOVED, peer_id)
+
+    def _publish_conversation(self, peer_id: str):
+        
+        peer = self.router._peers.get(peer_id) if self.router else None
+        if peer:
+            self._publish(CONVERSATION_UPDATED, peer_id, {"conversation": self._conversation_for(peer)})
+
+    def _publish(self, kind: str, peer_id: str, data: Optional[Dict] = None):
+        
+        if self.changes.publish(kind, peer_id, data):
+            self.signals.changes_available.emit()
     
     def _handle_friend_request(self, peer_id: str, display_name: str):
         
@@ -339,45 +490,105 @@ class ChatCore:
             "avatar_path": peer.avatar_path,
         }
 
-    def _message_to_dict(self, message: Message) -> Dict:
+    def _conversation_for(self, peer: PeerInfo) -> Dict:
+        return self._conversation_to_dict(peer, self.router.get_conversation_summary(peer.peer_id) or {})
+
+    def _conversation_to_dict(self, peer: PeerInfo, summary: Dict) -> Dict:
+        last_message = summary.get("last_message", "")
+        last_time = summary.get("last_message_time", 0)
+        pending = self.router.get_pending_messages(peer.peer_id)
+        if pending and pending[-1].message.timestamp > last_time:
+            last_message = pending[-1].text or pending[-1].message.file_name or ""
+            last_time = pending[-1].message.timestamp
+        return {
+            "peer_id": peer.peer_id,
+            "peer_name": peer.display_name or "Unknown",
+            "last_message": last_message,
+            "last_message_time": last_time,
+            "time_str": _format_time(last_time) if last_time else "",
+            "unread_count": summary.get("unread_count", 0),
+            "is_online": peer.status == "online",
+            "avatar_path": peer.avatar_path,
+        }
+
+    def _message_view(self, message: Message) -> Dict:
         is_sender = bool(self.peer_id and message.sender_id == self.peer_id)
-        
         peer_id = message.receiver_id if is_sender else message.sender_id
-        
-        local_file_path = None
+        record = self.message_views.get(peer_id, message.message_id)
+        if record is None:
+            record = self._message_to_dict(message)
+            self.message_views.put(peer_id, record)
+            self._request_thumbnail(record)
+        else:
+            self._refresh_view(record)
+        return record
 
-        try:
-            if getattr(message, "file_name", None) and self.router and self.router.data_manager:
-                files_dir = self.router.data_manager.get_peer_files_dir(peer_id)
-                candidate = files_dir / message.file_name
+    def _refresh_view(self, record: Dict):
+        if not record["is_sender"]:
+            record["peer_avatar_path"] = self._peer_avatar_path(record["peer_id"])
+        if record["msg_type"] != "image" or record["thumbnail_path"] or not record["blob_hash"]:
+            return
+        data_manager = self.router.data_manager if self.router else None
+        thumbnail = data_manager.get_thumbnail_path(record["blob_hash"]) if data_manager else None
+        if thumbnail:
+            record["thumbnail_path"] = str(thumbnail)
+            self.message_views.set_thumbnail(record["thumbnail_key"], record["thumbnail_path"])
 
-                if not candidate.exists() and getattr(message, "file_data", None):
-                    try:
-                        file_bytes = base64.b64decode(message.file_data)
-                        candidate = self.router.data_manager.save_file_for_peer(peer_id, message.file_name, file_bytes)
-                    except Exception:
-                        candidate = files_dir / message.file_name
+    def _request_thumbnail(self, record: Dict):
+        if record["msg_type"] != "image" or record["thumbnail_path"] or not record["local_file_path"]:
+            return
+        data_manager = self.router.data_manager if self.router else None
+        if not data_manager:
+            return
+        try:
+            if record["blob_hash"]:
+                data_manager.request_thumbnail(record["blob_hash"])
+            else:
+                data_manager.request_file_thumbnail(record["local_file_path"])
+        except Exception as e:
+            log.warning("Failed to request thumbnail for %s: %s", record["message_id"], e)
 
-                if candidate.exists():
-                    local_file_path = str(candidate)
-        except Exception:
-            pass
+    def _peer_avatar_path(self, peer_id: str) -> Optional[str]:
+        peer_info = self.router._peers.get(peer_id) if self.router else None
+        return peer_info.avatar_path if peer_info else None
 
+    def _message_to_dict(self, message: Message) -> Dict:
+        is_sender = bool(self.peer_id and message.sender_id == self.peer_id)
+        
+        peer_id = message.receiver_id if is_sender else message.sender_id
+        
         content = message.content
-        peer_avatar_path = None
+        blob_hash = None
         
         if message.msg_type in ("text", "image", "file") and content:
             try:
                 content_data = json.loads(content)
                 if isinstance(content_data, dict) and "text" in content_data:
                     content = content_data["text"]
+                    blob_hash = content_data.get("blob_hash")
             except (json.JSONDecodeError, ValueError, TypeError):
                 pass
         
-        if not is_sender:
-            peer_info = self.router._peers.get(peer_id) if self.router else None
-            if peer_info:
-                peer_avatar_path = peer_info.avatar_path
+        local_file_path = None
+        thumbnail_path = None
+        thumbnail_key = None
+        data_manager = self.router.data_manager if self.router else None
+        try:
+            if blob_hash and data_manager:
+                blob_path = data_manager.get_attachment_path(blob_hash)
+                if blob_path:
+                    local_file_path = str(blob_path)
+            elif getattr(message, "file_name", None) and data_manager:
+                candidate = data_manager.get_peer_files_dir(peer_id) / message.file_name
+                if candidate.exists():
+                    local_file_path = str(candidate)
+            if message.msg_type == "image" and local_file_path:
+                thumbnail_key = blob_hash or local_file_path
+                thumbnail = data_manager.get_thumbnail_path(blob_hash) if blob_hash else None
+                if thumbnail:
+                    thumbnail_path = str(thumbnail)
+        except Exception:
+            pass
 
         return {
             "message_id": message.message_id,
@@ -391,8 +602,9 @@ class ChatCore:
             "is_sender": is_sender,
             "msg_type": message.msg_type,
             "file_name": getattr(message, 'file_name', None),
-            "file_data": getattr(message, 'file_data', None),
-            "audio_data": getattr(message, 'audio_data', None),
+            "blob_hash": blob_hash,
             "local_file_path": local_file_path,
-            "peer_avatar_path": peer_avatar_path,
+            "thumbnail_path": thumbnail_path,
+            "thumbnail_key": thumbnail_key,
+            "peer_avatar_path": None if is_sender else self._peer_avatar_path(peer_id),
         }
@@ -0,0 +1,53 @@
+from __future__ import annotations
+
+import threading
+from collections import deque
+from dataclasses import dataclass, field
+from itertools import islice
+from typing import Deque, Dict, List, Optional, Tuple
+
+from Core.utils import config
+
+PEER_ADDED = "peer_added"
+PEER_UPDATED = "peer_updated"
+PEER_STATUS = "peer_status"
+PEER_REMOVED = "peer_removed"
+CONVERSATION_UPDATED = "conversation_updated"
+
+@dataclass(frozen=True)
+class Change:
+    version: int
+    kind: str
+    peer_id: str
+    data: Dict = field(default_factory=dict)
+
+class ChangeFeed:
+
+    def __init__(self, size: int = config.CHANGE_FEED_SIZE):
+        self._lock = threading.Lock()
+        self._changes: Deque[Change] = deque(maxlen=size)
+        self._version = 0
+        self._unread = False
+
+    @property
+    def version(self) -> int:
+        with self._lock:
+            return self._version
+
+    def publish(self, kind: str, peer_id: str, data: Optional[Dict] = None) -> bool:
+        with self._lock:
+            self._version += 1
+            self._changes.append(Change(self._version, kind, peer_id, data or {}))
+            notify = not self._unread
+            self._unread = True
+            return notify
+
+    def since(self, version: int) -> Tuple[int, Optional[List[Change]]]:
+        with self._lock:
+            self._unread = False
+            if version >= self._version:
+                return self._version, []
+            oldest = self._changes[0].version if self._changes else self._version + 1
+            if version + 1 < oldest:
+                return self._version, None
+            return self._version, list(islice(self._changes, version + 1 - oldest, None))
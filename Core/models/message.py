@@ -108,11 +108,11 @@ class Message:
         )
     
     @classmethod
-    def create_online_status(cls, sender_id: str, sender_name: str, receiver_id: str, avatar_base64: str = None) -> "Message":
+    def create_online_status(cls, sender_id: str, sender_name: str, receiver_id: str, avatar_hash: str = None) -> "Message":
         
         content_data = {"status": "ONLINE"}
-        if avatar_base64:
-            content_data["avatar_base64"] = avatar_base64
+        if avatar_hash:
+            content_data["avatar_hash"] = avatar_hash
         
         return cls.create(
             sender_id=sender_id,
@@ -122,6 +122,29 @@ class Message:
             msg_type="ONLINE",
         )
     
+    @classmethod
+    def create_avatar_get(cls, sender_id: str, sender_name: str, receiver_id: str, avatar_hash: str) -> "Message":
+        
+        return cls.create(
+            sender_id=sender_id,
+            sender_name=sender_name,
+            receiver_id=receiver_id,
+            content=json.dumps({"avatar_hash": avatar_hash}),
+            msg_type="AVATAR_GET",
+        )
+    
+    @classmethod
+    def create_avatar_data(cls, sender_id: str, sender_name: str, receiver_id: str,
+                           avatar_hash: str, avatar_base64: str) -> "Message":
+        
+        return cls.create(
+            sender_id=sender_id,
+            sender_name=sender_name,
+            receiver_id=receiver_id,
+            content=json.dumps({"avatar_hash": avatar_hash, "avatar_base64": avatar_base64}),
+            msg_type="AVATAR_DATA",
+        )
+    
     @classmethod
     def create_offline_status(cls, sender_id: str, sender_name: str, receiver_id: str) -> "Message":
         
@@ -218,3 +241,56 @@ class Message:
             content="CALL_END",
             msg_type="CALL_END",
         )
+    
+    @classmethod
+    def create_file_offer(cls, sender_id: str, sender_name: str, receiver_id: str, transfer_id: str,
+                          file_name: str, file_size: int, file_type: str = "file", text: str = "",
+                          timestamp: float = None, blob_hash: str = None) -> "Message":
+        offer_data = {
+            "transfer_id": transfer_id,
+            "file_name": file_name,
+            "file_size": file_size,
+            "file_type": file_type,
+            "text": text,
+            "timestamp": timestamp or time.time(),
+        }
+        if blob_hash:
+            offer_data["blob_hash"] = blob_hash
+        return cls.create(
+            sender_id=sender_id,
+            sender_name=sender_name,
+            receiver_id=receiver_id,
+            content=json.dumps(offer_data, ensure_ascii=False),
+            msg_type="FILE_OFFER",
+        )
+    
+    @classmethod
+    def create_file_done(cls, sender_id: str, sender_name: str, receiver_id: str, transfer_id: str,
+                         file_size: int) -> "Message":
+        done_data = {
+            "transfer_id": transfer_id,
+            "file_size": file_size,
+        }
+        return cls.create(
+            sender_id=sender_id,
+            sender_name=sender_name,
+            receiver_id=receiver_id,
+            content=json.dumps(done_data),
+            msg_type="FILE_DONE",
+        )
+    
+    @classmethod
+    def create_file_accept(cls, sender_id: str, sender_name: str, receiver_id: str, transfer_id: str,
+                           offset: int, complete: bool = False) -> "Message":
+        accept_data = {
+            "transfer_id": transfer_id,
+            "offset": offset,
+            "complete": complete,
+        }
+        return cls.create(
+            sender_id=sender_id,
+            sender_name=sender_name,
+            receiver_id=receiver_id,
+            content=json.dumps(accept_data),
+            msg_type="FILE_ACCEPT",
+        )
@@ -0,0 +1,97 @@
+from __future__ import annotations
+
+import threading
+from collections import OrderedDict
+from typing import Dict, Hashable, List, Optional, Tuple
+
+from Core.utils import config
+
+class _ConversationViews:
+
+    def __init__(self):
+        self.records: "OrderedDict[str, Dict]" = OrderedDict()
+        self.pages: Dict[Hashable, Tuple[int, List[str]]] = {}
+
+class MessageViewCache:
+
+    def __init__(self, max_conversations: int = config.MESSAGE_VIEW_CACHE_CONVERSATIONS,
+                 max_messages: int = config.MESSAGE_VIEW_CACHE_MESSAGES):
+        self.max_conversations = max_conversations
+        self.max_messages = max_messages
+        self._lock = threading.Lock()
+        self._conversations: "OrderedDict[str, _ConversationViews]" = OrderedDict()
+
+    def get(self, peer_id: str, message_id: str) -> Optional[Dict]:
+        with self._lock:
+            conversation = self._conversations.get(peer_id)
+            record = conversation.records.get(message_id) if conversation is not None else None
+            if record is None:
+                return None
+            self._conversations.move_to_end(peer_id)
+            conversation.records.move_to_end(message_id)
+            return dict(record)
+
+    def put(self, peer_id: str, record: Dict):
+        with self._lock:
+            self._put_locked(self._conversation_locked(peer_id), record)
+
+    def get_page(self, peer_id: str, key: Hashable, version: int) -> Optional[List[Dict]]:
+        with self._lock:
+            conversation = self._conversations.get(peer_id)
+            page = conversation.pages.get(key) if conversation is not None else None
+            if page is None or page[0] != version:
+                return None
+            records = []
+            for message_id in page[1]:
+                record = conversation.records.get(message_id)
+                if record is None:
+                    del conversation.pages[key]
+                    return None
+                conversation.records.move_to_end(message_id)
+                records.append(dict(record))
+            self._conversations.move_to_end(peer_id)
+            return records
+
+    def put_page(self, peer_id: str, key: Hashable, version: int, records: List[Dict]):
+        with self._lock:
+            conversation = self._conversation_locked(peer_id)
+            for record in records:
+                self._put_locked(conversation, record)
+            conversation.pages = {page_key: page for page_key, page in conversation.pages.items() if page[0] == version}
+            conversation.pages[key] = (version, [record["message_id"] for record in records])
+
+    def invalidate(self, peer_id: str, message_id: Optional[str] = None):
+        with self._lock:
+            if message_id is None:
+                self._conversations.pop(peer_id, None)
+                return
+            conversation = self._conversations.get(peer_id)
+            if conversation is not None:
+                conversation.records.pop(message_id, None)
+
+    def set_thumbnail(self, key: str, thumbnail_path: str):
+        with self._lock:
+            for conversation in self._conversations.values():
+                for record in conversation.records.values():
+                    if record.get("thumbnail_key") == key:
+                        record["thumbnail_path"] = thumbnail_path
+
+    def clear(self):
+        with self._lock:
+            self._conversations.clear()
+
+    def _conversation_locked(self, peer_id: str) -> _ConversationViews:
+        conversation = self._conversations.get(peer_id)
+        if conversation is None:
+            conversation = self._conversations[peer_id] = _ConversationViews()
+            while len(self._conversations) > self.max_conversations:
+                self._conversations.popitem(last=False)
+        self._conversations.move_to_end(peer_id)
+        return conversation
+
+    def _put_locked(self, conversation: _ConversationViews, record: Dict):
+        message_id = record["message_id"]
+        conversation.records[message_id] = dict(record)
+        conversation.records.move_to_end(message_id)
+        while len(conversation.records) > self.max_messages:
+            conversation.records.popitem(last=False)
@@ -11,6 +11,7 @@ class PeerInfo:
     tcp_port: int
     status: str = "offline"
     avatar_path: str = None
+    avatar_hash: str = None
 
     def to_dict(self) -> Dict:
         return {
@@ -19,6 +20,7 @@ class PeerInfo:
             "ip": self.ip,
             "tcp_port": self.tcp_port,
             "avatar_path": self.avatar_path,
+            "avatar_hash": self.avatar_hash,
         }
 
     @classmethod
@@ -30,4 +32,5 @@ class PeerInfo:
             tcp_port=data.get("tcp_port", 0),
             status="offline",
             avatar_path=data.get("avatar_path"),
+            avatar_hash=data.get("avatar_hash"),
         )
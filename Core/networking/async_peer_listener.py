@@ -0,0 +1,155 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import socket
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional, Set
+
+from Core.models.message import Message
+from Core.networking.framing import EVENT_NEGOTIATE, PREAMBLE_ACK, FramingError, WireDecoder
+from Core.networking.peer_listener import PeerListener
+from Core.storage.data_manager import DataManager
+from Core.utils import config
+
+log = logging.getLogger(__name__)
+
+class AsyncPeerListener(PeerListener):
+
+    def __init__(self, peer_id: str, data_manager: DataManager, on_message: Optional[Callable[[Message], None]] = None,
+                 on_frame: Optional[Callable[[int, memoryview, str, int], None]] = None,
+                 workers: int = config.LISTENER_WORKERS):
+        super().__init__(peer_id, data_manager, on_message, on_frame)
+        self.workers = workers
+
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._stopped: Optional[asyncio.Event] = None
+        self._connections: Set[asyncio.Task] = set()
+
+    def stop(self):
+        self._stop_event.set()
+        loop = self._loop
+        if loop is not None:
+            try:
+                loop.call_soon_threadsafe(self._request_stop)
+            except RuntimeError:
+                pass
+        self._server_socket = None
+
+    def connection_count(self) -> int:
+        return len(self._connections)
+
+    def _request_stop(self):
+        if self._stopped is not None:
+            self._stopped.set()
+
+    def _accept_loop(self):
+        self._loop = asyncio.new_event_loop()
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="PeerListenerWorker")
+        try:
+            self._loop.run_until_complete(self._serve())
+        except Exception as e:
+            log.error("Unexpected error in asyncio listener loop: %s", e, exc_info=True)
+        finally:
+            self._executor.shutdown(wait=False)
+            self._loop.close()
+            self._loop = None
+            log.debug("Asyncio listener loop finished")
+
+    async def _serve(self):
+        self._stopped = asyncio.Event()
+        server_sock = self._server_socket
+        if self._stop_event.is_set() or not server_sock:
+            return
+
+        server_sock.setblocking(False)
+        accept_task = asyncio.ensure_future(self._accept_connections(server_sock))
+        try:
+            await self._stopped.wait()
+        finally:
+            accept_task.cancel()
+            for task in list(self._connections):
+                task.cancel()
+            await asyncio.gather(accept_task, *self._connections, return_exceptions=True)
+            try:
+                server_sock.close()
+            except OSError:
+                pass
+
+    async def _accept_connections(self, server_sock: socket.socket):
+        loop = asyncio.get_running_loop()
+        while True:
+            try:
+                client_sock, addr = await loop.sock_accept(server_sock)
+            except asyncio.CancelledError:
+                return
+            except OSError as e:
+                if not self._stop_event.is_set():
+                    log.debug("Accept loop stopped: %s", e)
+                return
+
+            client_sock.setblocking(False)
+            task = loop.create_task(self._handle_connection(client_sock, addr))
+            self._connections.add(task)
+            task.add_done_callback(self._connections.discard)
+
+    async def _handle_connection(self, client_sock: socket.socket, addr):
+        sender_ip = addr[0] if addr and len(addr) > 0 else "unknown"
+        sender_port = addr[1] if addr and len(addr) > 1 else 0
+        loop = asyncio.get_running_loop()
+        decoder = WireDecoder()
+        pending: asyncio.Queue = asyncio.Queue(maxsize=config.LISTENER_PENDING_EVENTS)
+        worker = loop.create_task(self._drain_events(pending, addr))
+        log.debug("Handling client connection from %s:%s (%s open)", sender_ip, sender_port, len(self._connections))
+
+        try:
+            while True:
+                try:
+                    received = await asyncio.wait_for(
+                        loop.sock_recv_into(client_sock, decoder.writable()),
+                        timeout=config.LISTENER_IDLE_TIMEOUT,
+                    )
+                except asyncio.TimeoutError:
+                    log.debug("Closing idle connection from %s:%s", sender_ip, sender_port)
+                    break
+                except (ConnectionError, OSError) as e:
+                    log.debug("Connection error from %s:%s: %s", sender_ip, sender_port, e)
+                    break
+
+                if not received:
+                    log.debug("Client %s:%s disconnected (no data)", sender_ip, sender_port)
+                    break
+                decoder.commit(received)
+
+                try:
+                    for event in decoder.events():
+                        if event[0] == EVENT_NEGOTIATE:
+                            await loop.sock_sendall(client_sock, PREAMBLE_ACK)
+                            log.debug("Negotiated framing with %s:%s", sender_ip, sender_port)
+                        else:
+                            await pending.put(event[:-1] + (memoryview(bytes(event[-1])),))
+                except FramingError as e:
+                    log.warning("Framing error from %s:%s: %s", sender_ip, sender_port, e)
+                    break
+        except asyncio.CancelledError:
+            worker.cancel()
+            log.debug("Connection from %s:%s cancelled (listener stopping)", sender_ip, sender_port)
+        finally:
+            client_sock.close()
+
+        try:
+            if not worker.done():
+                await pending.put(None)
+                await worker
+        except asyncio.CancelledError:
+            worker.cancel()
+        log.debug("Client handler finished for %s:%s", sender_ip, sender_port)
+
+    async def _drain_events(self, pending: asyncio.Queue, addr):
+        loop = asyncio.get_running_loop()
+        while True:
+            event = await pending.get()
+            if event is None:
+                return
+            await loop.run_in_executor(self._executor, self._dispatch_event, event, addr)
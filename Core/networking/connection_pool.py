@@ -0,0 +1,275 @@
+from __future__ import annotations
+
+import errno
+import logging
+import select
+import selectors
+import socket
+import threading
+import time
+from collections import deque
+from typing import Deque, Dict, Iterable, Optional, Tuple
+
+from Core.networking.framing import FRAME_JSON, PREAMBLE, PREAMBLE_ACK, encode_frame
+from Core.utils import config
+
+log = logging.getLogger(__name__)
+
+Endpoint = Tuple[str, int]
+
+class PooledConnection:
+
+    def __init__(self, endpoint: Endpoint, sock: socket.socket, framed: bool = False):
+        self.endpoint = endpoint
+        self.sock = sock
+        self.framed = framed
+        self.created_at = time.monotonic()
+        self.last_used = self.created_at
+
+    def is_healthy(self) -> bool:
+        try:
+            readable, _, errored = select.select([self.sock], [], [self.sock], 0)
+        except (OSError, ValueError):
+            return False
+        if errored:
+            return False
+        if not readable:
+            return True
+        try:
+            data = self.sock.recv(1, socket.MSG_PEEK)
+        except (BlockingIOError, socket.timeout):
+            return True
+        except OSError:
+            return False
+        return bool(data)
+
+    def sendall(self, data: bytes):
+        self.sock.sendall(data)
+        self.last_used = time.monotonic()
+
+    def send_json(self, body: bytes):
+        if self.framed:
+            self.sendall(encode_frame(FRAME_JSON, body))
+        else:
+            self.sendall(body + b"\n")
+
+    def negotiate_framing(self, timeout: float) -> bool:
+        previous_timeout = self.sock.gettimeout()
+        self.sock.sendall(PREAMBLE)
+        self.sock.settimeout(timeout)
+        try:
+            reply = b""
+            while len(reply) < len(PREAMBLE_ACK):
+                chunk = self.sock.recv(len(PREAMBLE_ACK) - len(reply))
+                if not chunk:
+                    raise ConnectionError("Connection closed during framing negotiation")
+                reply += chunk
+        finally:
+            self.sock.settimeout(previous_timeout)
+        self.framed = reply == PREAMBLE_ACK
+        return self.framed
+
+    def close(self):
+        try:
+            self.sock.close()
+        except OSError:
+            pass
+
+
+class ConnectionPool:
+
+    def __init__(self, max_per_peer: int = config.POOL_MAX_PER_PEER, max_total: int = config.POOL_MAX_TOTAL,
+                 idle_timeout: float = config.POOL_IDLE_TIMEOUT, framing: bool = config.FRAMING_ENABLED):
+        self.max_per_peer = max_per_peer
+        self.max_total = max_total
+        self.idle_timeout = idle_timeout
+        self.framing = framing
+        self._legacy_endpoints: Dict[Endpoint, float] = {}
+
+        self._idle: Dict[Endpoint, Deque[PooledConnection]] = {}
+        self._idle_count = 0
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.reconnects = 0
+
+        self._reaper: Optional[threading.Thread] = None
+        self._stop_event = threading.Event()
+
+    def acquire(self, endpoint: Endpoint, timeout: float, sock: Optional[socket.socket] = None) -> Tuple[PooledConnection, bool]:
+        with self._lock:
+            self._evict_idle_locked(time.monotonic())
+            idle = self._idle.get(endpoint) if sock is None else None
+            while idle:
+                conn = idle.pop()
+                self._idle_count -= 1
+                if conn.is_healthy():
+                    self.hits += 1
+                    conn.sock.settimeout(timeout)
+                    return conn, True
+                self.evictions += 1
+                conn.close()
+                log.debug("Dropped dead pooled connection to %s:%s", endpoint[0], endpoint[1])
+            self.misses += 1
+
+        if sock is not None:
+            sock.settimeout(timeout)
+            conn = self._wrap(endpoint, sock)
+        else:
+            conn = self._connect(endpoint, timeout)
+        if self._should_negotiate(endpoint):
+            try:
+                negotiated = conn.negotiate_framing(min(timeout, config.FRAMING_NEGOTIATE_TIMEOUT))
+            except (ConnectionError, socket.timeout):
+                conn.close()
+                negotiated = False
+                conn = None
+            except OSError:
+                conn.close()
+                raise
+            if not negotiated:
+                log.info("Peer %s:%s does not support framing, using newline JSON", endpoint[0], endpoint[1])
+                with self._lock:
+                    self._legacy_endpoints[endpoint] = time.monotonic()
+                if conn is None:
+                    conn = self._connect(endpoint, timeout)
+        log.debug("Opened new pooled connection to %s:%s (framed=%s)", endpoint[0], endpoint[1], conn.framed)
+        return conn, False
+
+    def connect_many(self, endpoints: Iterable[Endpoint], timeout: float) -> Dict[Endpoint, Optional[socket.socket]]:
+        endpoints = list(dict.fromkeys(endpoints))
+        with self._lock:
+            connected: Dict[Endpoint, Optional[socket.socket]] = {
+                endpoint: None for endpoint in endpoints if self._idle.get(endpoint)
+            }
+        selector = selectors.DefaultSelector()
+        try:
+            for endpoint in endpoints:
+                if endpoint in connected:
+                    continue
+                try:
+                    family, kind, proto, _, address = socket.getaddrinfo(endpoint[0], endpoint[1], type=socket.SOCK_STREAM)[0]
+                    sock = socket.socket(family, kind, proto)
+                except OSError as e:
+                    log.debug("Cannot connect to %s:%s: %s", endpoint[0], endpoint[1], e)
+                    continue
+                sock.setblocking(False)
+                error = sock.connect_ex(address)
+                if error not in (0, errno.EINPROGRESS, errno.EWOULDBLOCK):
+                    sock.close()
+                    continue
+                selector.register(sock, selectors.EVENT_WRITE, endpoint)
+
+            deadline = time.monotonic() + timeout
+            while selector.get_map():
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                for key, _ in selector.select(remaining):
+                    selector.unregister(key.fileobj)
+                    if key.fileobj.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR) == 0:
+                        connected[key.data] = key.fileobj
+                    else:
+                        key.fileobj.close()
+        finally:
+            for key in list(selector.get_map().values()):
+                key.fileobj.close()
+            selector.close()
+        return connected
+
+    def _connect(self, endpoint: Endpoint, timeout: float) -> PooledConnection:
+        return self._wrap(endpoint, socket.create_connection(endpoint, timeout=timeout))
+
+    def _wrap(self, endpoint: Endpoint, sock: socket.socket) -> PooledConnection:
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+        return PooledConnection(endpoint, sock)
+
+    def release(self, conn: PooledConnection):
+        with self._lock:
+            if self._stop_event.is_set():
+                conn.close()
+                return
+            idle = self._idle.setdefault(conn.endpoint, deque())
+            if len(idle) >= self.max_per_peer or self._idle_count >= self.max_total:
+                self.evictions += 1
+                conn.close()
+                return
+            idle.append(conn)
+            self._idle_count += 1
+        self._ensure_reaper()
+
+    def discard(self, conn: PooledConnection, reconnect: bool = False):
+        conn.close()
+        if reconnect:
+            with self._lock:
+                self.reconnects += 1
+
+    def close_endpoint(self, endpoint: Endpoint):
+        with self._lock:
+            idle = self._idle.pop(endpoint, None) or deque()
+            self._idle_count -= len(idle)
+        for conn in idle:
+            conn.close()
+
+    def close_all(self):
+        self._stop_event.set()
+        with self._lock:
+            idle_lists = list(self._idle.values())
+            self._idle.clear()
+            self._idle_count = 0
+        for idle in idle_lists:
+            for conn in idle:
+                conn.close()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "reconnects": self.reconnects,
+                "idle": self._idle_count,
+                "hit_rate": (self.hits / lookups) if lookups else 0.0,
+            }
+
+    def _should_negotiate(self, endpoint: Endpoint) -> bool:
+        if not self.framing:
+            return False
+        with self._lock:
+            marked_at = self._legacy_endpoints.get(endpoint)
+            if marked_at is None:
+                return True
+            if time.monotonic() - marked_at > config.FRAMING_RETRY_INTERVAL:
+                del self._legacy_endpoints[endpoint]
+                return True
+            return False
+
+    def _evict_idle_locked(self, now: float):
+        for endpoint in list(self._idle.keys()):
+            idle = self._idle[endpoint]
+            while idle and now - idle[0].last_used > self.idle_timeout:
+                conn = idle.popleft()
+                self._idle_count -= 1
+                self.evictions += 1
+                conn.close()
+            if not idle:
+                del self._idle[endpoint]
+
+    def _ensure_reaper(self):
+        if self._reaper and self._reaper.is_alive():
+            return
+        self._reaper = threading.Thread(target=self._reaper_loop, daemon=True, name="ConnectionPoolReaper")
+        self._reaper.start()
+
+    def _reaper_loop(self):
+        interval = max(1.0, self.idle_timeout / 2)
+        while not self._stop_event.wait(interval):
+            with self._lock:
+                self._evict_idle_locked(time.monotonic())
+                if not self._idle_count:
+                    self._reaper = None
+                    return
@@ -0,0 +1,150 @@
+from __future__ import annotations
+
+import struct
+from typing import Iterator, Optional, Tuple
+
+from Core.utils import config
+
+FRAME_MAGIC = b"\x00P2PF"
+FRAME_VERSION = 1
+PREAMBLE = FRAME_MAGIC + bytes([FRAME_VERSION]) + b"\n"
+PREAMBLE_ACK = FRAME_MAGIC + bytes([FRAME_VERSION])
+
+FRAME_HEADER = struct.Struct("!BI")
+FRAME_JSON = 1
+FRAME_FILE_CHUNK = 2
+
+EVENT_NEGOTIATE = "negotiate"
+EVENT_LINE = "line"
+EVENT_FRAME = "frame"
+
+MODE_SNIFF = "sniff"
+MODE_LINES = "lines"
+MODE_FRAMES = "frames"
+
+class FramingError(ValueError):
+    pass
+
+def frame_header(kind: int, length: int) -> bytes:
+    return FRAME_HEADER.pack(kind, length)
+
+def encode_frame(kind: int, payload: bytes) -> bytes:
+    return FRAME_HEADER.pack(kind, len(payload)) + payload
+
+class WireDecoder:
+
+    def __init__(self, capacity: int = config.FRAME_BUFFER_SIZE, max_frame_size: int = config.MAX_FRAME_SIZE):
+        self.max_frame_size = max_frame_size
+        self.mode = MODE_SNIFF
+
+        self._buf = bytearray(capacity)
+        self._view = memoryview(self._buf)
+        self._start = 0
+        self._end = 0
+        self._scan = 0
+
+        self._large: Optional[bytearray] = None
+        self._large_view: Optional[memoryview] = None
+        self._large_kind = 0
+        self._large_length = 0
+        self._large_filled = 0
+
+    def writable(self) -> memoryview:
+        if self._large is not None:
+            if self._large_filled == len(self._large):
+                self._grow_large()
+            return self._large_view[self._large_filled:]
+        if self._end == len(self._buf):
+            self._make_room()
+        return self._view[self._end:]
+
+    def commit(self, nbytes: int):
+        if self._large is not None:
+            self._large_filled += nbytes
+        else:
+            self._end += nbytes
+
+    def events(self) -> Iterator[Tuple]:
+        while True:
+            if self._large is not None:
+                if self._large_filled < self._large_length:
+                    return
+                payload = self._large_view
+                kind = self._large_kind
+                self._large = None
+                self._large_view = None
+                yield EVENT_FRAME, kind, payload
+                continue
+
+            if self.mode == MODE_SNIFF:
+                available = self._end - self._start
+                head = bytes(self._view[self._start:self._start + min(available, len(PREAMBLE))])
+                if head == PREAMBLE:
+                    self._start += len(PREAMBLE)
+                    self._scan = self._start
+                    self.mode = MODE_FRAMES
+                    yield (EVENT_NEGOTIATE,)
+                    continue
+                if PREAMBLE.startswith(head) and available < len(PREAMBLE):
+                    break
+                self.mode = MODE_LINES
+
+            if self.mode == MODE_LINES:
+                newline = self._buf.find(b"\n", self._scan, self._end)
+                if newline < 0:
+                    self._scan = self._end
+                    break
+                line = self._view[self._start:newline]
+                self._start = newline + 1
+                self._scan = self._start
+                yield EVENT_LINE, line
+                continue
+
+            available = self._end - self._start
+            if available < FRAME_HEADER.size:
+                break
+            kind, length = FRAME_HEADER.unpack_from(self._buf, self._start)
+            if length > self.max_frame_size:
+                raise FramingError(f"Frame of {length} bytes exceeds limit of {self.max_frame_size}")
+
+            body_start = self._start + FRAME_HEADER.size
+            if length > len(self._buf) - FRAME_HEADER.size:
+                buffered = min(available - FRAME_HEADER.size, length)
+                self._large = bytearray(min(length, max(buffered, len(self._buf))))
+                self._large_view = memoryview(self._large)
+                self._large_view[:buffered] = self._view[body_start:body_start + buffered]
+                self._large_kind = kind
+                self._large_length = length
+                self._large_filled = buffered
+                self._start = body_start + buffered
+                continue
+
+            if available - FRAME_HEADER.size < length:
+                break
+            payload = self._view[body_start:body_start + length]
+            self._start = body_start + length
+            yield EVENT_FRAME, kind, payload
+
+        if self._start == self._end:
+            self._start = self._end = self._scan = 0
+
+    def _grow_large(self):
+        grown = bytearray(min(self._large_length, len(self._large) * 2))
+        grown[:self._large_filled] = self._large_view[:self._large_filled]
+        self._large = grown
+        self._large_view = memoryview(grown)
+
+    def _make_room(self):
+        pending = self._end - self._start
+        if self._start > 0:
+            self._view[:pending] = bytes(self._view[self._start:self._end])
+        else:
+            if len(self._buf) >= self.max_frame_size:
+                raise FramingError(f"Line exceeds limit of {self.max_frame_size} bytes")
+            grown = bytearray(len(self._buf) * 2)
+            grown[:pending] = self._view[:pending]
+            self._buf = grown
+            self._view = memoryview(self._buf)
+        self._scan -= self._start
+        self._start = 0
+        self._end = pending
@@ -2,23 +2,96 @@ from __future__ import annotations
 
 import logging
 import socket
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional
 
 from Core.models.message import Message
+from Core.networking.connection_pool import ConnectionPool, PooledConnection
 from Core.utils import config
 
 log = logging.getLogger(__name__)
 
 class PeerClient:
 
-    def send(self, peer_ip: str, peer_port: int, message: Message, timeout: float = None) -> bool:
-        payload = message.to_json() + "\n"
-        with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
-            sock.settimeout(timeout if timeout is not None else config.TCP_CONNECT_TIMEOUT)
+    def __init__(self, pool: Optional[ConnectionPool] = None):
+        self.pool = pool or ConnectionPool()
+
+    def send(self, peer_ip: str, peer_port: int, message: Message, timeout: float = None,
+             sock: Optional[socket.socket] = None) -> bool:
+        body = message.to_json().encode("utf-8")
+        endpoint = (peer_ip, peer_port)
+        timeout = timeout if timeout is not None else config.TCP_CONNECT_TIMEOUT
+
+        while True:
+            try:
+                conn, reused = self.pool.acquire(endpoint, timeout, sock)
+            except (OSError, ConnectionError, TimeoutError):
+                log.debug("Failed to send to %s:%s (peer may be offline)", peer_ip, peer_port)
+                return False
+            sock = None
+
+            try:
+                conn.send_json(body)
+            except (OSError, ConnectionError, TimeoutError):
+                self.pool.discard(conn, reconnect=reused)
+                if reused:
+                    log.debug("Pooled connection to %s:%s went stale, reconnecting", peer_ip, peer_port)
+                    continue
+                log.debug("Failed to send to %s:%s (peer may be offline)", peer_ip, peer_port)
+                return False
+
+            self.pool.release(conn)
+            log.debug("Sent message %s to %s:%s (reused=%s, framed=%s)", message.message_id, peer_ip, peer_port, reused, conn.framed)
+            return True
+
+    def send_many(self, peer_ip: str, peer_port: int, messages: List[Message], timeout: float = None) -> int:
+        endpoint = (peer_ip, peer_port)
+        timeout = timeout if timeout is not None else config.TCP_CONNECT_TIMEOUT
+        sent = 0
+
+        while sent < len(messages):
             try:
-                sock.connect((peer_ip, peer_port))
-                sock.sendall(payload.encode("utf-8"))
-                log.debug("Sent message %s to %s:%s", message.message_id, peer_ip, peer_port)
-                return True
-            except (OSError, ConnectionError, TimeoutError) as exc:
+                conn, reused = self.pool.acquire(endpoint, timeout)
+            except (OSError, ConnectionError, TimeoutError):
                 log.debug("Failed to send to %s:%s (peer may be offline)", peer_ip, peer_port)
-                return False
\ No newline at end of file
+                break
+
+            try:
+                for message in messages[sent:]:
+                    conn.send_json(message.to_json().encode("utf-8"))
+                    sent += 1
+            except (OSError, ConnectionError, TimeoutError):
+                self.pool.discard(conn, reconnect=reused)
+                if reused:
+                    log.debug("Pooled connection to %s:%s went stale, reconnecting", peer_ip, peer_port)
+                    continue
+                log.debug("Connection to %s:%s dropped after %s/%s messages", peer_ip, peer_port, sent, len(messages))
+                break
+
+            self.pool.release(conn)
+            log.debug("Sent %s pipelined messages to %s:%s (reused=%s)", len(messages), peer_ip, peer_port, reused)
+        return sent
+
+    @contextmanager
+    def session(self, peer_ip: str, peer_port: int, timeout: float = None) -> Iterator[PooledConnection]:
+        endpoint = (peer_ip, peer_port)
+        timeout = timeout if timeout is not None else config.TCP_CONNECT_TIMEOUT
+        conn, reused = self.pool.acquire(endpoint, timeout)
+        try:
+            yield conn
+        except (OSError, ConnectionError):
+            self.pool.discard(conn, reconnect=reused)
+            if reused:
+                log.debug("Pooled connection to %s:%s failed, closing its idle connections", peer_ip, peer_port)
+                self.pool.close_endpoint(endpoint)
+            raise
+        except BaseException:
+            self.pool.discard(conn)
+            raise
+        self.pool.release(conn)
+
+    def stats(self) -> Dict:
+        return self.pool.stats()
+
+    def close(self):
+        self.pool.close_all()
@@ -4,9 +4,11 @@ import json
 import logging
 import socket
 import threading
+import time
 from typing import Callable, Optional
 
 from Core.models.message import Message
+from Core.networking.framing import EVENT_FRAME, EVENT_NEGOTIATE, FRAME_JSON, PREAMBLE_ACK, FramingError, WireDecoder
 from Core.storage.data_manager import DataManager
 from Core.utils import config
 
@@ -14,10 +16,12 @@ log = logging.getLogger(__name__)
 
 class PeerListener:
 
-    def __init__(self, peer_id: str, data_manager: DataManager, on_message: Optional[Callable[[Message], None]] = None):
+    def __init__(self, peer_id: str, data_manager: DataManager, on_message: Optional[Callable[[Message], None]] = None,
+                 on_frame: Optional[Callable[[int, memoryview, str, int], None]] = None):
         self.peer_id = peer_id
         self.data_manager = data_manager
         self.on_message = on_message
+        self.on_frame = on_frame
 
         self._server_socket: Optional[socket.socket] = None
         self._thread: Optional[threading.Thread] = None
@@ -40,7 +44,7 @@ class PeerListener:
                 self._server_socket = None
                 raise RuntimeError(f"Failed to bind PeerListener socket on {host}:{port}. Port might be in use or permissions issue. Error: {e}") from e
             
-            self._server_socket.listen(5)
+            self._server_socket.listen(config.LISTEN_BACKLOG)
             actual_port = self._server_socket.getsockname()[1]
             
             self._thread = threading.Thread(target=self._accept_loop, daemon=True, name="PeerListener")
@@ -107,7 +111,7 @@ class PeerListener:
                     pass
 
     def _handle_client(self, client_sock: socket.socket, addr):
-        buffer = ""
+        decoder = WireDecoder()
         sender_ip = addr[0] if addr and len(addr) > 0 else "unknown"
         sender_port = addr[1] if addr and len(addr) > 1 else 0
         
@@ -115,37 +119,33 @@ class PeerListener:
             with client_sock:
                 client_sock.settimeout(5.0)
                 log.debug("Handling client connection from %s:%s", sender_ip, sender_port)
+                last_activity = time.monotonic()
                 
                 try:
-                    while True:
+                    while not self._stop_event.is_set():
                         try:
-                            data = client_sock.recv(config.BUFFER_SIZE)
-                            if not data:
+                            received = client_sock.recv_into(decoder.writable())
+                            if not received:
                                 log.debug("Client %s:%s disconnected (no data)", sender_ip, sender_port)
                                 break
+                            last_activity = time.monotonic()
+                            decoder.commit(received)
                             
-                            try:
-                                decoded = data.decode("utf-8")
-                            except UnicodeDecodeError as e:
-                                log.warning("Invalid UTF-8 data from %s:%s: %s", sender_ip, sender_port, e)
-                                continue
-                            
-                            buffer += decoded
-                            
-                            while "\n" in buffer:
-                                line, buffer = buffer.split("\n", 1)
-                                line = line.strip()
-                                if not line:
-                                    continue
-                                
-                                try:
-                                    self._process_line(line, addr)
-                                except Exception as e:
-                                    log.error("Error processing line from %s:%s: %s (line: %s)", sender_ip, sender_port, e, line[:100], exc_info=True)
-                                    continue
+                            for event in decoder.events():
+                                if event[0] == EVENT_NEGOTIATE:
+                                    client_sock.sendall(PREAMBLE_ACK)
+                                    log.debug("Negotiated framing with %s:%s", sender_ip, sender_port)
+                                else:
+                                    self._dispatch_event(event, addr)
                                     
                         except socket.timeout:
+                            if time.monotonic() - last_activity > config.LISTENER_IDLE_TIMEOUT:
+                                log.debug("Closing idle connection from %s:%s", sender_ip, sender_port)
+                                break
                             continue
+                        except FramingError as e:
+                            log.warning("Framing error from %s:%s: %s", sender_ip, sender_port, e)
+                            break
                         except ConnectionError as e:
                             log.debug("Connection error from %s:%s: %s", sender_ip, sender_port, e)
                             break
@@ -161,6 +161,37 @@ class PeerListener:
         
         log.debug("Client handler finished for %s:%s", sender_ip, sender_port)
 
+    def _dispatch_event(self, event, addr):
+        sender_ip = addr[0] if addr and len(addr) > 0 else "unknown"
+        sender_port = addr[1] if addr and len(addr) > 1 else 0
+
+        if event[0] == EVENT_FRAME:
+            _, kind, payload = event
+            if kind != FRAME_JSON:
+                if not self.on_frame:
+                    log.warning("Unsupported frame type %s from %s:%s", kind, sender_ip, sender_port)
+                    return
+                try:
+                    self.on_frame(kind, payload, sender_ip, sender_port)
+                except Exception as e:
+                    log.error("Error in on_frame callback for %s:%s: %s", sender_ip, sender_port, e, exc_info=True)
+                return
+        else:
+            payload = event[1]
+
+        try:
+            line = str(payload, "utf-8").strip()
+        except UnicodeDecodeError as e:
+            log.warning("Invalid UTF-8 data from %s:%s: %s", sender_ip, sender_port, e)
+            return
+        if not line:
+            return
+
+        try:
+            self._process_line(line, addr)
+        except Exception as e:
+            log.error("Error processing line from %s:%s: %s (line: %s)", sender_ip, sender_port, e, line[:100], exc_info=True)
+
     def _process_line(self, payload: str, addr):
         sender_ip = addr[0] if addr and len(addr) > 0 else "unknown"
         sender_port = addr[1] if addr and len(addr) > 1 else 0
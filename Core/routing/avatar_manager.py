@@ -0,0 +1,209 @@
+from __future__ import annotations
+
+import base64
+import binascii
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+from Core.models.message import Message
+from Core.models.peer_info import PeerInfo
+from Core.utils import config
+
+log = logging.getLogger(__name__)
+
+def _is_avatar_hash(value) -> bool:
+    if not isinstance(value, str) or len(value) != 64:
+        return False
+    try:
+        int(value, 16)
+    except ValueError:
+        return False
+    return True
+
+
+class AvatarManager:
+
+    def __init__(self, router):
+        self.router = router
+        self._lock = threading.Lock()
+        self._local_key: Optional[Tuple[str, int, int]] = None
+        self._local_hash: Optional[str] = None
+        self._requested: Dict[str, float] = {}
+
+    def local_hash(self) -> Optional[str]:
+        avatar_path = getattr(self.router, 'avatar_path', None)
+        if not avatar_path:
+            return None
+        try:
+            stat = os.stat(avatar_path)
+        except OSError:
+            return None
+
+        key = (avatar_path, stat.st_mtime_ns, stat.st_size)
+        with self._lock:
+            if key == self._local_key:
+                return self._local_hash
+
+        digest = hashlib.sha256()
+        try:
+            with open(avatar_path, 'rb') as f:
+                for block in iter(lambda: f.read(64 * 1024), b""):
+                    digest.update(block)
+        except OSError as e:
+            log.warning("Failed to read avatar file %s: %s", avatar_path, e)
+            return None
+
+        avatar_hash = digest.hexdigest()
+        with self._lock:
+            self._local_key = key
+            self._local_hash = avatar_hash
+        log.debug("[AVATAR] Local avatar %s hashed to %s", avatar_path, avatar_hash[:12])
+        return avatar_hash
+
+    def apply_remote(self, peer_id: str, avatar_hash: str):
+        if not _is_avatar_hash(avatar_hash):
+            return
+
+        with self.router._lock:
+            peer = self.router._peers.get(peer_id)
+            if not peer:
+                return
+            if peer.avatar_hash == avatar_hash and peer.avatar_path and os.path.exists(peer.avatar_path):
+                return
+            target = (peer.ip, peer.tcp_port, peer.display_name)
+
+        cached = self.router.data_manager.get_avatar_path(avatar_hash)
+        if cached.exists():
+            self._assign(peer_id, avatar_hash, cached)
+            return
+
+        self._request(peer_id, avatar_hash, *target)
+
+    def store_inline(self, peer_id: str, avatar_base64: str):
+        try:
+            data = base64.b64decode(avatar_base64)
+        except (binascii.Error, ValueError, TypeError) as e:
+            log.warning("[AVATAR] Invalid inline avatar from %s: %s", peer_id, e)
+            return
+
+        avatar_hash = hashlib.sha256(data).hexdigest()
+        with self.router._lock:
+            peer = self.router._peers.get(peer_id)
+            if not peer or peer.avatar_hash == avatar_hash:
+                return
+        self._save_and_assign(peer_id, avatar_hash, data)
+
+    def handle_avatar_get(self, message: Message, sender_ip: str = ""):
+        try:
+            avatar_hash = json.loads(message.content).get("avatar_hash")
+        except (json.JSONDecodeError, ValueError, TypeError, AttributeError):
+            log.warning("[AVATAR] Invalid AVATAR_GET from %s", message.sender_id)
+            return
+
+        with self.router._lock:
+            peer = self.router._peers.get(message.sender_id)
+            if not peer:
+                log.debug("[AVATAR] Ignoring AVATAR_GET from %s (not in friends list)", message.sender_id)
+                return
+            target = (peer.ip or sender_ip, peer.tcp_port)
+
+        if not avatar_hash or avatar_hash != self.local_hash():
+            log.debug("[AVATAR] %s asked for avatar %s which is no longer current", message.sender_id, avatar_hash)
+            return
+
+        try:
+            with open(self.router.avatar_path, 'rb') as f:
+                avatar_base64 = base64.b64encode(f.read()).decode('utf-8')
+        except OSError as e:
+            log.warning("Failed to read avatar file %s: %s", self.router.avatar_path, e)
+            return
+
+        reply = Message.create_avatar_data(
+            sender_id=self.router.peer_id,
+            sender_name=self.router.display_name or "Unknown",
+            receiver_id=message.sender_id,
+            avatar_hash=avatar_hash,
+            avatar_base64=avatar_base64,
+        )
+        if self.router.peer_client.send(target[0], target[1], reply):
+            log.info("[AVATAR] Sent avatar %s to %s", avatar_hash[:12], message.sender_id)
+        else:
+            log.debug("[AVATAR] Failed to send avatar to %s", message.sender_id)
+
+    def handle_avatar_data(self, message: Message, sender_ip: str = ""):
+        try:
+            content_data = json.loads(message.content)
+            avatar_hash = content_data.get("avatar_hash")
+            data = base64.b64decode(content_data.get("avatar_base64") or "")
+        except (json.JSONDecodeError, binascii.Error, ValueError, TypeError, AttributeError) as e:
+            log.warning("[AVATAR] Invalid AVATAR_DATA from %s: %s", message.sender_id, e)
+            return
+
+        with self._lock:
+            self._requested.pop(avatar_hash, None)
+
+        if not data or len(data) > config.AVATAR_MAX_SIZE:
+            log.warning("[AVATAR] Rejecting avatar from %s (%s bytes)", message.sender_id, len(data))
+            return
+        if hashlib.sha256(data).hexdigest() != avatar_hash:
+            log.warning("[AVATAR] Avatar from %s does not match hash %s", message.sender_id, avatar_hash)
+            return
+
+        with self.router._lock:
+            if message.sender_id not in self.router._peers:
+                return
+        self._save_and_assign(message.sender_id, avatar_hash, data)
+
+    def _request(self, peer_id: str, avatar_hash: str, ip: str, tcp_port: int, display_name: str):
+        if not ip or not tcp_port:
+            return
+
+        now = time.monotonic()
+        with self._lock:
+            requested_at = self._requested.get(avatar_hash)
+            if requested_at is not None and now - requested_at < config.AVATAR_REQUEST_INTERVAL:
+                return
+            self._requested[avatar_hash] = now
+
+        request = Message.create_avatar_get(
+            sender_id=self.router.peer_id,
+            sender_name=self.router.display_name or "Unknown",
+            receiver_id=peer_id,
+            avatar_hash=avatar_hash,
+        )
+        log.info("[AVATAR] Requesting avatar %s from %s", avatar_hash[:12], display_name)
+        if not self.router.peer_client.send(ip, tcp_port, request):
+            log.debug("[AVATAR] Failed to request avatar from %s", display_name)
+            with self._lock:
+                self._requested.pop(avatar_hash, None)
+
+    def _save_and_assign(self, peer_id: str, avatar_hash: str, data: bytes):
+        try:
+            path = self.router.data_manager.save_avatar(avatar_hash, data)
+        except OSError as e:
+            log.warning("[AVATAR] Failed to save avatar for %s: %s", peer_id, e)
+            return
+        self._assign(peer_id, avatar_hash, path)
+
+    def _assign(self, peer_id: str, avatar_hash: str, path: Path):
+        with self.router._lock:
+            peer: Optional[PeerInfo] = self.router._peers.get(peer_id)
+            if not peer:
+                return
+            peer.avatar_hash = avatar_hash
+            peer.avatar_path = str(path)
+            self.router.data_manager.update_peer(peer)
+            callback = self.router._on_peer_callback
+        log.info("[AVATAR] Updated avatar for %s (%s)", peer.display_name, avatar_hash[:12])
+
+        if callback:
+            try:
+                callback(peer)
+            except Exception as e:
+                log.error("[AVATAR] Error in peer callback for %s: %s", peer_id, e, exc_info=True)
@@ -0,0 +1,283 @@
+from __future__ import annotations
+
+import logging
+import os
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Deque, Dict, List, Optional, Set
+
+from Core.models.message import Message
+from Core.utils import config
+
+log = logging.getLogger(__name__)
+
+class OutboundItem:
+
+    def __init__(self, message: Message, text: str = "", file_path: Optional[str] = None,
+                 attempts: int = 0, queued_at: float = None):
+        self.message = message
+        self.text = text
+        self.file_path = file_path
+        self.attempts = attempts
+        self.queued_at = queued_at or time.time()
+        self.next_attempt = 0.0
+        self.status = "pending" if not attempts else "queued"
+
+    def to_dict(self) -> Dict:
+        return {
+            "message": self.message.to_dict(),
+            "text": self.text,
+            "file_path": self.file_path,
+            "attempts": self.attempts,
+            "queued_at": self.queued_at,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "OutboundItem":
+        return cls(
+            message=Message.from_dict(data["message"]),
+            text=data.get("text", ""),
+            file_path=data.get("file_path"),
+            attempts=int(data.get("attempts", 0)),
+            queued_at=float(data.get("queued_at") or time.time()),
+        )
+
+
+def backoff_delay(attempts: int) -> float:
+    delay = min(config.OUTBOX_RETRY_BASE * (2 ** max(attempts - 1, 0)), config.OUTBOX_RETRY_MAX)
+    return random.uniform(delay / 2, delay)
+
+
+class DeliveryQueue:
+
+    def __init__(self, router, workers: int = config.DELIVERY_WORKERS):
+        self.router = router
+        self.workers = workers
+        self._queues: Dict[str, Deque[OutboundItem]] = {}
+        self._draining: Set[str] = set()
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock()
+        self._unsaved: Set[str] = set()
+        self._save_timer: Optional[threading.Timer] = None
+        self._wakeup = threading.Event()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._scheduler: Optional[threading.Thread] = None
+        self._stopped = False
+
+    def start(self):
+        data_manager = self.router.data_manager
+        restored = 0
+        now = time.monotonic()
+        with self._lock:
+            self._stopped = False
+            for peer_id in data_manager.list_outbox_peers():
+                items = deque()
+                for entry in data_manager.load_outbox(peer_id):
+                    try:
+                        item = OutboundItem.from_dict(entry)
+                    except (KeyError, TypeError, ValueError) as e:
+                        log.warning("[OUTBOX] Dropping unreadable entry for %s: %s", peer_id, e)
+                        continue
+                    item.next_attempt = now + backoff_delay(item.attempts + 1)
+                    items.append(item)
+                if items:
+                    self._queues[peer_id] = items
+                    restored += len(items)
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="DeliveryWorker")
+        if restored:
+            log.info("[OUTBOX] Restored %s undelivered messages for %s peers", restored, len(self._queues))
+
+        self._scheduler = threading.Thread(target=self._schedule_loop, daemon=True, name="DeliveryScheduler")
+        self._scheduler.start()
+
+    def enqueue(self, peer_id: str, item: OutboundItem) -> bool:
+        with self._lock:
+            if self._stopped or self._executor is None:
+                return False
+            items = self._queues.setdefault(peer_id, deque())
+            if items and items[0].status == "queued":
+                item.status = "queued"
+            items.append(item)
+            self._mark_unsaved_locked(peer_id)
+        if item.status == "queued":
+            self.router._notify_message_status(peer_id, item.message.message_id, "queued")
+        self._wakeup.set()
+        return True
+
+    def flush(self, peer_id: str):
+        now = time.monotonic()
+        with self._lock:
+            items = self._queues.get(peer_id)
+            if not items:
+                return
+            start_at = now + random.uniform(0, config.OUTBOX_FLUSH_JITTER)
+            for item in items:
+                item.next_attempt = min(item.next_attempt, start_at)
+            count = len(items)
+        log.info("[OUTBOX] Peer %s is online, flushing %s queued messages", peer_id, count)
+        self._wakeup.set()
+
+    def pending_items(self, peer_id: str) -> List[OutboundItem]:
+        with self._lock:
+            return list(self._queues.get(peer_id, ()))
+
+    def pending_count(self, peer_id: Optional[str] = None) -> int:
+        with self._lock:
+            if peer_id is not None:
+                return len(self._queues.get(peer_id, ()))
+            return sum(len(items) for items in self._queues.values())
+
+    def drop(self, peer_id: str):
+        with self._save_lock:
+            with self._lock:
+                dropped = len(self._queues.pop(peer_id, ()))
+                self._unsaved.discard(peer_id)
+            self.router.data_manager.delete_outbox(peer_id)
+        if dropped:
+            log.info("[OUTBOX] Dropped %s undelivered messages to removed peer %s", dropped, peer_id)
+
+    def stop(self):
+        with self._lock:
+            self._stopped = True
+            pending = sum(len(items) for items in self._queues.values())
+            executor = self._executor
+            self._executor = None
+        self._wakeup.set()
+        if executor:
+            executor.shutdown(wait=True, cancel_futures=True)
+        self.save()
+        if pending:
+            log.info("[OUTBOX] %s undelivered messages kept for next start", pending)
+
+    def _schedule_loop(self):
+        timeout = 0.0
+        while True:
+            self._wakeup.wait(timeout)
+            self._wakeup.clear()
+            now = time.monotonic()
+            ready = []
+            timeout = config.OUTBOX_TICK
+            with self._lock:
+                if self._stopped:
+                    return
+                for peer_id, items in self._queues.items():
+                    if not items or peer_id in self._draining:
+                        continue
+                    if items[0].next_attempt <= now:
+                        self._draining.add(peer_id)
+                        ready.append(peer_id)
+                    else:
+                        timeout = min(timeout, items[0].next_attempt - now)
+                executor = self._executor
+            for peer_id in ready:
+                try:
+                    executor.submit(self._drain, peer_id)
+                except RuntimeError:
+                    return
+
+    def _drain(self, peer_id: str):
+        try:
+            while self._drain_once(peer_id):
+                pass
+        finally:
+            with self._lock:
+                self._draining.discard(peer_id)
+                if not self._queues.get(peer_id):
+                    self._queues.pop(peer_id, None)
+            self._wakeup.set()
+
+    def _drain_once(self, peer_id: str) -> bool:
+        now = time.monotonic()
+        with self._lock:
+            items = self._queues.get(peer_id)
+            if self._stopped or not items or items[0].next_attempt > now:
+                return False
+            head = items[0]
+            if head.file_path:
+                batch = [head]
+            else:
+                batch = []
+                for item in items:
+                    if item.file_path or len(batch) >= config.OUTBOX_BATCH_SIZE:
+                        break
+                    batch.append(item)
+
+        expired = [item for item in batch if time.time() - item.queued_at > config.OUTBOX_MAX_AGE]
+        if expired or (head.file_path and not os.path.isfile(head.file_path)):
+            dropped = expired or [head]
+            log.warning("[OUTBOX] Giving up on %s messages to %s", len(dropped), peer_id)
+            self._finish(peer_id, dropped, "failed")
+            return True
+
+        try:
+            if head.file_path:
+                delivered = 1 if self.router._deliver(peer_id, head) else 0
+            else:
+                delivered = self.router._deliver_batch(peer_id, [item.message for item in batch])
+        except Exception as e:
+            log.error("[DELIVERY] Error delivering to %s: %s", peer_id, e, exc_info=True)
+            delivered = 0
+
+        if delivered:
+            self._finish(peer_id, batch[:delivered], "sent")
+        if delivered == len(batch):
+            return True
+
+        failed = batch[delivered]
+        with self._lock:
+            failed.attempts += 1
+            failed.next_attempt = time.monotonic() + backoff_delay(failed.attempts)
+            if peer_id in self._queues:
+                self._mark_unsaved_locked(peer_id)
+            waiting = len(self._queues.get(peer_id, ()))
+        log.info("[OUTBOX] %s unreachable, %s messages queued (retry #%s in %.0fs)", peer_id, waiting,
+                 failed.attempts, failed.next_attempt - time.monotonic())
+        for item in batch[delivered:]:
+            if item.status != "queued":
+                item.status = "queued"
+                self.router._notify_message_status(peer_id, item.message.message_id, "queued")
+        return False
+
+    def _finish(self, peer_id: str, done: List[OutboundItem], status: str):
+        done_ids = {id(item) for item in done}
+        with self._lock:
+            items = self._queues.get(peer_id)
+            if items is not None:
+                self._queues[peer_id] = deque(item for item in items if id(item) not in done_ids)
+                self._mark_unsaved_locked(peer_id)
+        for item in done:
+            item.status = status
+            self.router._notify_message_status(peer_id, item.message.message_id, status)
+
+    def save(self):
+        with self._save_lock:
+            with self._lock:
+                if self._save_timer is not None:
+                    self._save_timer.cancel()
+                    self._save_timer = None
+                snapshot = {peer_id: list(self._queues.get(peer_id, ())) for peer_id in self._unsaved}
+                self._unsaved = set()
+
+            for peer_id, items in snapshot.items():
+                try:
+                    self.router.data_manager.save_outbox(peer_id, [item.to_dict() for item in items])
+                except Exception as e:
+                    log.error("[OUTBOX] Failed to persist outbox for %s, will retry: %s", peer_id, e)
+                    with self._lock:
+                        self._mark_unsaved_locked(peer_id)
+
+    def _mark_unsaved_locked(self, peer_id: str):
+        self._unsaved.add(peer_id)
+        if self._save_timer is not None or self._stopped:
+            return
+        self._save_timer = threading.Timer(config.OUTBOX_SAVE_DELAY, self._on_save_timer)
+        self._save_timer.daemon = True
+        self._save_timer.start()
+
+    def _on_save_timer(self):
+        with self._lock:
+            self._save_timer = None
+        self.save()
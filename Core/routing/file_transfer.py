@@ -0,0 +1,632 @@
+from __future__ import annotations
+
+import base64
+import hashlib
+import json
+import logging
+import os
+import queue
+import struct
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from pathlib import Path
+from typing import BinaryIO, Dict, Optional, Tuple
+
+from Core.models.message import Message
+from Core.models.peer_info import PeerInfo
+from Core.networking.connection_pool import PooledConnection
+from Core.networking.framing import FRAME_FILE_CHUNK, FRAME_HEADER
+from Core.storage.blob_store import attach_blob, file_hash, is_blob_hash
+from Core.utils import config
+
+log = logging.getLogger(__name__)
+
+CHUNK_HEADER = struct.Struct("!16sQ32s")
+
+class IncomingTransfer:
+
+    def __init__(self, transfer_id: str, peer_id: str, sender_name: str, sender_ip: str, file_name: str,
+                 file_size: int, file_type: str, text: str, timestamp: float, partial_path: Path,
+                 manifest_path: Path, handle: BinaryIO, received: int = 0, blob_hash: Optional[str] = None):
+        self.transfer_id = transfer_id
+        self.peer_id = peer_id
+        self.sender_name = sender_name
+        self.sender_ip = sender_ip
+        self.file_name = file_name
+        self.file_size = file_size
+        self.file_type = file_type
+        self.text = text
+        self.timestamp = timestamp
+        self.partial_path = partial_path
+        self.manifest_path = manifest_path
+        self.handle = handle
+        self.received = received
+        self.blob_hash = blob_hash
+        self.hash_mismatches = 0
+        self.reported = received
+        self.checkpointed = received
+        self.last_activity = time.monotonic()
+
+    def to_manifest(self) -> Dict:
+        return {
+            "transfer_id": self.transfer_id,
+            "peer_id": self.peer_id,
+            "sender_name": self.sender_name,
+            "file_name": self.file_name,
+            "file_size": self.file_size,
+            "file_type": self.file_type,
+            "text": self.text,
+            "timestamp": self.timestamp,
+            "blob_hash": self.blob_hash,
+            "verified_offset": self.received,
+            "updated_at": time.time(),
+        }
+
+
+class FileTransferManager:
+
+    def __init__(self, router):
+        self.router = router
+        self._incoming: Dict[str, IncomingTransfer] = {}
+        self._completed: Dict[str, float] = {}
+        self._rejected: Dict[str, float] = {}
+        self._replies: Dict[str, queue.Queue] = {}
+        self._hash_cache: "OrderedDict[Tuple[str, int, int], str]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._swept_at = 0.0
+
+    def send_file(self, target: PeerInfo, file_path: str, file_type: str = "file", text: str = "",
+                  transfer_id: str = None, timestamp: float = None, file_name: str = None,
+                  blob_hash: str = None) -> Tuple[bool, Optional[Message]]:
+        path = Path(file_path)
+        try:
+            stat = path.stat()
+        except OSError as e:
+            log.warning("Cannot read file %s: %s", file_path, e)
+            return False, None
+        file_size = stat.st_size
+        file_name = file_name or path.name
+        blob_hash = blob_hash or self._content_hash(path, stat)
+
+        transfer_id = transfer_id or str(uuid.uuid4())
+        timestamp = timestamp or time.time()
+        replies: queue.Queue = queue.Queue()
+        with self._lock:
+            self._replies[transfer_id] = replies
+
+        try:
+            delivered = False
+            connected = False
+            delay = config.FILE_RETRY_DELAY
+            for attempt in range(config.FILE_TRANSFER_RETRIES + 1):
+                if attempt:
+                    log.info("Retrying transfer %s to %s in %.1fs (attempt %s)", transfer_id, target.display_name, delay, attempt + 1)
+                    time.sleep(delay)
+                    delay = min(delay * 2, config.FILE_RETRY_MAX_DELAY)
+                while not replies.empty():
+                    replies.get_nowait()
+                try:
+                    with self.router.peer_client.session(target.ip, target.tcp_port) as conn:
+                        connected = True
+                        if not conn.framed:
+                            break
+                        delivered = self._send_attempt(conn, replies, target, path, file_name, blob_hash, transfer_id,
+                                                       file_size, file_type, text, timestamp)
+                except (OSError, ConnectionError, TimeoutError) as e:
+                    log.warning("File transfer %s to %s interrupted: %s", transfer_id, target.display_name, e)
+                    if not connected:
+                        return False, None
+                    continue
+                if delivered:
+                    break
+            else:
+                log.warning("Giving up on transfer %s to %s after %s attempts", transfer_id, target.display_name, attempt + 1)
+                return False, None
+        finally:
+            with self._lock:
+                self._replies.pop(transfer_id, None)
+
+        if not delivered:
+            return self._send_legacy(target, path, file_name, transfer_id, timestamp, file_type, text)
+
+        chat_message = Message(
+            message_id=transfer_id,
+            sender_id=self.router.peer_id,
+            sender_name=self.router.display_name or "Unknown",
+            receiver_id=target.peer_id,
+            content=json.dumps({"text": text}, ensure_ascii=False),
+            timestamp=timestamp,
+            msg_type=file_type,
+            file_name=file_name,
+        )
+        if self.router.data_manager:
+            try:
+                blob_hash = self.router.data_manager.store_attachment(target.peer_id, str(path), file_name, blob_hash)
+                chat_message.content = attach_blob(chat_message.content, blob_hash)
+            except OSError as e:
+                log.warning("Failed to keep local copy of %s: %s", file_name, e)
+            self.router.data_manager.append_message(chat_message, target.peer_id)
+        return True, chat_message
+
+    def _send_attempt(self, conn: PooledConnection, replies: queue.Queue, target: PeerInfo, path: Path, file_name: str,
+                      blob_hash: Optional[str], transfer_id: str, file_size: int, file_type: str, text: str,
+                      timestamp: float) -> bool:
+        offer = Message.create_file_offer(
+            sender_id=self.router.peer_id,
+            sender_name=self.router.display_name or "Unknown",
+            receiver_id=target.peer_id,
+            transfer_id=transfer_id,
+            file_name=file_name,
+            file_size=file_size,
+            file_type=file_type,
+            text=text,
+            timestamp=timestamp,
+            blob_hash=blob_hash,
+        )
+        conn.send_json(offer.to_json().encode("utf-8"))
+        offset, complete = self._wait_reply(replies, transfer_id)
+        if complete:
+            log.info("%s already has %s, skipped upload of %s bytes", target.display_name, file_name, file_size)
+            return True
+        if offset:
+            log.info("Resuming transfer %s to %s at %s/%s bytes", transfer_id, target.display_name, offset, file_size)
+        else:
+            log.info("Streaming %s (%s bytes) to %s as transfer %s", file_name, file_size, target.display_name, transfer_id)
+
+        self._stream_chunks(conn, path, transfer_id, target.peer_id, offset, file_size)
+        done = Message.create_file_done(
+            sender_id=self.router.peer_id,
+            sender_name=self.router.display_name or "Unknown",
+            receiver_id=target.peer_id,
+            transfer_id=transfer_id,
+            file_size=file_size,
+        )
+        conn.send_json(done.to_json().encode("utf-8"))
+        offset, complete = self._wait_reply(replies, transfer_id)
+        if not complete:
+            log.warning("Receiver verified only %s/%s bytes of transfer %s", offset, file_size, transfer_id)
+        return complete
+
+    def _wait_reply(self, replies: queue.Queue, transfer_id: str) -> Tuple[int, bool]:
+        try:
+            return replies.get(timeout=config.FILE_ACCEPT_TIMEOUT)
+        except queue.Empty:
+            raise TimeoutError(f"No FILE_ACCEPT for transfer {transfer_id}")
+
+    def _stream_chunks(self, conn: PooledConnection, path: Path, transfer_id: str, peer_id: str, offset: int, file_size: int):
+        header_size = FRAME_HEADER.size + CHUNK_HEADER.size
+        buffer = bytearray(header_size + config.FILE_CHUNK_SIZE)
+        view = memoryview(buffer)
+        transfer_key = uuid.UUID(transfer_id).bytes
+
+        reported = offset
+        self._notify_progress(peer_id, transfer_id, offset, file_size)
+        with open(path, "rb") as f:
+            f.seek(offset)
+            while offset < file_size:
+                wanted = min(config.FILE_CHUNK_SIZE, file_size - offset)
+                chunk = view[header_size:header_size + wanted]
+                read = f.readinto(chunk)
+                if not read:
+                    raise OSError(f"{path.name} shrank during transfer")
+                FRAME_HEADER.pack_into(buffer, 0, FRAME_FILE_CHUNK, CHUNK_HEADER.size + read)
+                CHUNK_HEADER.pack_into(buffer, FRAME_HEADER.size, transfer_key, offset, hashlib.sha256(chunk[:read]).digest())
+                conn.sendall(view[:header_size + read])
+                offset += read
+                if offset - reported >= config.FILE_PROGRESS_STEP or offset == file_size:
+                    reported = offset
+                    self._notify_progress(peer_id, transfer_id, offset, file_size)
+
+    def _content_hash(self, path: Path, stat: os.stat_result) -> Optional[str]:
+        key = (str(path.resolve()), stat.st_mtime_ns, stat.st_size)
+        with self._lock:
+            blob_hash = self._hash_cache.get(key)
+            if blob_hash:
+                self._hash_cache.move_to_end(key)
+                return blob_hash
+        try:
+            blob_hash = file_hash(path)
+        except OSError as e:
+            log.warning("Cannot hash file %s: %s", path, e)
+            return None
+        with self._lock:
+            self._hash_cache[key] = blob_hash
+            while len(self._hash_cache) > config.FILE_HASH_CACHE_SIZE:
+                self._hash_cache.popitem(last=False)
+        return blob_hash
+
+    def _send_legacy(self, target: PeerInfo, path: Path, file_name: str, transfer_id: str, timestamp: float,
+                     file_type: str, text: str) -> Tuple[bool, Optional[Message]]:
+        log.info("Peer %s does not support streaming, sending %s inline", target.display_name, file_name)
+        try:
+            with open(path, "rb") as f:
+                file_data = base64.b64encode(f.read()).decode("utf-8")
+        except OSError as e:
+            log.warning("Cannot read file %s: %s", path, e)
+            return False, None
+        message = self.router._build_message(target.peer_id, text, msg_type=file_type, file_name=file_name, file_data=file_data)
+        message.message_id = transfer_id
+        message.timestamp = timestamp
+        if not self.router._transmit(target, message):
+            return False, None
+        return True, message
+
+    def handle_file_accept(self, message: Message, sender_ip: str):
+        try:
+            reply = json.loads(message.content)
+            transfer_id = str(uuid.UUID(reply["transfer_id"]))
+            offset = int(reply.get("offset", 0))
+            complete = bool(reply.get("complete", False))
+        except (json.JSONDecodeError, KeyError, TypeError, ValueError) as e:
+            log.warning("Invalid FILE_ACCEPT from %s: %s", message.sender_id, e)
+            return
+
+        with self._lock:
+            replies = self._replies.get(transfer_id)
+        if not replies:
+            log.debug("Ignored FILE_ACCEPT for unknown transfer %s", transfer_id)
+            return
+        replies.put((max(offset, 0), complete))
+
+    def handle_file_offer(self, message: Message, sender_ip: str):
+        peer_id = message.sender_id
+        with self.router._lock:
+            if peer_id not in self.router._peers:
+                log.debug("[BLOCK] Ignored file offer from %s (not in friends list)", peer_id)
+                return
+
+        try:
+            offer = json.loads(message.content)
+            transfer_id = str(uuid.UUID(offer["transfer_id"]))
+            file_name = Path(str(offer["file_name"])).name or "file"
+            file_size = int(offer["file_size"])
+            file_type = offer.get("file_type") if offer.get("file_type") in ("file", "image") else "file"
+            text = str(offer.get("text") or "")
+            timestamp = float(offer.get("timestamp") or message.timestamp)
+        except (json.JSONDecodeError, KeyError, TypeError, ValueError) as e:
+            log.warning("Invalid file offer from %s: %s", peer_id, e)
+            return
+        if file_size < 0 or not self.router.data_manager:
+            return
+
+        with self._lock:
+            already_done = transfer_id in self._completed
+            rejected = transfer_id in self._rejected
+            transfer = self._incoming.get(transfer_id)
+        if rejected:
+            log.warning("Ignored file offer %s from %s (content did not match its hash)", transfer_id, peer_id)
+            return
+        if already_done:
+            self._send_accept(peer_id, transfer_id, file_size, complete=True)
+            return
+        if transfer and transfer.peer_id != peer_id:
+            log.warning("Ignored file offer %s from %s (transfer belongs to another peer)", transfer_id, peer_id)
+            return
+
+        blob_hash = offer.get("blob_hash")
+        if is_blob_hash(blob_hash) and self.router.data_manager.reference_attachment(peer_id, blob_hash):
+            if transfer:
+                with self._lock:
+                    self._incoming.pop(transfer_id, None)
+                self._abort(transfer)
+            with self._lock:
+                self._completed[transfer_id] = time.monotonic()
+            self._send_accept(peer_id, transfer_id, file_size, complete=True)
+            log.info("Already have %s from %s, skipped download of %s bytes", file_name, message.sender_name, file_size)
+            self._deliver_incoming(peer_id, transfer_id, message.sender_name, text, timestamp, file_type, file_name,
+                                   blob_hash, file_size)
+            return
+
+        self._expire_stale_transfers()
+        if transfer:
+            transfer.sender_ip = sender_ip
+            transfer.last_activity = time.monotonic()
+            self._checkpoint(transfer)
+        else:
+            transfer = self._open_transfer(peer_id, sender_ip, transfer_id, {
+                "sender_name": message.sender_name,
+                "file_name": file_name,
+                "file_size": file_size,
+                "file_type": file_type,
+                "text": text,
+                "timestamp": timestamp,
+                "blob_hash": blob_hash if is_blob_hash(blob_hash) else None,
+            })
+            if not transfer:
+                return
+            with self._lock:
+                self._incoming[transfer_id] = transfer
+
+        if transfer.received:
+            log.info("Resuming %s from %s at %s/%s bytes", transfer.file_name, message.sender_name, transfer.received, transfer.file_size)
+        else:
+            log.info("Receiving %s (%s bytes) from %s as transfer %s", file_name, file_size, message.sender_name, transfer_id)
+        self._notify_progress(peer_id, transfer_id, transfer.received, transfer.file_size)
+        self._send_accept(peer_id, transfer_id, transfer.received)
+
+    def handle_chunk(self, payload: memoryview, sender_ip: str):
+        if len(payload) < CHUNK_HEADER.size:
+            log.warning("Truncated file chunk from %s", sender_ip)
+            return
+        transfer_key, offset, digest = CHUNK_HEADER.unpack_from(payload)
+        transfer_id = str(uuid.UUID(bytes=transfer_key))
+
+        with self._lock:
+            transfer = self._incoming.get(transfer_id)
+        if not transfer or transfer.sender_ip != sender_ip:
+            log.debug("Ignored chunk for unknown transfer %s from %s", transfer_id, sender_ip)
+            return
+
+        data = payload[CHUNK_HEADER.size:]
+        if offset != transfer.received or transfer.received + len(data) > transfer.file_size:
+            log.debug("Skipped chunk at %s for transfer %s (verified up to %s)", offset, transfer_id, transfer.received)
+            return
+        if hashlib.sha256(data).digest() != digest:
+            log.warning("Chunk at %s for transfer %s failed verification", offset, transfer_id)
+            return
+
+        try:
+            transfer.handle.write(data)
+        except (OSError, ValueError) as e:
+            log.warning("Failed to write chunk for transfer %s: %s", transfer_id, e)
+            return
+
+        transfer.received += len(data)
+        transfer.last_activity = time.monotonic()
+        if transfer.received - transfer.checkpointed >= config.FILE_MANIFEST_INTERVAL:
+            self._checkpoint(transfer)
+        if transfer.received - transfer.reported >= config.FILE_PROGRESS_STEP:
+            transfer.reported = transfer.received
+            self._notify_progress(transfer.peer_id, transfer_id, transfer.received, transfer.file_size)
+
+    def handle_file_done(self, message: Message, sender_ip: str):
+        try:
+            done = json.loads(message.content)
+            transfer_id = str(uuid.UUID(done["transfer_id"]))
+        except (json.JSONDecodeError, KeyError, TypeError, ValueError) as e:
+            log.warning("Invalid FILE_DONE from %s: %s", message.sender_id, e)
+            return
+
+        with self._lock:
+            transfer = self._incoming.get(transfer_id)
+            if transfer and transfer.peer_id != message.sender_id:
+                transfer = None
+            if transfer and transfer.received == transfer.file_size:
+                del self._incoming[transfer_id]
+        if not transfer:
+            log.debug("FILE_DONE for unknown transfer %s, asking sender to restart", transfer_id)
+            self._send_accept(message.sender_id, transfer_id, 0)
+            return
+
+        if transfer.received != transfer.file_size:
+            log.warning("Transfer %s incomplete (%s/%s bytes), asking sender to resume", transfer_id, transfer.received, transfer.file_size)
+            self._checkpoint(transfer)
+            self._send_accept(transfer.peer_id, transfer_id, transfer.received)
+            return
+
+        try:
+            transfer.handle.close()
+        except OSError:
+            pass
+        data_manager = self.router.data_manager
+        try:
+            received_hash = file_hash(transfer.partial_path)
+            if transfer.blob_hash and received_hash != transfer.blob_hash:
+                self._reject_content(transfer, received_hash)
+                return
+            blob_hash = data_manager.adopt_attachment(transfer.peer_id, transfer.partial_path, transfer.file_name,
+                                                      received_hash)
+        except OSError as e:
+            log.warning("Failed to store received file %s: %s", transfer.file_name, e)
+            self._abort(transfer)
+            return
+        self._remove_manifest(transfer.manifest_path)
+        with self._lock:
+            self._completed[transfer_id] = time.monotonic()
+        self._send_accept(transfer.peer_id, transfer_id, transfer.received, complete=True)
+        log.info("Received %s from %s (%s bytes)", transfer.file_name, transfer.sender_name, transfer.received)
+        self._deliver_incoming(transfer.peer_id, transfer_id, transfer.sender_name, transfer.text, transfer.timestamp,
+                               transfer.file_type, transfer.file_name, blob_hash, transfer.file_size)
+
+    def _reject_content(self, transfer: IncomingTransfer, received_hash: str):
+        transfer.hash_mismatches += 1
+        if transfer.hash_mismatches > config.FILE_HASH_MISMATCH_RETRIES:
+            log.error("Discarding %s from %s: content hash %s still does not match offered %s",
+                      transfer.file_name, transfer.sender_name, received_hash, transfer.blob_hash)
+            self._abort(transfer)
+            with self._lock:
+                self._rejected[transfer.transfer_id] = time.monotonic()
+            return
+        log.warning("Content hash of %s from %s is %s, offered %s; downloading it again",
+                    transfer.file_name, transfer.sender_name, received_hash, transfer.blob_hash)
+        try:
+            transfer.handle = open(transfer.partial_path, "wb")
+        except OSError as e:
+            log.warning("Cannot reopen %s for incoming file: %s", transfer.partial_path, e)
+            self._abort(transfer)
+            return
+        transfer.received = transfer.reported = transfer.checkpointed = 0
+        transfer.last_activity = time.monotonic()
+        self._write_manifest(transfer)
+        with self._lock:
+            self._incoming[transfer.transfer_id] = transfer
+        self._send_accept(transfer.peer_id, transfer.transfer_id, 0)
+
+    def _deliver_incoming(self, peer_id: str, transfer_id: str, sender_name: str, text: str, timestamp: float,
+                          file_type: str, file_name: str, blob_hash: str, file_size: int):
+        chat_message = Message(
+            message_id=transfer_id,
+            sender_id=peer_id,
+            sender_name=sender_name,
+            receiver_id=self.router.peer_id,
+            content=json.dumps({"text": text, "blob_hash": blob_hash}, ensure_ascii=False),
+            timestamp=timestamp,
+            msg_type=file_type,
+            file_name=file_name,
+        )
+        self.router.data_manager.append_message(chat_message, peer_id)
+        self._notify_progress(peer_id, transfer_id, file_size, file_size)
+
+        if self.router._on_message_callback:
+            self.router._on_message_callback(chat_message)
+
+    def remove_stale_partials(self):
+        data_manager = self.router.data_manager
+        if not data_manager:
+            return
+        with self._lock:
+            active = set(self._incoming)
+            self._swept_at = time.monotonic()
+        removed = data_manager.remove_stale_transfers(config.FILE_PARTIAL_MAX_AGE, active)
+        if removed:
+            log.info("Removed %s partial downloads idle for more than %.0f hours", removed, config.FILE_PARTIAL_MAX_AGE / 3600)
+
+    def close(self):
+        with self._lock:
+            transfers = list(self._incoming.values())
+            self._incoming.clear()
+        for transfer in transfers:
+            self._suspend(transfer)
+
+    def _open_transfer(self, peer_id: str, sender_ip: str, transfer_id: str, info: Dict) -> Optional[IncomingTransfer]:
+        data_manager = self.router.data_manager
+        partial_path = data_manager.get_partial_file_path(peer_id, transfer_id)
+        manifest_path = data_manager.get_transfer_manifest_path(peer_id, transfer_id)
+
+        verified = 0
+        manifest = self._load_manifest(manifest_path)
+        if (manifest and manifest.get("peer_id") == peer_id and manifest.get("file_size") == info["file_size"]
+                and manifest.get("blob_hash") == info["blob_hash"] and partial_path.exists()):
+            try:
+                verified = min(int(manifest.get("verified_offset", 0)), partial_path.stat().st_size)
+            except (OSError, TypeError, ValueError):
+                verified = 0
+
+        try:
+            if verified:
+                handle = open(partial_path, "r+b")
+                handle.truncate(verified)
+                handle.seek(verified)
+            else:
+                handle = open(partial_path, "wb")
+        except OSError as e:
+            log.warning("Cannot open %s for incoming file: %s", partial_path, e)
+            return None
+
+        transfer = IncomingTransfer(
+            transfer_id=transfer_id,
+            peer_id=peer_id,
+            sender_name=info["sender_name"],
+            sender_ip=sender_ip,
+            file_name=info["file_name"],
+            file_size=info["file_size"],
+            file_type=info["file_type"],
+            text=info["text"],
+            timestamp=info["timestamp"],
+            partial_path=partial_path,
+            manifest_path=manifest_path,
+            handle=handle,
+            received=verified,
+            blob_hash=info["blob_hash"],
+        )
+        self._write_manifest(transfer)
+        return transfer
+
+    def _checkpoint(self, transfer: IncomingTransfer):
+        try:
+            transfer.handle.flush()
+            os.fsync(transfer.handle.fileno())
+        except (OSError, ValueError) as e:
+            log.warning("Failed to flush transfer %s: %s", transfer.transfer_id, e)
+            return
+        transfer.checkpointed = transfer.received
+        self._write_manifest(transfer)
+
+    def _write_manifest(self, transfer: IncomingTransfer):
+        temp_path = transfer.manifest_path.with_suffix(".tmp")
+        try:
+            with open(temp_path, "w", encoding="utf-8") as f:
+                json.dump(transfer.to_manifest(), f, ensure_ascii=False)
+            os.replace(temp_path, transfer.manifest_path)
+        except OSError as e:
+            log.warning("Failed to write manifest for transfer %s: %s", transfer.transfer_id, e)
+
+    def _load_manifest(self, manifest_path: Path) -> Optional[Dict]:
+        if not manifest_path.exists():
+            return None
+        try:
+            with open(manifest_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            log.warning("Ignoring unreadable manifest %s: %s", manifest_path, e)
+            return None
+
+    def _remove_manifest(self, manifest_path: Path):
+        try:
+            manifest_path.unlink()
+        except OSError:
+            pass
+
+    def _send_accept(self, peer_id: str, transfer_id: str, offset: int, complete: bool = False):
+        with self.router._lock:
+            peer = self.router._peers.get(peer_id)
+        if not peer or not peer.ip or not peer.tcp_port:
+            log.warning("Cannot answer transfer %s: no address for %s", transfer_id, peer_id)
+            return
+        reply = Message.create_file_accept(
+            sender_id=self.router.peer_id,
+            sender_name=self.router.display_name or "Unknown",
+            receiver_id=peer_id,
+            transfer_id=transfer_id,
+            offset=offset,
+            complete=complete,
+        )
+        if not self.router.peer_client.send(peer.ip, peer.tcp_port, reply):
+            log.warning("Failed to send FILE_ACCEPT for transfer %s to %s", transfer_id, peer.display_name)
+
+    def _expire_stale_transfers(self):
+        now = time.monotonic()
+        with self._lock:
+            stale = [t for t in self._incoming.values() if now - t.last_activity > config.FILE_TRANSFER_IDLE_TIMEOUT]
+            for transfer in stale:
+                del self._incoming[transfer.transfer_id]
+            for transfer_id, finished_at in list(self._completed.items()):
+                if now - finished_at > config.FILE_TRANSFER_IDLE_TIMEOUT:
+                    del self._completed[transfer_id]
+            for transfer_id, rejected_at in list(self._rejected.items()):
+                if now - rejected_at > config.FILE_TRANSFER_IDLE_TIMEOUT:
+                    del self._rejected[transfer_id]
+            sweep = now - self._swept_at > config.FILE_TRANSFER_IDLE_TIMEOUT
+        for transfer in stale:
+            log.info("Suspending stalled transfer %s (%s/%s bytes)", transfer.transfer_id, transfer.received, transfer.file_size)
+            self._suspend(transfer)
+        if sweep:
+            self.remove_stale_partials()
+
+    def _suspend(self, transfer: IncomingTransfer):
+        self._checkpoint(transfer)
+        try:
+            transfer.handle.close()
+        except OSError:
+            pass
+
+    def _abort(self, transfer: IncomingTransfer):
+        try:
+            transfer.handle.close()
+        except OSError:
+            pass
+        for path in (transfer.partial_path, transfer.manifest_path):
+            try:
+                path.unlink()
+            except OSError:
+                pass
+
+    def _notify_progress(self, peer_id: str, transfer_id: str, done: int, total: int):
+        callback = self.router._on_file_progress_callback
+        if callback:
+            try:
+                callback(peer_id, transfer_id, done, total)
+            except Exception as e:
+                log.error("Error in file progress callback: %s", e, exc_info=True)
@@ -1,7 +1,5 @@
-import base64
 import json
 import logging
-from pathlib import Path
 from typing import Optional
 
 from Core.models.message import Message
@@ -100,6 +98,7 @@ class MessageHandlers:
                         if self.router.data_manager:
                             self.router.data_manager.delete_peer(old_peer_id)
                             log.info("[HELLO_REPLY] Deleted temp peer %s from storage", old_peer_id)
+                        self.router._notify_peer_removed(old_peer_id)
                 
                 if actual_peer_id in self.router._peers:
                     peer_info = self.router._peers[actual_peer_id]
@@ -299,25 +298,10 @@ class MessageHandlers:
             if sender_ip and sender_ip != "0.0.0.0" and sender_ip != "":
                 peer.ip = sender_ip
             
+            content_data = {}
             if msg_type == "ONLINE" and message.content:
                 try:
                     content_data = json.loads(message.content)
-                    if "avatar_base64" in content_data and content_data["avatar_base64"]:
-                        try:
-                            avatar_data = base64.b64decode(content_data["avatar_base64"])
-                            
-                            if self.router.data_manager:
-                                peer_dir = self.router.data_manager.root / "chats" / peer.peer_id
-                                peer_dir.mkdir(parents=True, exist_ok=True)
-                                avatar_file = peer_dir / "avatar.jpg"
-                                with open(avatar_file, 'wb') as f:
-                                    f.write(avatar_data)
-                                
-                                peer.avatar_path = str(avatar_file)
-                                log.info("[STATUS] Saved avatar for %s to %s", peer.display_name, avatar_file)
-                                self.router.data_manager.update_peer(peer)
-                        except Exception as e:
-                            log.warning("[STATUS] Failed to save avatar for %s: %s", peer.display_name, e)
                 except (json.JSONDecodeError, ValueError):
                     pass
             
@@ -328,22 +312,11 @@ class MessageHandlers:
             if msg_type == "ONLINE" and old_status != "online":
                 log.info("[STATUS] Replying ONLINE back to %s", peer.display_name)
                 try:
-                    avatar_base64 = None
-                    avatar_path = getattr(self.router, 'avatar_path', None)
-                    if avatar_path:
-                        try:
-                            avatar_file = Path(avatar_path)
-                            if avatar_file.exists():
-                                with open(avatar_file, 'rb') as f:
-                                    avatar_base64 = base64.b64encode(f.read()).decode('utf-8')
-                        except Exception as e:
-                            log.warning("Failed to read avatar file %s: %s", avatar_path, e)
-                    
                     reply_msg = Message.create_online_status(
                         sender_id=self.router.peer_id,
                         sender_name=self.router.display_name or "Unknown",
                         receiver_id=peer.peer_id,
-                        avatar_base64=avatar_base64
+                        avatar_hash=self.router.avatar_manager.local_hash()
                     )
                     self.router.peer_client.send(peer.ip, peer.tcp_port, reply_msg)
                     log.info("[STATUS] ✓ Sent ONLINE reply to %s", peer.display_name)
@@ -356,6 +329,14 @@ class MessageHandlers:
                     log.info("[STATUS] ✓ Triggered peer callback for %s", peer.display_name)
                 except Exception as e:
                     log.error("[STATUS] ✗ Error in peer callback for %s: %s", message.sender_id, e, exc_info=True)
+        
+        if msg_type == "ONLINE":
+            if isinstance(content_data, dict):
+                if content_data.get("avatar_hash"):
+                    self.router.avatar_manager.apply_remote(message.sender_id, content_data["avatar_hash"])
+                elif content_data.get("avatar_base64"):
+                    self.router.avatar_manager.store_inline(message.sender_id, content_data["avatar_base64"])
+            self.router.delivery_queue.flush(message.sender_id)
     
     def handle_friend_reject(self, message: Message):
         log.info("Friend rejected by %s (%s)", message.sender_name, message.sender_id)
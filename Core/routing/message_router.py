@@ -1,23 +1,30 @@
 from __future__ import annotations
 
 import base64
+import binascii
+import hashlib
 import json
 import logging
 import threading
 import uuid
 from pathlib import Path
-from typing import Callable, Dict, List, Optional, Tuple
+from typing import Callable, Dict, List, Optional, Tuple, Union
 
 from Core.models.message import Message
 from Core.models.peer_info import PeerInfo
 from Core.networking.peer_client import PeerClient
 from Core.networking.peer_listener import PeerListener
+from Core.networking.async_peer_listener import AsyncPeerListener
+from Core.networking.framing import FRAME_FILE_CHUNK
 from Core.storage.data_manager import DataManager
 from Core.utils import config
 from Core.routing.message_handlers import MessageHandlers
 from Core.routing.friend_request_manager import FriendRequestManager
 from Core.routing.peer_manager import PeerManager
 from Core.routing.status_broadcaster import StatusBroadcaster
+from Core.routing.avatar_manager import AvatarManager
+from Core.routing.file_transfer import FileTransferManager
+from Core.routing.delivery_queue import DeliveryQueue, OutboundItem
 
 log = logging.getLogger(__name__)
 
@@ -34,6 +41,7 @@ class MessageRouter:
 
         self._on_message_callback: Optional[Callable[[Message], None]] = None
         self._on_peer_callback: Optional[Callable[[PeerInfo], None]] = None
+        self._on_peer_removed_callback: Optional[Callable[[str], None]] = None
         self._on_friend_request_callback: Optional[Callable[[str, str], None]] = None
         self._on_friend_accepted_callback: Optional[Callable[[str], None]] = None
         self._on_friend_rejected_callback: Optional[Callable[[str], None]] = None
@@ -42,6 +50,10 @@ class MessageRouter:
         self._on_call_accept_callback: Optional[Callable[[str, int, int], None]] = None
         self._on_call_reject_callback: Optional[Callable[[str], None]] = None
         self._on_call_end_callback: Optional[Callable[[str], None]] = None
+        self._on_file_progress_callback: Optional[Callable[[str, str, int, int], None]] = None
+        self._on_message_status_callback: Optional[Callable[[str, str, str], None]] = None
+        self._on_thumbnail_callback: Optional[Callable[[str, str], None]] = None
+        self._thumbnail_encoder: Optional[Callable[[Path, Path], bool]] = None
         
         self._lock = threading.RLock()
         
@@ -55,12 +67,17 @@ class MessageRouter:
         self.friend_request_manager = FriendRequestManager(self)
         self.peer_manager = PeerManager(self)
         self.status_broadcaster = StatusBroadcaster(self)
+        self.avatar_manager = AvatarManager(self)
+        self.file_transfer = FileTransferManager(self)
+        self.delivery_queue = DeliveryQueue(self)
 
-    def connect_core(self, username: str, display_name: str, tcp_port: int, on_message_callback: Callable[[Message], None]):
+    def connect_core(self, username: str, display_name: str, tcp_port: int, on_message_callback: Callable[[Message], None],
+                     listener_mode: Optional[str] = None):
         self.display_name = display_name
         self._on_message_callback = on_message_callback
 
-        self.data_manager = DataManager(username)
+        self.data_manager = DataManager(username, self._thumbnail_encoder)
+        self.data_manager.thumbnails.on_ready = self._notify_thumbnail_ready
         profile = self.data_manager.load_profile()
         
         saved_peer_id = profile.get("peer_id")
@@ -95,7 +112,17 @@ class MessageRouter:
         def message_handler(msg, ip, port):
             self._handle_incoming_message_with_addr(msg, ip, port)
         
-        self.peer_listener = PeerListener(self.peer_id, self.data_manager, message_handler)
+        def frame_handler(kind, payload, ip, port):
+            self._handle_incoming_frame(kind, payload, ip, port)
+        
+        listener_mode = listener_mode or config.LISTENER_MODE
+        if listener_mode == "asyncio":
+            self.peer_listener = AsyncPeerListener(self.peer_id, self.data_manager, message_handler, frame_handler)
+        else:
+            if listener_mode != "threaded":
+                log.warning("Unknown listener mode %s, falling back to threaded", listener_mode)
+            self.peer_listener = PeerListener(self.peer_id, self.data_manager, message_handler, frame_handler)
+        log.info("[TCP] Using %s listener", listener_mode if listener_mode == "asyncio" else "threaded")
         try:
             desired_port = self.tcp_port
             actual_port = None
@@ -134,6 +161,9 @@ class MessageRouter:
                 log.info("  - Friend: %s (%s) at %s:%s", peer.display_name, peer_id[:8], peer.ip, peer.tcp_port)
         
         self._notify_existing_peers()
+        self.file_transfer.remove_stale_partials()
+        self.delivery_queue.start()
+        threading.Thread(target=self._load_search_index, daemon=True, name="SearchIndexLoader").start()
         
         import time
         time.sleep(0.2)
@@ -143,13 +173,27 @@ class MessageRouter:
         log.info("MessageRouter ready as %s (%s)", self.display_name, self.peer_id)
 
     def stop(self):
+        self.delivery_queue.stop()
         self.status_broadcaster.broadcast_status("offline")
+        stats = self.peer_client.stats()
+        log.info("[TCP] Connection pool: %s hits, %s misses (hit rate %.0f%%), %s evictions, %s reconnects",
+                 stats["hits"], stats["misses"], stats["hit_rate"] * 100, stats["evictions"], stats["reconnects"])
+        self.peer_client.close()
         if self.peer_listener:
             self.peer_listener.stop()
+        self.file_transfer.close()
+        if self.data_manager:
+            self.data_manager.close()
 
     def _handle_incoming_message_with_addr(self, message: Message, sender_ip: str = "", sender_port: int = 0):
         self._handle_incoming_message(message, sender_ip, sender_port)
     
+    def _handle_incoming_frame(self, kind: int, payload: memoryview, sender_ip: str = "", sender_port: int = 0):
+        if kind == FRAME_FILE_CHUNK:
+            self.file_transfer.handle_chunk(payload, sender_ip)
+        else:
+            log.warning("Unsupported frame type %s from %s:%s", kind, sender_ip, sender_port)
+    
     def _handle_incoming_message(self, message: Message, sender_ip: str = "", sender_port: int = 0):
         msg_type = message.msg_type
         
@@ -186,6 +230,21 @@ class MessageRouter:
         elif msg_type == "CALL_END":
             self.message_handlers.handle_call_end(message, sender_ip)
             return
+        elif msg_type == "FILE_OFFER":
+            self.file_transfer.handle_file_offer(message, sender_ip)
+            return
+        elif msg_type == "FILE_DONE":
+            self.file_transfer.handle_file_done(message, sender_ip)
+            return
+        elif msg_type == "FILE_ACCEPT":
+            self.file_transfer.handle_file_accept(message, sender_ip)
+            return
+        elif msg_type == "AVATAR_GET":
+            self.avatar_manager.handle_avatar_get(message, sender_ip)
+            return
+        elif msg_type == "AVATAR_DATA":
+            self.avatar_manager.handle_avatar_data(message, sender_ip)
+            return
         
         with self._lock:
             if message.sender_id not in self._peers:
@@ -195,25 +254,11 @@ class MessageRouter:
         if msg_type in ("text", "image", "file") and message.content:
             try:
                 content_data = json.loads(message.content)
-                if isinstance(content_data, dict) and "avatar_base64" in content_data and content_data["avatar_base64"]:
-                    with self._lock:
-                        peer = self._peers.get(message.sender_id)
-                        if peer:
-                            try:
-                                avatar_data = base64.b64decode(content_data["avatar_base64"])
-                                
-                                if self.data_manager:
-                                    peer_dir = self.data_manager.root / "chats" / peer.peer_id
-                                    peer_dir.mkdir(parents=True, exist_ok=True)
-                                    avatar_file = peer_dir / "avatar.jpg"
-                                    with open(avatar_file, 'wb') as f:
-                                        f.write(avatar_data)
-                                    
-                                    peer.avatar_path = str(avatar_file)
-                                    log.info("Saved avatar for %s from message to %s", peer.display_name, avatar_file)
-                                    self.data_manager.update_peer(peer)
-                            except Exception as e:
-                                log.warning("Failed to save avatar for %s: %s", peer.display_name, e)
+                if isinstance(content_data, dict):
+                    if content_data.get("avatar_hash"):
+                        self.avatar_manager.apply_remote(message.sender_id, content_data["avatar_hash"])
+                    elif content_data.get("avatar_base64"):
+                        self.avatar_manager.store_inline(message.sender_id, content_data["avatar_base64"])
             except (json.JSONDecodeError, ValueError, TypeError):
                 pass
         
@@ -231,14 +276,6 @@ class MessageRouter:
         peer_id = message.sender_id if message.sender_id != self.peer_id else message.receiver_id
         
         if self.data_manager:
-            try:
-                if message.msg_type in ("file", "image") and getattr(message, "file_name", None) and getattr(message, "file_data", None):
-                    import base64
-                    file_bytes = base64.b64decode(message.file_data)
-                    self.data_manager.save_file_for_peer(peer_id, message.file_name, file_bytes)
-            except Exception:
-                pass
-
             self.data_manager.append_message(message, peer_id)
         
         if self._on_message_callback:
@@ -251,50 +288,109 @@ class MessageRouter:
             log.error("Router not initialized. Cannot send message.")
             raise RuntimeError("Router not initialized.")
 
-        if not self.peer_listener or not self.peer_listener._thread or not self.peer_listener._thread.is_alive():
-            log.error("PeerListener not running. Cannot send message.")
-            return False, None
+        if msg_type in ("file", "image") and file_data and file_name:
+            return self._send_inline_file(to_peer_id, content, msg_type, file_name, file_data)
 
-        with self._lock:
-            target = self._peers.get(to_peer_id)
-        
+        target = self._get_send_target(to_peer_id)
         if not target:
-            log.warning("Cannot send message to %s: Peer not in friends list", to_peer_id)
-            return False, None
-        
-        if not target.ip or not target.tcp_port:
-            log.warning("Cannot send message to %s: Invalid IP (%s) or port (%s)", to_peer_id, target.ip, target.tcp_port)
             return False, None
 
-        if target.ip == "0.0.0.0" or target.ip == "":
-            log.warning("Cannot send message to %s: Invalid IP address", to_peer_id)
+        message = self._build_message(to_peer_id, content, msg_type, file_name, file_data, audio_data)
+        if not self._fits_frame(message):
             return False, None
+        success = self._transmit(target, message)
+        return success, message if success else None
 
-        if target.tcp_port == 0 or target.tcp_port < 55000 or target.tcp_port > 55199:
-            log.warning("Cannot send message to %s: Invalid port %s", to_peer_id, target.tcp_port)
+    def _send_inline_file(self, to_peer_id: str, content: str, msg_type: str, file_name: str,
+                          file_data: str) -> Tuple[bool, Optional[Message]]:
+        try:
+            data = base64.b64decode(file_data)
+            staged = self.data_manager.stage_attachment(data)
+        except (binascii.Error, ValueError, OSError) as e:
+            log.warning("Cannot prepare %s for sending: %s", file_name, e)
             return False, None
+        try:
+            return self.send_file(to_peer_id, str(staged), msg_type=msg_type, content=content,
+                                  file_name=file_name, blob_hash=hashlib.sha256(data).hexdigest())
+        finally:
+            self.data_manager.discard_staged_attachment(staged)
+
+    def queue_message(self, to_peer_id: str, content: str, msg_type: str = "text",
+                      file_name: str = None, file_data: str = None, audio_data: str = None) -> Optional[Message]:
+        
+        if not self.data_manager:
+            log.error("Router not initialized. Cannot send message.")
+            raise RuntimeError("Router not initialized.")
+
+        if not self._get_send_target(to_peer_id):
+            return None
+
+        message = self._build_message(to_peer_id, content, msg_type, file_name, file_data, audio_data)
+        if not self._fits_frame(message):
+            return None
+        if not self.delivery_queue.enqueue(to_peer_id, OutboundItem(message, text=content)):
+            return None
+        return message
+
+    def store_inline_attachment(self, to_peer_id: str, file_name: str, file_data: str) -> Optional[str]:
+        if not self.data_manager:
+            log.error("Router not initialized. Cannot store attachment.")
+            raise RuntimeError("Router not initialized.")
+        try:
+            blob_hash = self.data_manager.store_attachment_data(to_peer_id, base64.b64decode(file_data), file_name)
+        except (binascii.Error, ValueError, OSError) as e:
+            log.warning("Cannot store %s for sending: %s", file_name, e)
+            return None
+        path = self.data_manager.get_attachment_path(blob_hash)
+        return str(path) if path else None
 
+    def queue_file(self, to_peer_id: str, file_path: str, msg_type: str = "file", content: str = "",
+                   file_name: str = None) -> Optional[Message]:
+        
+        if not self.data_manager:
+            log.error("Router not initialized. Cannot send file.")
+            raise RuntimeError("Router not initialized.")
+
+        if not self._get_send_target(to_peer_id):
+            return None
+
+        message = Message.create(
+            sender_id=self.peer_id,
+            sender_name=self.display_name or "Unknown",
+            receiver_id=to_peer_id,
+            content=json.dumps({"text": content}, ensure_ascii=False),
+            msg_type=msg_type,
+            file_name=file_name or Path(file_path).name,
+        )
+        if not self.delivery_queue.enqueue(to_peer_id, OutboundItem(message, text=content, file_path=file_path)):
+            return None
+        return message
+
+    def _deliver(self, to_peer_id: str, item: OutboundItem) -> bool:
+        message = item.message
+        if item.file_path:
+            success, _ = self.send_file(to_peer_id, item.file_path, msg_type=message.msg_type, content=item.text,
+                                        transfer_id=message.message_id, timestamp=message.timestamp,
+                                        file_name=message.file_name)
+            return success
+
+        target = self._get_send_target(to_peer_id)
+        if not target:
+            return False
+        return self._transmit(target, message)
+
+    def _build_message(self, to_peer_id: str, content: str, msg_type: str = "text",
+                       file_name: str = None, file_data: str = None, audio_data: str = None) -> Message:
         if msg_type in ("text", "image", "file"):
-            avatar_base64 = None
-            avatar_path = getattr(self, 'avatar_path', None)
-            if avatar_path:
-                try:
-                    avatar_file = Path(avatar_path)
-                    if avatar_file.exists():
-                        with open(avatar_file, 'rb') as f:
-                            avatar_base64 = base64.b64encode(f.read()).decode('utf-8')
-                except Exception as e:
-                    log.warning("Failed to read avatar file %s: %s", avatar_path, e)
-            
             content_with_avatar = {
                 "text": content,
-                "avatar_base64": avatar_base64
+                "avatar_hash": self.avatar_manager.local_hash()
             }
             actual_content = json.dumps(content_with_avatar)
         else:
             actual_content = content
         
-        message = Message.create(
+        return Message.create(
             sender_id=self.peer_id,
             sender_name=self.display_name or "Unknown",
             receiver_id=to_peer_id,
@@ -305,37 +401,175 @@ class MessageRouter:
             audio_data=audio_data,
         )
 
+    def _deliver_batch(self, to_peer_id: str, messages: List[Message]) -> int:
+        target = self._get_send_target(to_peer_id)
+        if not target:
+            return 0
+
+        log.info("Sending %s messages to %s (%s) at %s:%s", len(messages), target.display_name, to_peer_id, target.ip, target.tcp_port)
+        sent = self.peer_client.send_many(target.ip, target.tcp_port, messages)
+        if sent and self.data_manager:
+            self.data_manager.append_messages(messages[:sent], to_peer_id)
+        if sent < len(messages):
+            failures = self._peer_send_failures.get(to_peer_id, 0) + 1
+            self._peer_send_failures[to_peer_id] = failures
+            log.warning("Delivered %s/%s messages to %s (%s) - connection refused or offline", sent, len(messages), to_peer_id, target.display_name)
+        else:
+            self._peer_send_failures.pop(to_peer_id, None)
+        return sent
+
+    def _transmit(self, target: PeerInfo, message: Message) -> bool:
+        to_peer_id = target.peer_id
         log.info("Sending message to %s (%s) at %s:%s", target.display_name, to_peer_id, target.ip, target.tcp_port)
         success = self.peer_client.send(target.ip, target.tcp_port, message)
         if success:
             self._peer_send_failures.pop(to_peer_id, None)
-            if self.data_manager:
-                self.data_manager.append_message(message, to_peer_id)
-                try:
-                    if msg_type in ("file", "image") and file_name and file_data:
-                        import base64
-                        file_bytes = base64.b64decode(file_data)
-                        self.data_manager.save_file_for_peer(to_peer_id, file_name, file_bytes)
-                except Exception:
-                    pass
-            log.info("Message sent successfully to %s (%s)", target.display_name, to_peer_id)
+            self._record_sent(target, message)
         else:
             failures = self._peer_send_failures.get(to_peer_id, 0) + 1
             self._peer_send_failures[to_peer_id] = failures
             log.warning("Failed to send message to %s (%s) - connection refused or offline", to_peer_id, target.display_name)
-        return success, message if success else None
+        return success
+
+    def _fits_frame(self, message: Message) -> bool:
+        size = len(message.to_json().encode("utf-8"))
+        if size > config.MAX_FRAME_SIZE:
+            log.warning("Message %s is %s bytes, over the %s byte limit; not sending", message.message_id, size, config.MAX_FRAME_SIZE)
+            return False
+        return True
+
+    def _record_sent(self, target: PeerInfo, message: Message):
+        if self.data_manager:
+            self.data_manager.append_message(message, target.peer_id)
+        log.info("Message sent successfully to %s (%s)", target.display_name, target.peer_id)
+
+    def _notify_message_status(self, peer_id: str, message_id: str, status: str):
+        if self._on_message_status_callback:
+            try:
+                self._on_message_status_callback(peer_id, message_id, status)
+            except Exception as e:
+                log.error("Error in message status callback: %s", e, exc_info=True)
+
+    def _notify_peer_removed(self, peer_id: str):
+        if self._on_peer_removed_callback:
+            try:
+                self._on_peer_removed_callback(peer_id)
+            except Exception as e:
+                log.error("Error in peer removed callback: %s", e, exc_info=True)
+
+    def _notify_thumbnail_ready(self, key: str, thumbnail_path: Path):
+        if self._on_thumbnail_callback:
+            self._on_thumbnail_callback(key, str(thumbnail_path))
+
+    def _get_send_target(self, to_peer_id: str) -> Optional[PeerInfo]:
+        if not self.peer_listener or not self.peer_listener._thread or not self.peer_listener._thread.is_alive():
+            log.error("PeerListener not running. Cannot send message.")
+            return None
+
+        with self._lock:
+            target = self._peers.get(to_peer_id)
+        
+        if not target:
+            log.warning("Cannot send message to %s: Peer not in friends list", to_peer_id)
+            return None
+        
+        if not target.ip or not target.tcp_port:
+            log.warning("Cannot send message to %s: Invalid IP (%s) or port (%s)", to_peer_id, target.ip, target.tcp_port)
+            return None
+
+        if target.ip == "0.0.0.0" or target.ip == "":
+            log.warning("Cannot send message to %s: Invalid IP address", to_peer_id)
+            return None
+
+        if target.tcp_port == 0 or target.tcp_port < 55000 or target.tcp_port > 55199:
+            log.warning("Cannot send message to %s: Invalid port %s", to_peer_id, target.tcp_port)
+            return None
+        
+        return target
+
+    def send_file(self, to_peer_id: str, file_path: str, msg_type: str = "file", content: str = "",
+                  transfer_id: str = None, timestamp: float = None, file_name: str = None,
+                  blob_hash: str = None) -> Tuple[bool, Optional[Message]]:
+        if not self.data_manager:
+            log.error("Router not initialized. Cannot send file.")
+            raise RuntimeError("Router not initialized.")
+        
+        target = self._get_send_target(to_peer_id)
+        if not target:
+            return False, None
+        
+        success, message = self.file_transfer.send_file(target, file_path, file_type=msg_type, text=content,
+                                                        transfer_id=transfer_id, timestamp=timestamp,
+                                                        file_name=file_name, blob_hash=blob_hash)
+        if success:
+            self._peer_send_failures.pop(to_peer_id, None)
+            log.info("File %s sent successfully to %s (%s)", message.file_name, target.display_name, to_peer_id)
+        else:
+            self._peer_send_failures[to_peer_id] = self._peer_send_failures.get(to_peer_id, 0) + 1
+        return success, message
 
     def get_known_peers(self) -> List[PeerInfo]:
         return self.peer_manager.get_known_peers()
 
-    def get_message_history(self, peer_id: str) -> List[Message]:
+    def get_message_history(self, peer_id: str, before: Union[str, float, None] = None,
+                            limit: Optional[int] = None) -> List[Message]:
+        if not self.data_manager:
+            return []
+        if before is None and limit is None:
+            return self.data_manager.load_messages(peer_id=peer_id)
+        return self.data_manager.load_messages_before(peer_id, before, limit or config.HISTORY_PAGE_SIZE)
+
+    def search_messages(self, query: str, peer_id: Optional[str] = None,
+                        limit: int = config.SEARCH_RESULT_LIMIT) -> List[Dict]:
         if not self.data_manager:
             return []
-        return self.data_manager.load_messages(peer_id=peer_id)
+        return self.data_manager.search_messages(query, peer_id, limit)
+
+    def _load_search_index(self):
+        try:
+            self.data_manager.load_search_index()
+        except Exception as e:
+            log.warning("Failed to load search index: %s", e, exc_info=True)
+
+    def get_history_version(self, peer_id: str) -> int:
+        if not self.data_manager:
+            return 0
+        return self.data_manager.get_history_version(peer_id)
+
+    def get_conversation_summaries(self) -> Dict[str, Dict]:
+        if not self.data_manager:
+            return {}
+        return self.data_manager.load_conversations()
+
+    def get_conversation_summary(self, peer_id: str) -> Optional[Dict]:
+        if not self.data_manager:
+            return None
+        return self.data_manager.load_conversation(peer_id)
+
+    def mark_conversation_read(self, peer_id: str):
+        if self.data_manager:
+            self.data_manager.mark_conversation_read(peer_id)
+
+    def get_pending_messages(self, peer_id: str) -> List[OutboundItem]:
+        return self.delivery_queue.pending_items(peer_id)
 
     def set_peer_callback(self, callback: Optional[Callable[[PeerInfo], None]]):
         self._on_peer_callback = callback
 
+    def set_peer_removed_callback(self, callback: Optional[Callable[[str], None]]):
+        self._on_peer_removed_callback = callback
+
+    def remove_peer(self, peer_id: str) -> bool:
+        with self._lock:
+            removed = self._peers.pop(peer_id, None) is not None
+            self._friend_request_emitted.discard(peer_id)
+            self._peer_send_failures.pop(peer_id, None)
+        if self.data_manager:
+            self.delivery_queue.drop(peer_id)
+            self.data_manager.delete_peer(peer_id)
+        self._notify_peer_removed(peer_id)
+        return removed
+
     def add_peer_by_ip(self, ip: str, port: int, display_name: str = "Unknown") -> Tuple[bool, Optional[str]]:
         log.info(f"[Add Peer] Request to add peer at {ip}:{port} with name '{display_name}'")
         
@@ -410,6 +644,18 @@ class MessageRouter:
     def set_call_end_callback(self, callback: Optional[Callable[[str], None]]):
         self._on_call_end_callback = callback
     
+    def set_file_progress_callback(self, callback: Optional[Callable[[str, str, int, int], None]]):
+        self._on_file_progress_callback = callback
+    
+    def set_message_status_callback(self, callback: Optional[Callable[[str, str, str], None]]):
+        self._on_message_status_callback = callback
+    
+    def set_thumbnail_callback(self, callback: Optional[Callable[[str, str], None]]):
+        self._on_thumbnail_callback = callback
+
+    def set_thumbnail_encoder(self, encoder: Optional[Callable[[Path, Path], bool]]):
+        self._thumbnail_encoder = encoder
+    
     def send_friend_request(self, peer_id: str) -> bool:
         return self.friend_request_manager.send_friend_request(peer_id)
     
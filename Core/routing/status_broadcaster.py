@@ -1,114 +1,124 @@
-import base64
 import logging
-from pathlib import Path
-from typing import List
+import socket
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import Dict, List, Optional, Tuple
 
 from Core.models.message import Message
 from Core.models.peer_info import PeerInfo
+from Core.utils import config
 
 log = logging.getLogger(__name__)
 
+RESULT_SENT = "sent"
+RESULT_FAILED = "failed"
+RESULT_SKIPPED = "skipped"
+RESULT_TIMEOUT = "timeout"
+
 class StatusBroadcaster:
 
     def __init__(self, router):
         self.router = router
-    
-    def broadcast_status(self, status: str):
-        
+
+    def broadcast_status(self, status: str, concurrency: Optional[int] = None, deadline: Optional[float] = None) -> Dict[str, str]:
+
         if not self.router.peer_listener or not self.router.peer_listener._thread or not self.router.peer_listener._thread.is_alive():
             log.warning("[STATUS] PeerListener not running, skipping status broadcast")
-            return
-        
+            return {}
+
         if status not in ("online", "offline"):
             log.warning("Invalid status for broadcast: %s", status)
-            return
-        
-        msg_type = "ONLINE" if status == "online" else "OFFLINE"
-        
+            return {}
+
         with self.router._lock:
             friends = list(self.router._peers.values())
-        
-        log.info("[STATUS] Broadcasting %s to %s friends", status.upper(), len(friends))
-        
-        sent_count = 0
+
+        concurrency = concurrency or config.STATUS_BROADCAST_CONCURRENCY
+        if deadline is None:
+            deadline = config.STATUS_BROADCAST_DEADLINE if status == "online" else config.STATUS_OFFLINE_DEADLINE
+        timeout = config.STATUS_SEND_TIMEOUT if status == "online" else config.STATUS_OFFLINE_SEND_TIMEOUT
+
+        log.info("[STATUS] Broadcasting %s to %s friends (concurrency=%s, deadline=%.1fs)",
+                 status.upper(), len(friends), concurrency, deadline)
+
+        results: Dict[str, str] = {}
+        targets: List[PeerInfo] = []
         for peer in friends:
             if not peer.ip or not peer.tcp_port or peer.tcp_port == 0:
-                log.warning("[STATUS] Skipping %s to %s: invalid IP=%s or port=%s", 
+                log.warning("[STATUS] Skipping %s to %s: invalid IP=%s or port=%s",
                           status, peer.display_name, peer.ip, peer.tcp_port)
+                results[peer.peer_id] = RESULT_SKIPPED
                 continue
-            
-            try:
-                if status == "online":
-                    avatar_base64 = None
-                    avatar_path = getattr(self.router, 'avatar_path', None)
-                    if avatar_path:
-                        try:
-                            avatar_file = Path(avatar_path)
-                            if avatar_file.exists():
-                                with open(avatar_file, 'rb') as f:
-                                    avatar_base64 = base64.b64encode(f.read()).decode('utf-8')
-                        except Exception as e:
-                            log.warning("Failed to read avatar file %s: %s", avatar_path, e)
-                    
-                    message = Message.create_online_status(
-                        sender_id=self.router.peer_id,
-                        sender_name=self.router.display_name or "Unknown",
-                        receiver_id=peer.peer_id,
-                        avatar_base64=avatar_base64
-                    )
-                else:
-                    message = Message.create_offline_status(
-                        sender_id=self.router.peer_id,
-                        sender_name=self.router.display_name or "Unknown",
-                        receiver_id=peer.peer_id
-                    )
-                
-                timeout = 1.0 if status == "offline" else None
-                success = self.router.peer_client.send(peer.ip, peer.tcp_port, message, timeout=timeout)
-                if success:
-                    sent_count += 1
-                    log.info("[STATUS] ✓ Sent %s to %s", status.upper(), peer.display_name)
-                else:
-                    log.debug("[STATUS] Failed to send %s to %s (peer may be offline)", status.upper(), peer.display_name)
-            except Exception as e:
-                log.debug("[STATUS] Error sending %s to %s: %s", status, peer.peer_id, e)
-        
-        log.info("[STATUS] Broadcast complete: %s/%s sent successfully", sent_count, len(friends))
-    
+            targets.append(peer)
+
+        if not targets:
+            return results
+
+        avatar_hash = self.router.avatar_manager.local_hash() if status == "online" else None
+        started = time.monotonic()
+        sockets: Dict[Tuple[str, int], Optional[socket.socket]] = {}
+        if len(targets) > concurrency:
+            sockets = self.router.peer_client.pool.connect_many([(peer.ip, peer.tcp_port) for peer in targets], timeout)
+            unreachable = [peer for peer in targets if (peer.ip, peer.tcp_port) not in sockets]
+            for peer in unreachable:
+                results[peer.peer_id] = RESULT_FAILED
+            targets = [peer for peer in targets if (peer.ip, peer.tcp_port) in sockets]
+            log.info("[STATUS] %s/%s friends reachable after %.2fs", len(targets), len(targets) + len(unreachable),
+                     time.monotonic() - started)
+        futures = {}
+        not_done = set()
+        executor = ThreadPoolExecutor(max_workers=max(min(concurrency, len(targets)), 1), thread_name_prefix="StatusBroadcast")
+        try:
+            for peer in targets:
+                sock = sockets.pop((peer.ip, peer.tcp_port), None)
+                futures[executor.submit(self._send_status, peer, status, avatar_hash, timeout, sock)] = peer
+            if futures:
+                _, not_done = wait(futures, timeout=max(deadline - (time.monotonic() - started), 0))
+        finally:
+            executor.shutdown(wait=False)
+
+        for future, peer in futures.items():
+            if future in not_done:
+                results[peer.peer_id] = RESULT_TIMEOUT
+            else:
+                results[peer.peer_id] = RESULT_SENT if future.result() else RESULT_FAILED
+
+        sent_count = sum(1 for result in results.values() if result == RESULT_SENT)
+        log.info("[STATUS] Broadcast complete in %.2fs: %s/%s sent, %s failed, %s timed out, %s skipped",
+                 time.monotonic() - started, sent_count, len(friends),
+                 sum(1 for result in results.values() if result == RESULT_FAILED),
+                 len(not_done), sum(1 for result in results.values() if result == RESULT_SKIPPED))
+        return results
+
     def send_status_to_peer(self, peer_id: str, status: str):
         if status not in ("online", "offline"):
             log.warning("[STATUS] Invalid status: %s", status)
             return False
-        
+
         with self.router._lock:
             peer = self.router._peers.get(peer_id)
-        
+
         if not peer:
             log.warning("[STATUS] Peer %s not found", peer_id)
             return False
-        
+
         if not peer.ip or not peer.tcp_port or peer.tcp_port == 0:
             log.warning("[STATUS] Peer %s has invalid IP=%s or port=%s", peer_id, peer.ip, peer.tcp_port)
             return False
-        
+
+        avatar_hash = self.router.avatar_manager.local_hash() if status == "online" else None
+        timeout = None if status == "online" else config.STATUS_OFFLINE_SEND_TIMEOUT
+        return self._send_status(peer, status, avatar_hash, timeout)
+
+    def _send_status(self, peer: PeerInfo, status: str, avatar_hash: Optional[str], timeout: Optional[float],
+                     sock: Optional[socket.socket] = None) -> bool:
         try:
             if status == "online":
-                avatar_base64 = None
-                avatar_path = getattr(self.router, 'avatar_path', None)
-                if avatar_path:
-                    try:
-                        avatar_file = Path(avatar_path)
-                        if avatar_file.exists():
-                            with open(avatar_file, 'rb') as f:
-                                avatar_base64 = base64.b64encode(f.read()).decode('utf-8')
-                    except Exception as e:
-                        log.warning("Failed to read avatar file %s: %s", avatar_path, e)
-                
                 message = Message.create_online_status(
                     sender_id=self.router.peer_id,
                     sender_name=self.router.display_name or "Unknown",
                     receiver_id=peer.peer_id,
-                    avatar_base64=avatar_base64
+                    avatar_hash=avatar_hash
                 )
             else:
                 message = Message.create_offline_status(
@@ -116,15 +126,13 @@ class StatusBroadcaster:
                     sender_name=self.router.display_name or "Unknown",
                     receiver_id=peer.peer_id
                 )
-            
-            timeout = 1.0 if status == "offline" else None
-            success = self.router.peer_client.send(peer.ip, peer.tcp_port, message, timeout=timeout)
+
+            success = self.router.peer_client.send(peer.ip, peer.tcp_port, message, timeout=timeout, sock=sock)
             if success:
                 log.info("[STATUS] ✓ Sent %s to %s", status.upper(), peer.display_name)
-                return True
             else:
-                log.debug("[STATUS] Failed to send %s to %s", status.upper(), peer.display_name)
-                return False
+                log.debug("[STATUS] Failed to send %s to %s (peer may be offline)", status.upper(), peer.display_name)
+            return success
         except Exception as e:
-            log.debug("[STATUS] Error sending %s to %s: %s", status, peer_id, e)
+            log.debug("[STATUS] Error sending %s to %s: %s", status, peer.peer_id, e)
             return False
@@ -0,0 +1,243 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import uuid
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from Core.models.message import Message
+from Core.utils import config
+
+log = logging.getLogger(__name__)
+
+_EXT_RE = re.compile(r"^\.[A-Za-z0-9]{1,10}$")
+_HASH_RE = re.compile(r"^[0-9a-f]{64}$")
+
+def is_blob_hash(value) -> bool:
+    return isinstance(value, str) and bool(_HASH_RE.match(value))
+
+def file_hash(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(config.FILE_CHUNK_SIZE), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def attach_blob(content: str, blob_hash: str) -> str:
+    try:
+        content_data = json.loads(content) if content else {}
+    except (json.JSONDecodeError, ValueError, TypeError):
+        content_data = None
+    if not isinstance(content_data, dict):
+        content_data = {"text": content or ""}
+    content_data["blob_hash"] = blob_hash
+    return json.dumps(content_data, ensure_ascii=False)
+
+def message_blob_hash(message: Message) -> Optional[str]:
+    if message.msg_type not in ("file", "image") or not message.content:
+        return None
+    try:
+        content_data = json.loads(message.content)
+    except (json.JSONDecodeError, ValueError, TypeError):
+        return None
+    if isinstance(content_data, dict) and isinstance(content_data.get("blob_hash"), str):
+        return content_data["blob_hash"]
+    return None
+
+
+class BlobStore:
+
+    def __init__(self, root: Path, delay: float = config.BLOB_REFS_SAVE_DELAY):
+        self.root = root
+        self.refs_path = root / config.BLOB_REFS_FILENAME
+        self.delay = delay
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._entries: Optional[Dict[str, Dict]] = None
+        self._dirty = False
+        self._timer: Optional[threading.Timer] = None
+        self._closed = False
+
+    def get_path(self, blob_hash: str) -> Optional[Path]:
+        with self._lock:
+            self._load()
+            entry = self._entries.get(blob_hash)
+        if not entry:
+            return self._find_unregistered(blob_hash)
+        path = self._blob_path(blob_hash, entry.get("ext", ""))
+        return path if path.exists() else None
+
+    def put_bytes(self, data: bytes, file_name: str, owner: str) -> str:
+        blob_hash = hashlib.sha256(data).hexdigest()
+        if self.add_ref(blob_hash, owner):
+            return blob_hash
+        temp_path = self._temp_path()
+        with open(temp_path, "wb") as f:
+            f.write(data)
+        self._commit(temp_path, blob_hash, file_name, len(data), owner)
+        return blob_hash
+
+    def put_file(self, source_path: str, file_name: str, owner: str, blob_hash: Optional[str] = None) -> str:
+        if blob_hash and self.add_ref(blob_hash, owner):
+            return blob_hash
+        temp_path = self._temp_path()
+        digest = hashlib.sha256()
+        size = 0
+        try:
+            with open(source_path, "rb") as src, open(temp_path, "wb") as dst:
+                for block in iter(lambda: src.read(config.FILE_CHUNK_SIZE), b""):
+                    digest.update(block)
+                    dst.write(block)
+                    size += len(block)
+        except OSError:
+            self._discard(temp_path)
+            raise
+        self._commit(temp_path, digest.hexdigest(), file_name, size, owner)
+        return digest.hexdigest()
+
+    def adopt_file(self, path: Path, file_name: str, owner: str, blob_hash: Optional[str] = None) -> str:
+        blob_hash = blob_hash or file_hash(path)
+        self._commit(path, blob_hash, file_name, path.stat().st_size, owner)
+        return blob_hash
+
+    def release_owner(self, owner: str) -> List[str]:
+        removed = []
+        with self._lock:
+            self._load()
+            changed = False
+            for blob_hash, entry in list(self._entries.items()):
+                if entry["refs"].pop(owner, None) is None:
+                    continue
+                changed = True
+                if not entry["refs"]:
+                    del self._entries[blob_hash]
+                    self._discard(self._blob_path(blob_hash, entry.get("ext", "")))
+                    removed.append(blob_hash)
+            if changed:
+                self._save()
+        if removed:
+            log.info("Deleted %s attachments no longer referenced after removing %s", len(removed), owner)
+        return removed
+
+    def write_temp(self, data: bytes) -> Path:
+        temp_path = self._temp_path()
+        with open(temp_path, "wb") as f:
+            f.write(data)
+        return temp_path
+
+    def discard_temp(self, path: Path):
+        if path.parent == self.root and path.name.startswith(".tmp-"):
+            self._discard(path)
+
+    def remove_temp_files(self):
+        for path in self.root.glob(".tmp-*"):
+            self._discard(path)
+
+    def add_ref(self, blob_hash: str, owner: str) -> bool:
+        with self._lock:
+            self._load()
+            entry = self._entries.get(blob_hash)
+            if not entry or not self._blob_path(blob_hash, entry.get("ext", "")).exists():
+                return False
+            entry["refs"][owner] = entry["refs"].get(owner, 0) + 1
+            self._save()
+            return True
+
+    def _commit(self, source: Path, blob_hash: str, file_name: str, size: int, owner: str):
+        with self._lock:
+            self._load()
+            entry = self._entries.get(blob_hash)
+            if entry is None:
+                ext = os.path.splitext(file_name or "")[1].lower()
+                entry = {"size": size, "ext": ext if _EXT_RE.match(ext) else "", "refs": {}}
+            target = self._blob_path(blob_hash, entry["ext"])
+            if target.exists():
+                self._discard(source)
+            else:
+                target.parent.mkdir(parents=True, exist_ok=True)
+                os.replace(source, target)
+            entry["refs"][owner] = entry["refs"].get(owner, 0) + 1
+            self._entries[blob_hash] = entry
+            self._save()
+
+    def flush(self):
+        with self._flush_lock:
+            with self._lock:
+                if self._timer is not None:
+                    self._timer.cancel()
+                    self._timer = None
+                if not self._dirty:
+                    return
+                snapshot = {blob_hash: dict(entry, refs=dict(entry["refs"])) for blob_hash, entry in self._entries.items()}
+                self._dirty = False
+
+            if not self._write(snapshot):
+                with self._lock:
+                    self._save()
+
+    def close(self):
+        with self._lock:
+            self._closed = True
+        self.flush()
+
+    def _find_unregistered(self, blob_hash: str) -> Optional[Path]:
+        if not is_blob_hash(blob_hash):
+            return None
+        return next((self.root / blob_hash[:2]).glob(blob_hash + "*"), None)
+
+    def _blob_path(self, blob_hash: str, ext: str) -> Path:
+        return self.root / blob_hash[:2] / f"{blob_hash}{ext}"
+
+    def _temp_path(self) -> Path:
+        self.root.mkdir(parents=True, exist_ok=True)
+        return self.root / f".tmp-{uuid.uuid4().hex}"
+
+    def _discard(self, path: Path):
+        try:
+            path.unlink()
+        except OSError:
+            pass
+
+    def _load(self):
+        if self._entries is not None:
+            return
+        self._entries = {}
+        if not self.refs_path.exists():
+            return
+        try:
+            with self.refs_path.open("r", encoding="utf-8") as f:
+                data = json.load(f)
+            if isinstance(data, dict):
+                self._entries = data
+        except (json.JSONDecodeError, OSError) as e:
+            log.warning("Failed to read blob references %s: %s", self.refs_path, e)
+
+    def _save(self):
+        self._dirty = True
+        if self._timer is not None or self._closed:
+            return
+        self._timer = threading.Timer(self.delay, self._on_timer)
+        self._timer.daemon = True
+        self._timer.start()
+
+    def _on_timer(self):
+        with self._lock:
+            self._timer = None
+        self.flush()
+
+    def _write(self, entries: Dict[str, Dict]) -> bool:
+        self.root.mkdir(parents=True, exist_ok=True)
+        temp_file = self.refs_path.with_name(self.refs_path.name + ".tmp")
+        try:
+            with temp_file.open("w", encoding="utf-8") as f:
+                json.dump(entries, f)
+            os.replace(temp_file, self.refs_path)
+        except OSError as e:
+            log.warning("Failed to save blob references %s, will retry: %s", self.refs_path, e)
+            return False
+        return True
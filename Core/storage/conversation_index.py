@@ -0,0 +1,156 @@
+from __future__ import annotations
+
+import json
+import logging
+import os
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from Core.models.message import Message
+from Core.utils import config
+
+log = logging.getLogger(__name__)
+
+def message_preview(message: Message) -> str:
+    text = message.content or ""
+    if message.msg_type in ("text", "image", "file") and text:
+        try:
+            content_data = json.loads(text)
+            if isinstance(content_data, dict) and "text" in content_data:
+                text = content_data["text"] or ""
+        except (json.JSONDecodeError, ValueError, TypeError):
+            pass
+    if not text and message.file_name:
+        text = message.file_name
+    return text
+
+
+class ConversationIndex:
+
+    def __init__(self, path: Path, delay: float = config.CONVERSATION_SAVE_DELAY):
+        self.path = path
+        self.delay = delay
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._entries: Optional[Dict[str, Dict]] = None
+        self._dirty = False
+        self._timer: Optional[threading.Timer] = None
+        self._closed = False
+
+    def exists(self) -> bool:
+        return self.path.exists()
+
+    def get_all(self) -> Dict[str, Dict]:
+        with self._lock:
+            self._load()
+            return {peer_id: dict(entry) for peer_id, entry in self._entries.items()}
+
+    def get(self, peer_id: str) -> Optional[Dict]:
+        with self._lock:
+            self._load()
+            entry = self._entries.get(peer_id)
+            return dict(entry) if entry else None
+
+    def record(self, peer_id: str, messages: List[Message], count_unread: bool = True):
+        with self._lock:
+            self._load()
+            entry = self._entries.setdefault(peer_id, {"unread_count": 0})
+            for message in messages:
+                if message.timestamp >= entry.get("last_message_time", 0):
+                    entry["last_message"] = message_preview(message)
+                    entry["last_message_time"] = message.timestamp
+                    entry["last_message_id"] = message.message_id
+                    entry["last_sender_id"] = message.sender_id
+                    entry["msg_type"] = message.msg_type
+                if count_unread and message.sender_id == peer_id:
+                    entry["unread_count"] = entry.get("unread_count", 0) + 1
+            self._schedule()
+
+    def rebuild(self, last_messages: Dict[str, Message]):
+        with self._lock:
+            self._entries = {}
+            for peer_id, message in last_messages.items():
+                self._entries[peer_id] = {
+                    "unread_count": 0,
+                    "last_message": message_preview(message),
+                    "last_message_time": message.timestamp,
+                    "last_message_id": message.message_id,
+                    "last_sender_id": message.sender_id,
+                    "msg_type": message.msg_type,
+                }
+            self._dirty = True
+        self.flush()
+
+    def mark_read(self, peer_id: str):
+        with self._lock:
+            self._load()
+            entry = self._entries.get(peer_id)
+            if not entry or not entry.get("unread_count"):
+                return
+            entry["unread_count"] = 0
+            self._schedule()
+
+    def remove(self, peer_id: str):
+        with self._lock:
+            self._load()
+            if self._entries.pop(peer_id, None) is not None:
+                self._schedule()
+
+    def flush(self):
+        with self._flush_lock:
+            with self._lock:
+                if self._timer is not None:
+                    self._timer.cancel()
+                    self._timer = None
+                if not self._dirty:
+                    return
+                snapshot = {peer_id: dict(entry) for peer_id, entry in self._entries.items()}
+                self._dirty = False
+
+            if not self._save(snapshot):
+                with self._lock:
+                    self._schedule()
+
+    def close(self):
+        with self._lock:
+            self._closed = True
+        self.flush()
+
+    def _load(self):
+        if self._entries is not None:
+            return
+        self._entries = {}
+        if not self.path.exists():
+            return
+        try:
+            with self.path.open("r", encoding="utf-8") as f:
+                data = json.load(f)
+            if isinstance(data, dict):
+                self._entries = data
+        except (json.JSONDecodeError, OSError) as e:
+            log.warning("Failed to read conversation index %s: %s", self.path, e)
+
+    def _schedule(self):
+        self._dirty = True
+        if self._timer is not None or self._closed:
+            return
+        self._timer = threading.Timer(self.delay, self._on_timer)
+        self._timer.daemon = True
+        self._timer.start()
+
+    def _on_timer(self):
+        with self._lock:
+            self._timer = None
+        self.flush()
+
+    def _save(self, entries: Dict[str, Dict]) -> bool:
+        temp_file = self.path.with_name(self.path.name + ".tmp")
+        try:
+            with temp_file.open("w", encoding="utf-8") as f:
+                json.dump(entries, f, ensure_ascii=False)
+            os.replace(temp_file, self.path)
+        except OSError as e:
+            log.warning("Failed to save conversation index %s, will retry: %s", self.path, e)
+            return False
+        return True
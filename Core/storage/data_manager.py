@@ -1,54 +1,156 @@
 from __future__ import annotations
 
+import base64
+import binascii
+import heapq
 import json
+import logging
 import os
+import shutil
 import threading
+import time
 from pathlib import Path
-from typing import Dict, List, Optional
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple, Union
 
 from Core.models.message import Message
 from Core.models.peer_info import PeerInfo
 from Core.utils import config
+from Core.storage.blob_store import BlobStore, attach_blob, message_blob_hash
+from Core.storage.conversation_index import ConversationIndex
+from Core.storage.message_log import read_log_records
 from Core.storage.peer_message_storage import PeerMessageStorage
+from Core.storage.peer_registry import PeerRegistry
+from Core.storage.search_index import SearchIndex
+from Core.storage.sqlite_store import SQLiteStore
+from Core.storage.thumbnail_store import ThumbnailStore
+
+log = logging.getLogger(__name__)
+
+def _load_json_file(path: Path, default):
+    if not path.exists():
+        return default
+    with path.open("r", encoding="utf-8") as f:
+        try:
+            return json.load(f)
+        except json.JSONDecodeError:
+            return default
+
+def _dump_json_file(path: Path, data):
+    temp_file = path.with_name(path.name + ".tmp")
+    with temp_file.open("w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+    os.replace(temp_file, path)
 
 class DataManager:
 
-    def __init__(self, username: str):
+    def __init__(self, username: str, thumbnail_encoder: Optional[Callable[[Path, Path], bool]] = None):
         
         self.username = username
-        data_root = Path(os.getcwd()) / "data"
-        self.root = data_root / username
+        self.root = self.user_root(username)
         self.root.mkdir(parents=True, exist_ok=True)
         self._lock = threading.RLock()
         self._peer_storages: Dict[str, PeerMessageStorage] = {}
+        self._history_versions: Dict[str, int] = {}
+        self._db: Optional[SQLiteStore] = None
+
+        settings = self.load_settings()
+        self.backend = settings.get("storage_backend", config.STORAGE_BACKEND)
+        if self.backend == "sqlite":
+            self._db = SQLiteStore(self.root / config.SQLITE_FILENAME)
+            if not self._db.get_meta("migrated_at"):
+                self._migrate_to_sqlite()
+        elif self.backend != "json":
+            log.warning("Unknown storage backend %r for %s, using json", self.backend, username)
+            self.backend = "json"
+
+        self.peers = PeerRegistry(self._read_peers, self._write_peers)
+        self.blobs = BlobStore(self.root / config.BLOBS_DIRNAME)
+        self.blobs.remove_temp_files()
+        self.thumbnails = ThumbnailStore(self.root / config.THUMBNAILS_DIRNAME, self.blobs, thumbnail_encoder)
+        if not self._attachments_migrated():
+            self._migrate_inline_attachments()
+        self.conversations = ConversationIndex(self.root / config.CONVERSATIONS_FILENAME)
+        if not self.conversations.exists():
+            self._rebuild_conversations()
+        self.search_index = SearchIndex(self.root / config.SEARCH_INDEX_FILENAME)
+
+    @staticmethod
+    def user_root(username: str) -> Path:
+        return Path(os.getcwd()) / "data" / username
+
+    @classmethod
+    def read_user_profile(cls, username: str) -> Dict:
+        root = cls.user_root(username)
+        db = cls._open_profile_db(root)
+        if db is None:
+            return _load_json_file(root / config.PROFILE_FILENAME, {})
+        try:
+            return db.load_profile()
+        finally:
+            db.close()
+
+    @classmethod
+    def write_user_profile(cls, username: str, profile: Dict):
+        root = cls.user_root(username)
+        root.mkdir(parents=True, exist_ok=True)
+        db = cls._open_profile_db(root)
+        if db is None:
+            _dump_json_file(root / config.PROFILE_FILENAME, profile)
+            return
+        try:
+            db.save_profile(profile)
+        finally:
+            db.close()
+
+    @staticmethod
+    def _open_profile_db(root: Path) -> Optional[SQLiteStore]:
+        settings = _load_json_file(root / config.SETTINGS_FILENAME, {})
+        db_path = root / config.SQLITE_FILENAME
+        if settings.get("storage_backend", config.STORAGE_BACKEND) != "sqlite" or not db_path.exists():
+            return None
+        db = SQLiteStore(db_path)
+        if db.get_meta("migrated_at"):
+            return db
+        db.close()
+        return None
 
     def _read_json(self, filename: str, default):
-        path = self.root / filename
-        if not path.exists():
-            return default
-        with self._lock, path.open("r", encoding="utf-8") as f:
-            try:
-                return json.load(f)
-            except json.JSONDecodeError:
-                return default
+        with self._lock:
+            return _load_json_file(self.root / filename, default)
 
     def _write_json(self, filename: str, data):
-        path = self.root / filename
-        with self._lock, path.open("w", encoding="utf-8") as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
+        with self._lock:
+            _dump_json_file(self.root / filename, data)
+
+    def load_settings(self) -> Dict:
+        return self._read_json(config.SETTINGS_FILENAME, {})
+
+    def save_settings(self, settings: Dict):
+        self._write_json(config.SETTINGS_FILENAME, settings)
 
     def load_profile(self) -> Dict:
+        if self._db:
+            return self._db.load_profile()
         return self._read_json(config.PROFILE_FILENAME, {})
 
     def save_profile(self, profile: Dict):
+        if self._db:
+            self._db.save_profile(profile)
+            return
         self._write_json(config.PROFILE_FILENAME, profile)
 
+    def _read_peers(self) -> Dict[str, Dict]:
+        return self._db.load_peers() if self._db else self._read_json(config.PEERS_FILENAME, {})
+
+    def _write_peers(self, peers: Dict[str, Dict], changed: Set[str], deleted: Set[str]):
+        if self._db:
+            self._db.write_peers({peer_id: peers[peer_id] for peer_id in changed if peer_id in peers}, deleted)
+            return
+        self._write_json(config.PEERS_FILENAME, peers)
+
     def load_peers(self) -> Dict[str, PeerInfo]:
-        data = self._read_json(config.PEERS_FILENAME, {})
         peers = {}
-        import logging
-        log = logging.getLogger(__name__)
-        for peer_id, info in data.items():
+        for peer_id, info in self.peers.get_all().items():
             try:
                 peer_info = PeerInfo.from_dict(info)
                 if not peer_info.tcp_port or peer_info.tcp_port < 55000 or peer_info.tcp_port > 55199:
@@ -61,49 +163,333 @@ class DataManager:
         return peers
 
     def save_peers(self, peers: Dict[str, PeerInfo]):
-        serializable = {peer_id: info.to_dict() for peer_id, info in peers.items()}
-        self._write_json(config.PEERS_FILENAME, serializable)
+        self.peers.replace_all({peer_id: info.to_dict() for peer_id, info in peers.items()})
 
     def update_peer(self, peer_info: PeerInfo):
         if not peer_info.tcp_port or peer_info.tcp_port < 55000 or peer_info.tcp_port > 55199:
-            import logging
-            log = logging.getLogger(__name__)
             log.warning("Cannot save peer %s: invalid tcp_port %s (must be 55000-55199). Skipping save.", 
                        peer_info.peer_id, peer_info.tcp_port)
             return
-        
-        peers = self.load_peers()
-        peers[peer_info.peer_id] = peer_info
-        self.save_peers(peers)
+        self.peers.put(peer_info.peer_id, peer_info.to_dict())
     
     def delete_peer(self, peer_id: str):
-        import logging
-        log = logging.getLogger(__name__)
-        data = self._read_json(config.PEERS_FILENAME, {})
-        if peer_id in data:
-            del data[peer_id]
-            self._write_json(config.PEERS_FILENAME, data)
+        self.delete_messages(peer_id)
+        if self.peers.delete(peer_id):
             log.info("Deleted peer %s from storage", peer_id)
         else:
             log.warning("Peer %s not found in storage, cannot delete", peer_id)
 
+    def delete_messages(self, peer_id: str):
+        with self._lock:
+            storage = self._peer_storages.pop(peer_id, None)
+        if storage:
+            storage.close()
+        if self._db:
+            removed = self._db.delete_messages(peer_id)
+            log.info("Deleted %s messages of %s", removed, peer_id)
+        chat_dir = self.root / "chats" / peer_id
+        if chat_dir.is_dir():
+            try:
+                shutil.rmtree(chat_dir)
+            except OSError as e:
+                log.warning("Failed to delete chat folder %s: %s", chat_dir, e)
+        self._bump_history_version(peer_id)
+        self.conversations.remove(peer_id)
+        self.search_index.remove_peer(peer_id)
+        self._release_attachments(peer_id)
+
     def _get_peer_storage(self, peer_id: str) -> PeerMessageStorage:
-        if peer_id not in self._peer_storages:
-            self._peer_storages[peer_id] = PeerMessageStorage(self.root, peer_id)
-        return self._peer_storages[peer_id]
+        with self._lock:
+            if peer_id not in self._peer_storages:
+                self._peer_storages[peer_id] = PeerMessageStorage(self.root, peer_id)
+            return self._peer_storages[peer_id]
     
     def append_message(self, message: Message, peer_id: str):
-        storage = self._get_peer_storage(peer_id)
-        storage.append_message(message)
+        self._store_inline_attachment(message, peer_id)
+        if self._db:
+            self._db.append_messages(peer_id, [message.to_dict()])
+        else:
+            storage = self._get_peer_storage(peer_id)
+            storage.append_message(message)
+        self._bump_history_version(peer_id)
+        self.conversations.record(peer_id, [message])
+        self.search_index.add(peer_id, [message])
+        self._request_thumbnails([message])
+
+    def append_messages(self, messages: List[Message], peer_id: str):
+        for message in messages:
+            self._store_inline_attachment(message, peer_id)
+        if self._db:
+            self._db.append_messages(peer_id, [message.to_dict() for message in messages])
+        else:
+            storage = self._get_peer_storage(peer_id)
+            for message in messages:
+                storage.append_message(message)
+        self._bump_history_version(peer_id)
+        self.conversations.record(peer_id, messages)
+        self.search_index.add(peer_id, messages)
+        self._request_thumbnails(messages)
+
+    def get_history_version(self, peer_id: str) -> int:
+        with self._lock:
+            return self._history_versions.get(peer_id, 0)
+
+    def _bump_history_version(self, peer_id: str):
+        with self._lock:
+            self._history_versions[peer_id] = self._history_versions.get(peer_id, 0) + 1
+
+    def load_conversations(self) -> Dict[str, Dict]:
+        return self.conversations.get_all()
+
+    def load_conversation(self, peer_id: str) -> Optional[Dict]:
+        return self.conversations.get(peer_id)
+
+    def mark_conversation_read(self, peer_id: str):
+        self.conversations.mark_read(peer_id)
+
+    def load_search_index(self):
+        if self.search_index.needs_rebuild:
+            self.search_index.build(self._iter_all_messages())
+        self.search_index.load()
+
+    def search_messages(self, query: str, peer_id: Optional[str] = None,
+                        limit: int = config.SEARCH_RESULT_LIMIT) -> List[Dict]:
+        self.load_search_index()
+        return self.search_index.search(query, peer_id, limit)
 
     def load_messages(self, peer_id: str) -> List[Message]:
+        if self._db:
+            return [Message.from_dict(item) for item in self._db.load_messages(peer_id)]
         storage = self._get_peer_storage(peer_id)
         return storage.load_messages()
     
-    def save_file_for_peer(self, peer_id: str, file_name: str, file_data: bytes) -> Path:
+    def load_recent_messages(self, peer_id: str, limit: int) -> List[Message]:
+        if self._db:
+            return [Message.from_dict(item) for item in self._db.load_recent_messages(peer_id, limit)]
+        storage = self._get_peer_storage(peer_id)
+        return storage.load_recent_messages(limit)
+    
+    def load_messages_before(self, peer_id: str, before: Union[str, float, None], limit: int) -> List[Message]:
+        if self._db:
+            return [Message.from_dict(item) for item in self._db.load_messages_before(peer_id, before, limit)]
+        storage = self._get_peer_storage(peer_id)
+        return storage.load_messages_before(before, limit)
+    
+    def close(self):
+        with self._lock:
+            storages = list(self._peer_storages.values())
+        for storage in storages:
+            storage.close()
+        self.peers.close()
+        self.conversations.close()
+        self.blobs.close()
+        self.search_index.close()
+        self.thumbnails.close()
+        if self._db:
+            self._db.close()
+    
+    def _message_peer_ids(self) -> List[str]:
+        if self._db:
+            return self._db.list_message_peers()
+        chats_dir = self.root / "chats"
+        return [path.name for path in chats_dir.iterdir() if path.is_dir()] if chats_dir.exists() else []
+    
+    def _iter_messages(self, peer_id: str) -> Iterator[Tuple[str, Message]]:
+        if self._db:
+            messages = (Message.from_dict(item) for item in self._db.iter_messages(peer_id))
+        else:
+            messages = self._get_peer_storage(peer_id).iter_messages()
+        for message in messages:
+            yield peer_id, message
+    
+    def _iter_all_messages(self) -> Iterator[Tuple[str, Message]]:
+        streams = [self._iter_messages(peer_id) for peer_id in self._message_peer_ids()]
+        return heapq.merge(*streams, key=lambda item: item[1].timestamp)
+    
+    def _rebuild_conversations(self):
+        last_messages = {}
+        for peer_id in self._message_peer_ids():
+            recent = self.load_recent_messages(peer_id, 1)
+            if recent:
+                last_messages[peer_id] = recent[-1]
+        self.conversations.rebuild(last_messages)
+        log.info("Built conversation index for %s conversations", len(last_messages))
+    
+    def _migrate_to_sqlite(self):
+        profile = self._read_json(config.PROFILE_FILENAME, {})
+        peers = self._read_json(config.PEERS_FILENAME, {})
+        chats_dir = self.root / "chats"
+        chat_dirs = sorted(path for path in chats_dir.iterdir() if path.is_dir()) if chats_dir.exists() else []
+        conversations = (
+            (chat_dir.name, read_log_records(chat_dir / config.MESSAGE_LOG_FILENAME, chat_dir / config.MESSAGES_FILENAME))
+            for chat_dir in chat_dirs
+        )
+        total = self._db.import_legacy(profile, peers, conversations)
+        log.info("Imported %s peers and %s messages into %s", len(peers), total, self._db.db_path)
+    
+    def _attachments_migrated(self) -> bool:
+        if self._db:
+            return bool(self._db.get_meta("attachments_migrated_at"))
+        return bool(self.load_settings().get("attachments_migrated_at"))
+
+    def _migrate_inline_attachments(self):
+        if self._db:
+            moved = self._db.rewrite_messages(self._inline_attachment_record, '"file_data": "')
+            self._db.set_meta("attachments_migrated_at", str(time.time()))
+        else:
+            moved = sum(self._get_peer_storage(peer_id).rewrite_messages(
+                lambda record, peer_id=peer_id: self._inline_attachment_record(peer_id, record))
+                for peer_id in self._message_peer_ids())
+            settings = self.load_settings()
+            settings["attachments_migrated_at"] = time.time()
+            self.save_settings(settings)
+        if moved:
+            log.info("Moved %s inline attachments into the blob store", moved)
+
+    def _inline_attachment_record(self, peer_id: str, record: Dict) -> Optional[Dict]:
+        if not record.get("file_data"):
+            return None
+        try:
+            message = Message.from_dict(record)
+        except (KeyError, TypeError, ValueError):
+            return None
+        if not self._store_inline_attachment(message, peer_id):
+            return None
+        return message.to_dict()
+
+    def load_outbox(self, peer_id: str) -> List[Dict]:
         storage = self._get_peer_storage(peer_id)
-        return storage.save_file(file_name, file_data)
+        return storage.load_outbox()
+    
+    def save_outbox(self, peer_id: str, entries: List[Dict]):
+        storage = self._get_peer_storage(peer_id)
+        storage.save_outbox(entries)
+    
+    def delete_outbox(self, peer_id: str):
+        with self._lock:
+            storage = self._peer_storages.get(peer_id)
+        if storage:
+            storage.save_outbox([])
+            return
+        outbox_file = self.root / "chats" / peer_id / "outbox.json"
+        try:
+            outbox_file.unlink()
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            log.warning("Failed to delete outbox %s: %s", outbox_file, e)
+    
+    def list_outbox_peers(self) -> List[str]:
+        chats_dir = self.root / "chats"
+        if not chats_dir.exists():
+            return []
+        return [path.parent.name for path in chats_dir.glob("*/outbox.json")]
+    
+    def _store_inline_attachment(self, message: Message, peer_id: str) -> Optional[str]:
+        if message.msg_type not in ("file", "image") or not message.file_data:
+            return None
+        try:
+            data = base64.b64decode(message.file_data)
+            blob_hash = self.blobs.put_bytes(data, message.file_name or "", peer_id)
+        except (binascii.Error, ValueError, TypeError, OSError) as e:
+            log.warning("Failed to store attachment %s of message %s: %s", message.file_name, message.message_id, e)
+            return None
+        message.content = attach_blob(message.content, blob_hash)
+        message.file_data = None
+        return blob_hash
+    
+    def store_attachment(self, peer_id: str, source_path: str, file_name: str, blob_hash: Optional[str] = None) -> str:
+        return self.blobs.put_file(source_path, file_name, peer_id, blob_hash)
+    
+    def reference_attachment(self, peer_id: str, blob_hash: str) -> bool:
+        return self.blobs.add_ref(blob_hash, peer_id)
+    
+    def store_attachment_data(self, peer_id: str, data: bytes, file_name: str) -> str:
+        return self.blobs.put_bytes(data, file_name, peer_id)
+    
+    def stage_attachment(self, data: bytes) -> Path:
+        return self.blobs.write_temp(data)
+    
+    def discard_staged_attachment(self, path: Path):
+        self.blobs.discard_temp(path)
+    
+    def adopt_attachment(self, peer_id: str, path: Path, file_name: str, blob_hash: Optional[str] = None) -> str:
+        return self.blobs.adopt_file(path, file_name, peer_id, blob_hash)
+    
+    def get_attachment_path(self, blob_hash: str) -> Optional[Path]:
+        return self.blobs.get_path(blob_hash)
+    
+    def _release_attachments(self, peer_id: str):
+        self.thumbnails.remove(self.blobs.release_owner(peer_id))
+    
+    def get_thumbnail_path(self, blob_hash: str) -> Optional[Path]:
+        return self.thumbnails.get_path(blob_hash)
+    
+    def request_thumbnail(self, blob_hash: str):
+        self.thumbnails.request(blob_hash)
+    
+    def request_file_thumbnail(self, source_path: str):
+        self.thumbnails.request_file(source_path)
+    
+    def _request_thumbnails(self, messages: List[Message]):
+        for message in messages:
+            if message.msg_type == "image":
+                blob_hash = message_blob_hash(message)
+                if blob_hash:
+                    self.thumbnails.request(blob_hash)
     
     def get_peer_files_dir(self, peer_id: str) -> Path:
         storage = self._get_peer_storage(peer_id)
         return storage.get_files_dir()
+    
+    def get_partial_file_path(self, peer_id: str, transfer_id: str) -> Path:
+        storage = self._get_peer_storage(peer_id)
+        return storage.get_partial_path(transfer_id)
+    
+    def get_transfer_manifest_path(self, peer_id: str, transfer_id: str) -> Path:
+        storage = self._get_peer_storage(peer_id)
+        return storage.get_manifest_path(transfer_id)
+    
+    def remove_stale_transfers(self, max_age: float, active: Iterable[str] = ()) -> int:
+        chats_dir = self.root / "chats"
+        if not chats_dir.exists():
+            return 0
+        active = set(active)
+        cutoff = time.time() - max_age
+        transfers: Dict[Tuple[Path, str], List[Path]] = {}
+        for path in chats_dir.glob("*/files/*"):
+            for suffix in (".part", ".manifest.json", ".manifest.tmp"):
+                if path.name.endswith(suffix):
+                    transfer_id = path.name[:-len(suffix)]
+                    if transfer_id not in active:
+                        transfers.setdefault((path.parent, transfer_id), []).append(path)
+                    break
+
+        removed = 0
+        for paths in transfers.values():
+            try:
+                if max(path.stat().st_mtime for path in paths) > cutoff:
+                    continue
+            except OSError:
+                continue
+            for path in paths:
+                try:
+                    path.unlink()
+                except OSError as e:
+                    log.warning("Failed to remove stale transfer file %s: %s", path, e)
+            removed += 1
+        return removed
+
+    def get_avatar_path(self, avatar_hash: str) -> Path:
+        return self.root / config.AVATARS_DIRNAME / f"{avatar_hash}.jpg"
+    
+    def save_avatar(self, avatar_hash: str, data: bytes) -> Path:
+        path = self.get_avatar_path(avatar_hash)
+        if path.exists():
+            return path
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(path.name + ".tmp")
+        with tmp_path.open("wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+        return path
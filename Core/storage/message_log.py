@@ -0,0 +1,350 @@
+from __future__ import annotations
+
+import json
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left
+from pathlib import Path
+from typing import BinaryIO, Callable, Dict, Iterator, List, Optional, Tuple
+
+from Core.utils import config
+
+log = logging.getLogger(__name__)
+
+def read_log_records(log_path: Path, legacy_path: Optional[Path] = None) -> Iterator[dict]:
+    if log_path.exists():
+        with log_path.open("rb") as f:
+            for raw in f:
+                if not raw.endswith(b"\n"):
+                    log.warning("Ignoring incomplete record at the end of %s", log_path)
+                    break
+                try:
+                    yield json.loads(raw)
+                except (json.JSONDecodeError, UnicodeDecodeError) as e:
+                    log.warning("Skipping unreadable record in %s: %s", log_path, e)
+        return
+    if not legacy_path or not legacy_path.exists():
+        return
+    try:
+        with legacy_path.open("r", encoding="utf-8") as f:
+            records = json.load(f)
+    except (json.JSONDecodeError, OSError) as e:
+        log.error("Failed to read legacy message file %s: %s", legacy_path, e)
+        return
+    if isinstance(records, list):
+        yield from records
+    else:
+        log.error("Legacy message file %s is not a list, skipping it", legacy_path)
+
+class MessageLog:
+
+    def __init__(self, log_path: Path, index_path: Path, legacy_path: Optional[Path] = None,
+                 index_interval: int = config.MESSAGE_INDEX_INTERVAL,
+                 fsync_interval: float = config.MESSAGE_LOG_FSYNC_INTERVAL):
+        self.log_path = log_path
+        self.index_path = index_path
+        self.legacy_path = legacy_path
+        self.index_interval = index_interval
+        self.fsync_interval = fsync_interval
+
+        self._lock = threading.RLock()
+        self._handle: Optional[BinaryIO] = None
+        self._offsets: List[int] = []
+        self._block_times: List[float] = []
+        self._positions: Dict[str, int] = {}
+        self._count = 0
+        self._size = 0
+        self._last_fsync = 0.0
+        self._dirty = False
+        self._opened = False
+
+    def __len__(self) -> int:
+        with self._lock:
+            self._open()
+            return self._count
+
+    def append(self, record: dict):
+        line = (json.dumps(record, ensure_ascii=False) + "\n").encode("utf-8")
+        with self._lock:
+            self._open()
+            if self._handle is None:
+                self._handle = self.log_path.open("ab")
+
+            if self._count % self.index_interval == 0:
+                self._offsets.append(self._size)
+                self._block_times.append(float(record.get("timestamp") or 0))
+                index_changed = True
+            else:
+                index_changed = False
+
+            self._handle.write(line)
+            self._handle.flush()
+            self._size += len(line)
+            self._count += 1
+            self._dirty = True
+
+            now = time.monotonic()
+            if now - self._last_fsync >= self.fsync_interval:
+                os.fsync(self._handle.fileno())
+                self._last_fsync = now
+                self._dirty = False
+
+            if index_changed:
+                self._save_index()
+
+    def read_all(self) -> List[dict]:
+        with self._lock:
+            self._open()
+            return list(self._iter_range(0, self._count))
+
+    def iter_records(self) -> Iterator[dict]:
+        with self._lock:
+            self._open()
+            end = self._count
+        return self._iter_range(0, end)
+
+    def read_tail(self, limit: int) -> List[dict]:
+        return self.read_before(None, limit)[0]
+
+    def read_before(self, position: Optional[int], limit: int) -> Tuple[List[dict], int]:
+        with self._lock:
+            self._open()
+            end = self._count if position is None else min(position, self._count)
+            start = max(end - limit, 0)
+            records = list(self._iter_range(start, end))
+            if records and records[0].get("message_id"):
+                if len(self._positions) >= 256:
+                    self._positions.clear()
+                self._positions[records[0]["message_id"]] = start
+            return records, start
+
+    def find_position(self, message_id: str) -> Optional[int]:
+        with self._lock:
+            self._open()
+            position = self._positions.get(message_id)
+            if position is not None:
+                return position
+            if not self.log_path.exists():
+                return None
+
+            needle = json.dumps({"message_id": message_id}, ensure_ascii=False)[1:-1].encode("utf-8")
+            with self.log_path.open("rb") as f:
+                for block in range(len(self._offsets) - 1, -1, -1):
+                    start = self._offsets[block]
+                    end = self._offsets[block + 1] if block + 1 < len(self._offsets) else self._size
+                    f.seek(start)
+                    chunk = f.read(end - start)
+                    found = chunk.find(needle)
+                    if found != -1:
+                        position = block * self.index_interval + chunk.count(b"\n", 0, found)
+                        self._positions[message_id] = position
+                        return position
+            return None
+
+    def find_position_by_time(self, timestamp: float) -> int:
+        with self._lock:
+            self._open()
+            block = max(bisect_left(self._block_times, timestamp) - 1, 0)
+            position = block * self.index_interval
+            for record in self._iter_range(position, self._count):
+                if float(record.get("timestamp") or 0) >= timestamp:
+                    break
+                position += 1
+            return position
+
+    def rewrite(self, transform: Callable[[dict], Optional[dict]]) -> int:
+        with self._lock:
+            self._open()
+            if not self.log_path.exists():
+                return 0
+            self._close_handle()
+            changed = 0
+            temp_file = self.log_path.with_name(self.log_path.name + ".tmp")
+            with self.log_path.open("rb") as src, temp_file.open("wb") as dst:
+                for raw in src:
+                    try:
+                        record = transform(json.loads(raw))
+                    except (json.JSONDecodeError, UnicodeDecodeError) as e:
+                        log.warning("Keeping unreadable record in %s: %s", self.log_path, e)
+                        record = None
+                    if record is None:
+                        dst.write(raw)
+                        continue
+                    dst.write((json.dumps(record, ensure_ascii=False) + "\n").encode("utf-8"))
+                    changed += 1
+                dst.flush()
+                os.fsync(dst.fileno())
+            if not changed:
+                temp_file.unlink()
+                return 0
+            os.replace(temp_file, self.log_path)
+            self._size = self.log_path.stat().st_size
+            self._offsets = []
+            self._block_times = []
+            self._positions.clear()
+            self._count = 0
+            self._scan_from(0)
+            self._save_index()
+            return changed
+
+    def close(self):
+        with self._lock:
+            self._close_handle()
+            if self._opened:
+                self._save_index()
+
+    def _close_handle(self):
+        if self._handle is not None:
+            try:
+                self._handle.flush()
+                if self._dirty:
+                    os.fsync(self._handle.fileno())
+                    self._dirty = False
+            finally:
+                self._handle.close()
+                self._handle = None
+
+    def _iter_range(self, start: int, end: int) -> Iterator[dict]:
+        if start >= end or not self.log_path.exists():
+            return
+        block = start // self.index_interval
+        offset = self._offsets[block]
+        position = block * self.index_interval
+        with self.log_path.open("rb") as f:
+            f.seek(offset)
+            for raw in f:
+                if position >= end or offset >= self._size:
+                    break
+                offset += len(raw)
+                position += 1
+                if position <= start:
+                    continue
+                try:
+                    yield json.loads(raw)
+                except (json.JSONDecodeError, UnicodeDecodeError) as e:
+                    log.warning("Skipping unreadable record in %s: %s", self.log_path, e)
+
+    def _open(self):
+        if self._opened:
+            return
+        self._opened = True
+
+        if not self.log_path.exists() and self.legacy_path and self.legacy_path.exists():
+            self._migrate_legacy()
+
+        if not self.log_path.exists():
+            return
+
+        self._repair_tail()
+        self._size = self.log_path.stat().st_size
+        if not self._load_index():
+            self._offsets = []
+            self._block_times = []
+            self._count = 0
+            self._scan_from(0)
+            self._save_index()
+
+    def _repair_tail(self):
+        with self.log_path.open("rb+") as f:
+            end = f.seek(0, os.SEEK_END)
+            if end == 0:
+                return
+            f.seek(end - 1)
+            if f.read(1) == b"\n":
+                return
+
+            pos = end
+            while pos > 0:
+                step = min(4096, pos)
+                pos -= step
+                f.seek(pos)
+                chunk = f.read(step)
+                newline = chunk.rfind(b"\n")
+                if newline != -1:
+                    pos += newline + 1
+                    break
+            log.warning("Truncating %s incomplete bytes at the end of %s", end - pos, self.log_path)
+            f.truncate(pos)
+
+    def _scan_from(self, offset: int):
+        with self.log_path.open("rb") as f:
+            f.seek(offset)
+            for raw in f:
+                if self._count % self.index_interval == 0:
+                    self._offsets.append(offset)
+                    self._block_times.append(self._record_time(raw))
+                offset += len(raw)
+                self._count += 1
+
+    def _record_time(self, raw: bytes) -> float:
+        try:
+            return float(json.loads(raw).get("timestamp") or 0)
+        except (json.JSONDecodeError, UnicodeDecodeError, AttributeError, TypeError, ValueError):
+            return 0.0
+
+    def _load_index(self) -> bool:
+        if not self.index_path.exists():
+            return False
+        try:
+            with self.index_path.open("r", encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("interval") != self.index_interval:
+                return False
+            size = int(data["size"])
+            count = int(data["count"])
+            offsets = [int(offset) for offset in data["offsets"]]
+            block_times = [float(value) for value in data["timestamps"]]
+        except (json.JSONDecodeError, OSError, KeyError, TypeError, ValueError) as e:
+            log.warning("Rebuilding message index %s: %s", self.index_path, e)
+            return False
+
+        if size > self._size or len(offsets) != (count + self.index_interval - 1) // self.index_interval:
+            return False
+        if len(block_times) != len(offsets):
+            return False
+
+        self._offsets = offsets
+        self._block_times = block_times
+        self._count = count
+        if size < self._size:
+            self._scan_from(size)
+        return True
+
+    def _save_index(self):
+        data = {
+            "interval": self.index_interval,
+            "size": self._size,
+            "count": self._count,
+            "offsets": self._offsets,
+            "timestamps": self._block_times,
+        }
+        temp_file = self.index_path.with_name(self.index_path.name + ".tmp")
+        try:
+            with temp_file.open("w", encoding="utf-8") as f:
+                json.dump(data, f)
+            os.replace(temp_file, self.index_path)
+        except OSError as e:
+            log.warning("Failed to save message index %s: %s", self.index_path, e)
+
+    def _migrate_legacy(self):
+        try:
+            with self.legacy_path.open("r", encoding="utf-8") as f:
+                records = json.load(f)
+        except (json.JSONDecodeError, OSError) as e:
+            log.error("Failed to read legacy message file %s, leaving it in place: %s", self.legacy_path, e)
+            return
+        if not isinstance(records, list):
+            log.error("Legacy message file %s is not a list, leaving it in place", self.legacy_path)
+            return
+
+        temp_file = self.log_path.with_name(self.log_path.name + ".tmp")
+        with temp_file.open("wb") as f:
+            for record in records:
+                f.write((json.dumps(record, ensure_ascii=False) + "\n").encode("utf-8"))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_file, self.log_path)
+        self.legacy_path.replace(self.legacy_path.with_name(self.legacy_path.name + ".migrated"))
+        log.info("Converted %s messages from %s to %s", len(records), self.legacy_path, self.log_path)
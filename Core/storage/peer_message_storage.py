@@ -5,9 +5,11 @@ import logging
 import os
 import threading
 from pathlib import Path
-from typing import List, Optional
+from typing import Callable, Iterator, List, Optional, Union
 
 from Core.models.message import Message
+from Core.storage.message_log import MessageLog
+from Core.utils import config
 
 log = logging.getLogger(__name__)
 
@@ -18,66 +20,84 @@ class PeerMessageStorage:
         self.peer_identifier = peer_identifier
         self.chat_dir = user_root / "chats" / peer_identifier
         self.chat_dir.mkdir(parents=True, exist_ok=True)
-        self.messages_file = self.chat_dir / "messages.json"
+        self.messages_file = self.chat_dir / config.MESSAGE_LOG_FILENAME
         self.files_dir = self.chat_dir / "files"
+        self.outbox_file = self.chat_dir / "outbox.json"
         self._lock = threading.RLock()
+        self.message_log = MessageLog(
+            self.messages_file,
+            self.chat_dir / config.MESSAGE_INDEX_FILENAME,
+            legacy_path=self.chat_dir / config.MESSAGES_FILENAME,
+        )
     
     def _ensure_files_dir(self):
         if not self.files_dir.exists():
             self.files_dir.mkdir(parents=True, exist_ok=True)
     
     def append_message(self, message: Message):
-        with self._lock:
-            messages = self._load_raw_messages()
-            messages.append(message.to_dict())
-            self._save_raw_messages(messages)
+        self.message_log.append(message.to_dict())
     
     def load_messages(self) -> List[Message]:
-        with self._lock:
-            raw_messages = self._load_raw_messages()
-            return [Message.from_dict(item) for item in raw_messages]
+        return [Message.from_dict(item) for item in self.message_log.read_all()]
+    
+    def iter_messages(self) -> Iterator[Message]:
+        for item in self.message_log.iter_records():
+            yield Message.from_dict(item)
+    
+    def load_recent_messages(self, limit: int) -> List[Message]:
+        return [Message.from_dict(item) for item in self.message_log.read_tail(limit)]
     
-    def _load_raw_messages(self) -> List[dict]:
-        if not self.messages_file.exists():
-            return []
-        try:
-            with self.messages_file.open("r", encoding="utf-8") as f:
-                return json.load(f)
-        except (json.JSONDecodeError, IOError):
-            return []
+    def load_messages_before(self, before: Union[str, float, None], limit: int) -> List[Message]:
+        if before is None:
+            position = None
+        elif isinstance(before, str):
+            position = self.message_log.find_position(before)
+            if position is None:
+                return []
+        else:
+            position = self.message_log.find_position_by_time(float(before))
+        records, _ = self.message_log.read_before(position, limit)
+        return [Message.from_dict(item) for item in records]
     
-    def _save_raw_messages(self, messages: List[dict]):
-        try:
-            self.messages_file.parent.mkdir(parents=True, exist_ok=True)
-        except Exception as e:
-            log.error(f"Failed to create directory {self.messages_file.parent}: {e}")
-            raise
-        
-        try:
-            with self.messages_file.open("w", encoding="utf-8") as f:
-                json.dump(messages, f, ensure_ascii=False, indent=2)
-        except Exception as e:
-            log.error(f"Failed to save messages to {self.messages_file}: {e}")
-            raise
+    def rewrite_messages(self, transform: Callable[[dict], Optional[dict]]) -> int:
+        return self.message_log.rewrite(transform)
+    
+    def message_count(self) -> int:
+        return len(self.message_log)
+    
+    def close(self):
+        self.message_log.close()
+    
+    def load_outbox(self) -> List[dict]:
+        with self._lock:
+            if not self.outbox_file.exists():
+                return []
+            try:
+                with self.outbox_file.open("r", encoding="utf-8") as f:
+                    return json.load(f)
+            except (json.JSONDecodeError, IOError) as e:
+                log.warning(f"Failed to read outbox {self.outbox_file}: {e}")
+                return []
+    
+    def save_outbox(self, entries: List[dict]):
+        with self._lock:
+            if not entries:
+                if self.outbox_file.exists():
+                    self.outbox_file.unlink()
+                return
+            temp_file = self.outbox_file.with_suffix(".tmp")
+            with temp_file.open("w", encoding="utf-8") as f:
+                json.dump(entries, f, ensure_ascii=False)
+            os.replace(temp_file, self.outbox_file)
     
     def get_files_dir(self) -> Path:
         self._ensure_files_dir()
         return self.files_dir
     
-    def save_file(self, file_name: str, file_data: bytes) -> Path:
+    def get_partial_path(self, transfer_id: str) -> Path:
         self._ensure_files_dir()
-        file_path = self.files_dir / file_name
-        
-        counter = 1
-        original_name = file_name
-        while file_path.exists():
-            name, ext = os.path.splitext(original_name)
-            file_name = f"{name}_{counter}{ext}"
-            file_path = self.files_dir / file_name
-            counter += 1
-        
-        with open(file_path, 'wb') as f:
-            f.write(file_data)
-        
-        return file_path
-
+        return self.files_dir / f"{transfer_id}.part"
+    
+    def get_manifest_path(self, transfer_id: str) -> Path:
+        self._ensure_files_dir()
+        return self.files_dir / f"{transfer_id}.manifest.json"
@@ -0,0 +1,104 @@
+from __future__ import annotations
+
+import logging
+import threading
+from typing import Callable, Dict, Optional, Set
+
+from Core.utils import config
+
+log = logging.getLogger(__name__)
+
+PersistCallback = Callable[[Dict[str, Dict], Set[str], Set[str]], None]
+
+class PeerRegistry:
+
+    def __init__(self, load: Callable[[], Dict[str, Dict]], persist: PersistCallback,
+                 delay: float = config.PEER_SAVE_DELAY):
+        self._load = load
+        self._persist = persist
+        self.delay = delay
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._peers: Optional[Dict[str, Dict]] = None
+        self._dirty: Set[str] = set()
+        self._deleted: Set[str] = set()
+        self._timer: Optional[threading.Timer] = None
+        self._closed = False
+
+    def get_all(self) -> Dict[str, Dict]:
+        with self._lock:
+            self._ensure_loaded()
+            return {peer_id: dict(data) for peer_id, data in self._peers.items()}
+
+    def put(self, peer_id: str, data: Dict) -> bool:
+        with self._lock:
+            self._ensure_loaded()
+            if self._peers.get(peer_id) == data:
+                return False
+            self._peers[peer_id] = dict(data)
+            self._dirty.add(peer_id)
+            self._deleted.discard(peer_id)
+            self._schedule()
+        return True
+
+    def delete(self, peer_id: str) -> bool:
+        with self._lock:
+            self._ensure_loaded()
+            if self._peers.pop(peer_id, None) is None:
+                return False
+            self._dirty.discard(peer_id)
+            self._deleted.add(peer_id)
+            self._schedule()
+        return True
+
+    def replace_all(self, peers: Dict[str, Dict]):
+        with self._lock:
+            self._ensure_loaded()
+            self._deleted.update(set(self._peers) - set(peers))
+            self._peers = {peer_id: dict(data) for peer_id, data in peers.items()}
+            self._dirty = set(self._peers)
+            self._deleted.difference_update(self._dirty)
+            self._schedule()
+
+    def flush(self):
+        with self._flush_lock:
+            with self._lock:
+                if self._timer is not None:
+                    self._timer.cancel()
+                    self._timer = None
+                if not self._dirty and not self._deleted:
+                    return
+                snapshot = {peer_id: dict(data) for peer_id, data in self._peers.items()}
+                dirty, deleted = self._dirty, self._deleted
+                self._dirty, self._deleted = set(), set()
+
+            try:
+                self._persist(snapshot, dirty, deleted)
+                log.debug("Saved %s changed and %s removed peers", len(dirty), len(deleted))
+            except Exception as e:
+                log.warning("Failed to save peers, will retry: %s", e)
+                with self._lock:
+                    self._dirty.update(dirty - set(self._deleted))
+                    self._deleted.update(deleted - set(self._peers))
+                    self._schedule()
+
+    def close(self):
+        with self._lock:
+            self._closed = True
+        self.flush()
+
+    def _ensure_loaded(self):
+        if self._peers is None:
+            self._peers = self._load()
+
+    def _schedule(self):
+        if self._timer is not None or self._closed:
+            return
+        self._timer = threading.Timer(self.delay, self._on_timer)
+        self._timer.daemon = True
+        self._timer.start()
+
+    def _on_timer(self):
+        with self._lock:
+            self._timer = None
+        self.flush()
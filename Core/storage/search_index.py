@@ -0,0 +1,325 @@
+from __future__ import annotations
+
+import heapq
+import json
+import logging
+import math
+import os
+import re
+import threading
+import unicodedata
+from array import array
+from bisect import bisect_left, insort
+from itertools import repeat
+from pathlib import Path
+from typing import BinaryIO, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from Core.models.message import Message
+from Core.storage.conversation_index import message_preview
+from Core.utils import config
+
+log = logging.getLogger(__name__)
+
+_TOKEN_RE = re.compile(r"\w+")
+_FOLD_TABLE = {code: None for code in range(0x0300, 0x0370)}
+_FOLD_TABLE[ord("đ")] = "d"
+
+def fold_text(text: str) -> str:
+    return unicodedata.normalize("NFD", text.lower()).translate(_FOLD_TABLE)
+
+def tokenize(text: str) -> List[str]:
+    return [token[:config.SEARCH_MAX_TOKEN_LENGTH] for token in _TOKEN_RE.findall(fold_text(text))]
+
+def searchable_text(message: Message) -> str:
+    if message.msg_type not in ("text", "image", "file"):
+        return ""
+    text = message_preview(message)
+    if message.file_name and message.file_name not in text:
+        text = f"{text} {message.file_name}"
+    return text
+
+
+class SearchIndex:
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._lock = threading.RLock()
+        self._needs_rebuild = not path.exists()
+        self._handle: Optional[BinaryIO] = None
+        self._loaded = False
+        self._building = False
+        self._pending: List[Tuple[str, str, float, str, List[str]]] = []
+        self._removed_while_building: List[str] = []
+        self._reset()
+
+    @property
+    def needs_rebuild(self) -> bool:
+        return self._needs_rebuild
+
+    def add(self, peer_id: str, messages: Iterable[Message]):
+        entries = []
+        for message in messages:
+            text = searchable_text(message)
+            tokens = sorted(set(tokenize(text)))
+            if tokens:
+                entries.append((peer_id, message.message_id, message.timestamp, text, tokens))
+        if not entries:
+            return
+
+        with self._lock:
+            if self._building:
+                self._pending.extend(entries)
+                return
+            if self._needs_rebuild:
+                return
+            try:
+                if self._handle is None:
+                    self._handle = self.path.open("ab")
+                offset = self._handle.seek(0, os.SEEK_END)
+                for entry in entries:
+                    line = self._encode(*entry)
+                    self._handle.write(line)
+                    if self._loaded:
+                        self._add_doc(offset, entry[0], entry[4])
+                    offset += len(line)
+                self._handle.flush()
+            except OSError as e:
+                log.warning("Failed to update search index %s: %s", self.path, e)
+
+    def build(self, source: Iterable[Tuple[str, Message]]):
+        with self._lock:
+            if not self._needs_rebuild or self._building:
+                return
+            self._close_handle()
+            self._building = True
+            self._pending = []
+            self._removed_while_building = []
+        temp_file = self.path.with_name(self.path.name + ".tmp")
+        count = 0
+        try:
+            with temp_file.open("wb") as f:
+                for peer_id, message in source:
+                    text = searchable_text(message)
+                    tokens = sorted(set(tokenize(text)))
+                    if tokens:
+                        f.write(self._encode(peer_id, message.message_id, message.timestamp, text, tokens))
+                        count += 1
+                with self._lock:
+                    for entry in self._pending:
+                        f.write(self._encode(*entry))
+                    count += len(self._pending)
+                    f.close()
+                    os.replace(temp_file, self.path)
+                    self._needs_rebuild = False
+                    self._loaded = False
+                    self._reset()
+                    removed = self._removed_while_building
+                    self._building = False
+                    self._pending = []
+                    self._removed_while_building = []
+        except BaseException:
+            with self._lock:
+                self._building = False
+                self._pending = []
+            temp_file.unlink(missing_ok=True)
+            raise
+        log.info("Built search index %s with %s messages", self.path, count)
+        for peer_id in removed:
+            self.remove_peer(peer_id)
+
+    def load(self):
+        with self._lock:
+            if self._loaded or self._needs_rebuild:
+                return
+            self._loaded = True
+            if not self.path.exists():
+                return
+
+            offset = 0
+            skipped = 0
+            with self.path.open("rb") as f:
+                for raw in f:
+                    try:
+                        peer_id, _message_id, _timestamp, _text, tokens = json.loads(raw)
+                        self._add_doc(offset, peer_id, tokens)
+                    except (json.JSONDecodeError, UnicodeDecodeError, TypeError, ValueError):
+                        skipped += 1
+                    offset += len(raw)
+            if skipped:
+                log.warning("Skipped %s unreadable entries in search index %s", skipped, self.path)
+            log.info("Loaded search index %s (%s messages, %s terms)", self.path, len(self._doc_offsets), len(self._terms))
+
+    def search(self, query: str, peer_id: Optional[str] = None, limit: int = config.SEARCH_RESULT_LIMIT) -> List[Dict]:
+        query_tokens = list(dict.fromkeys(tokenize(query)))
+        if not query_tokens or limit <= 0:
+            return []
+
+        with self._lock:
+            self.load()
+            peer_filter = None
+            if peer_id is not None:
+                peer_filter = self._peer_ids.get(peer_id)
+                if peer_filter is None:
+                    return []
+
+            terms = []
+            for token in query_tokens:
+                expansions = self._expand(token)
+                if not expansions:
+                    return []
+                terms.append(expansions)
+            terms.sort(key=lambda expansions: sum(len(postings) for postings, _weight in expansions))
+            max_score = sum(expansions[0][1] for expansions in terms)
+
+            driver, others = terms[0], terms[1:]
+            check_peer = peer_filter is not None
+            if check_peer and len(self._peer_docs[peer_filter]) < sum(len(postings) for postings, _weight in driver):
+                stream = ((doc, 0.0) for doc in reversed(self._peer_docs[peer_filter]))
+                others = terms
+                check_peer = False
+            else:
+                stream = self._iter_newest(driver)
+
+            heap: List[Tuple[float, int]] = []
+            last_doc = -1
+            for doc, score in stream:
+                if doc == last_doc:
+                    continue
+                last_doc = doc
+                if check_peer and self._doc_peers[doc] != peer_filter:
+                    continue
+                for expansions in others:
+                    weight = self._weight(expansions, doc)
+                    if not weight:
+                        break
+                    score += weight
+                else:
+                    if len(heap) < limit:
+                        heapq.heappush(heap, (score, doc))
+                    elif score > heap[0][0]:
+                        heapq.heapreplace(heap, (score, doc))
+                    if len(heap) >= limit and heap[0][0] >= max_score - 1e-9:
+                        break
+
+            heap.sort(reverse=True)
+            return self._results(heap)
+
+    def remove_peer(self, peer_id: str):
+        with self._lock:
+            if self._building:
+                self._removed_while_building.append(peer_id)
+                self._pending = [entry for entry in self._pending if entry[0] != peer_id]
+                return
+            if self._needs_rebuild or not self.path.exists():
+                return
+            self._close_handle()
+            temp_file = self.path.with_name(self.path.name + ".tmp")
+            prefix = json.dumps([peer_id], ensure_ascii=False)[:-1].encode("utf-8") + b","
+            removed = 0
+            try:
+                with self.path.open("rb") as src, temp_file.open("wb") as dst:
+                    for raw in src:
+                        if raw.startswith(prefix):
+                            removed += 1
+                        else:
+                            dst.write(raw)
+                os.replace(temp_file, self.path)
+            except OSError as e:
+                log.warning("Failed to remove %s from search index %s: %s", peer_id, self.path, e)
+                return
+            if self._loaded:
+                self._loaded = False
+                self._reset()
+        log.info("Removed %s messages of %s from search index", removed, peer_id)
+
+    def close(self):
+        with self._lock:
+            self._close_handle()
+
+    def _expand(self, token: str) -> List[Tuple[array, float]]:
+        total = len(self._doc_offsets)
+        expansions = []
+        position = bisect_left(self._terms, token)
+        while position < len(self._terms) and len(expansions) < config.SEARCH_MAX_EXPANSIONS:
+            term = self._terms[position]
+            if not term.startswith(token):
+                break
+            postings = self._postings[term]
+            weight = math.log(1 + total / len(postings))
+            if term != token:
+                weight *= config.SEARCH_PREFIX_WEIGHT
+            expansions.append((postings, weight))
+            position += 1
+        expansions.sort(key=lambda expansion: expansion[1], reverse=True)
+        return expansions
+
+    def _iter_newest(self, expansions: List[Tuple[array, float]]) -> Iterator[Tuple[int, float]]:
+        streams = [zip(reversed(postings), repeat(weight)) for postings, weight in expansions]
+        if len(streams) == 1:
+            return streams[0]
+        return heapq.merge(*streams, reverse=True)
+
+    def _weight(self, expansions: List[Tuple[array, float]], doc: int) -> float:
+        for postings, weight in expansions:
+            position = bisect_left(postings, doc)
+            if position < len(postings) and postings[position] == doc:
+                return weight
+        return 0.0
+
+    def _results(self, ranked: List[Tuple[float, int]]) -> List[Dict]:
+        results = []
+        seen = set()
+        with self.path.open("rb") as f:
+            for score, doc in ranked:
+                f.seek(self._doc_offsets[doc])
+                try:
+                    peer_id, message_id, timestamp, text, _tokens = json.loads(f.readline())
+                except (json.JSONDecodeError, UnicodeDecodeError, TypeError, ValueError):
+                    continue
+                if message_id in seen:
+                    continue
+                seen.add(message_id)
+                results.append({
+                    "peer_id": peer_id,
+                    "message_id": message_id,
+                    "timestamp": timestamp,
+                    "text": text,
+                    "score": score,
+                })
+        return results
+
+    def _add_doc(self, offset: int, peer_id: str, tokens: List[str]):
+        doc = len(self._doc_offsets)
+        peer_index = self._peer_ids.get(peer_id)
+        if peer_index is None:
+            peer_index = self._peer_ids[peer_id] = len(self._peer_ids)
+            self._peer_docs.append(array("I"))
+        self._doc_offsets.append(offset)
+        self._doc_peers.append(peer_index)
+        self._peer_docs[peer_index].append(doc)
+        for token in tokens:
+            postings = self._postings.get(token)
+            if postings is None:
+                postings = self._postings[token] = array("I")
+                insort(self._terms, token)
+            postings.append(doc)
+
+    def _encode(self, peer_id: str, message_id: str, timestamp: float, text: str, tokens: List[str]) -> bytes:
+        snippet = text[:config.SEARCH_SNIPPET_LENGTH]
+        return (json.dumps([peer_id, message_id, timestamp, snippet, tokens], ensure_ascii=False) + "\n").encode("utf-8")
+
+    def _reset(self):
+        self._postings: Dict[str, array] = {}
+        self._terms: List[str] = []
+        self._peer_ids: Dict[str, int] = {}
+        self._peer_docs: List[array] = []
+        self._doc_offsets = array("Q")
+        self._doc_peers = array("I")
+
+    def _close_handle(self):
+        if self._handle is not None:
+            try:
+                self._handle.close()
+            except OSError:
+                pass
+            self._handle = None
@@ -0,0 +1,217 @@
+from __future__ import annotations
+
+import json
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from itertools import islice
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+CREATE TABLE IF NOT EXISTS profile (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    data TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS peers (
+    peer_id TEXT PRIMARY KEY,
+    data TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS messages (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    peer_id TEXT NOT NULL,
+    message_id TEXT,
+    timestamp REAL NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_messages_peer_time ON messages (peer_id, timestamp);
+CREATE INDEX IF NOT EXISTS idx_messages_message_id ON messages (message_id);
+"""
+
+class SQLiteStore:
+
+    def __init__(self, db_path: Path):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(db_path), check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def get_meta(self, key: str) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def set_meta(self, key: str, value: str):
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value))
+
+    def load_profile(self) -> Dict:
+        with self._lock:
+            row = self._conn.execute("SELECT data FROM profile WHERE id = 1").fetchone()
+        return json.loads(row[0]) if row else {}
+
+    def save_profile(self, profile: Dict):
+        data = json.dumps(profile, ensure_ascii=False)
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO profile (id, data) VALUES (1, ?)", (data,))
+
+    def load_peers(self) -> Dict[str, Dict]:
+        with self._lock:
+            rows = self._conn.execute("SELECT peer_id, data FROM peers").fetchall()
+        return {peer_id: json.loads(data) for peer_id, data in rows}
+
+    def save_peers(self, peers: Dict[str, Dict]):
+        rows = [(peer_id, json.dumps(info, ensure_ascii=False)) for peer_id, info in peers.items()]
+        with self._lock, self._transaction():
+            self._conn.execute("DELETE FROM peers")
+            self._conn.executemany("INSERT INTO peers (peer_id, data) VALUES (?, ?)", rows)
+
+    def write_peers(self, changed: Dict[str, Dict], deleted: Iterable[str]):
+        rows = [(peer_id, json.dumps(info, ensure_ascii=False)) for peer_id, info in changed.items()]
+        with self._lock, self._transaction():
+            self._conn.executemany("INSERT OR REPLACE INTO peers (peer_id, data) VALUES (?, ?)", rows)
+            self._conn.executemany("DELETE FROM peers WHERE peer_id = ?", [(peer_id,) for peer_id in deleted])
+
+    def append_messages(self, peer_id: str, records: Iterable[Dict]):
+        rows = self._message_rows(peer_id, records)
+        if not rows:
+            return
+        with self._lock, self._transaction():
+            self._insert_messages(rows)
+
+    def import_legacy(self, profile: Dict, peers: Dict[str, Dict],
+                      conversations: Iterable[Tuple[str, Iterable[Dict]]], batch_size: int = 1000) -> int:
+        total = 0
+        with self._lock, self._transaction():
+            if profile:
+                self._conn.execute("INSERT OR REPLACE INTO profile (id, data) VALUES (1, ?)",
+                                   (json.dumps(profile, ensure_ascii=False),))
+            self._conn.executemany("INSERT OR REPLACE INTO peers (peer_id, data) VALUES (?, ?)",
+                                   [(peer_id, json.dumps(info, ensure_ascii=False)) for peer_id, info in peers.items()])
+            for peer_id, records in conversations:
+                records = iter(records)
+                while True:
+                    rows = self._message_rows(peer_id, islice(records, batch_size))
+                    if not rows:
+                        break
+                    self._insert_messages(rows)
+                    total += len(rows)
+            self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+                               ("migrated_at", str(time.time())))
+        return total
+
+    def _message_rows(self, peer_id: str, records: Iterable[Dict]) -> List[Tuple]:
+        return [
+            (peer_id, record.get("message_id"), float(record.get("timestamp") or 0),
+             json.dumps(record, ensure_ascii=False))
+            for record in records
+        ]
+
+    def _insert_messages(self, rows: List[Tuple]):
+        self._conn.executemany(
+            "INSERT INTO messages (peer_id, message_id, timestamp, data) VALUES (?, ?, ?, ?)", rows
+        )
+
+    def rewrite_messages(self, transform: Callable[[str, Dict], Optional[Dict]], containing: str) -> int:
+        with self._lock, self._transaction():
+            rows = self._conn.execute(
+                "SELECT seq, peer_id, data FROM messages WHERE instr(data, ?) > 0", (containing,)
+            ).fetchall()
+            updates = []
+            for seq, peer_id, data in rows:
+                record = transform(peer_id, json.loads(data))
+                if record is not None:
+                    updates.append((json.dumps(record, ensure_ascii=False), seq))
+            self._conn.executemany("UPDATE messages SET data = ? WHERE seq = ?", updates)
+        return len(updates)
+
+    def delete_messages(self, peer_id: str) -> int:
+        with self._lock, self._transaction():
+            cursor = self._conn.execute("DELETE FROM messages WHERE peer_id = ?", (peer_id,))
+        return cursor.rowcount
+
+    def load_messages(self, peer_id: str) -> List[Dict]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT data FROM messages WHERE peer_id = ? ORDER BY timestamp, seq", (peer_id,)
+            ).fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def iter_messages(self, peer_id: str, batch_size: int = 1000) -> Iterator[Dict]:
+        last = (float("-inf"), -1)
+        while True:
+            with self._lock:
+                rows = self._conn.execute(
+                    "SELECT timestamp, seq, data FROM messages WHERE peer_id = ? AND (timestamp > ? OR (timestamp = ? AND seq > ?)) "
+                    "ORDER BY timestamp, seq LIMIT ?",
+                    (peer_id, last[0], last[0], last[1], batch_size)
+                ).fetchall()
+            for row in rows:
+                yield json.loads(row[2])
+            if len(rows) < batch_size:
+                return
+            last = (rows[-1][0], rows[-1][1])
+
+    def load_recent_messages(self, peer_id: str, limit: int) -> List[Dict]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT data FROM messages WHERE peer_id = ? ORDER BY timestamp DESC, seq DESC LIMIT ?",
+                (peer_id, limit)
+            ).fetchall()
+        return [json.loads(row[0]) for row in reversed(rows)]
+
+    def load_messages_before(self, peer_id: str, before: Union[str, float, None], limit: int) -> List[Dict]:
+        if before is None:
+            return self.load_recent_messages(peer_id, limit)
+        with self._lock:
+            if isinstance(before, str):
+                anchor = self._conn.execute(
+                    "SELECT timestamp, seq FROM messages WHERE message_id = ? AND peer_id = ? ORDER BY seq LIMIT 1",
+                    (before, peer_id)
+                ).fetchone()
+                if not anchor:
+                    return []
+                rows = self._conn.execute(
+                    "SELECT data FROM messages WHERE peer_id = ? AND (timestamp < ? OR (timestamp = ? AND seq < ?)) "
+                    "ORDER BY timestamp DESC, seq DESC LIMIT ?",
+                    (peer_id, anchor[0], anchor[0], anchor[1], limit)
+                ).fetchall()
+            else:
+                rows = self._conn.execute(
+                    "SELECT data FROM messages WHERE peer_id = ? AND timestamp < ? ORDER BY timestamp DESC, seq DESC LIMIT ?",
+                    (peer_id, float(before), limit)
+                ).fetchall()
+        return [json.loads(row[0]) for row in reversed(rows)]
+    
+    def list_message_peers(self) -> List[str]:
+        with self._lock:
+            rows = self._conn.execute("SELECT DISTINCT peer_id FROM messages").fetchall()
+        return [row[0] for row in rows]
+    
+    def message_count(self, peer_id: str) -> int:
+        with self._lock:
+            row = self._conn.execute("SELECT COUNT(*) FROM messages WHERE peer_id = ?", (peer_id,)).fetchone()
+        return row[0]
+
+    @contextmanager
+    def _transaction(self) -> Iterator[None]:
+        self._conn.execute("BEGIN")
+        try:
+            yield
+        except BaseException:
+            self._conn.execute("ROLLBACK")
+            raise
+        self._conn.execute("COMMIT")
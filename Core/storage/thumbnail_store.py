@@ -0,0 +1,103 @@
+from __future__ import annotations
+
+import logging
+import os
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, Iterable, Optional, Set
+
+from Core.storage.blob_store import BlobStore, file_hash
+from Core.utils import config
+
+log = logging.getLogger(__name__)
+
+class ThumbnailStore:
+
+    def __init__(self, root: Path, blobs: BlobStore, encoder: Optional[Callable[[Path, Path], bool]] = None):
+        self.root = root
+        self.blobs = blobs
+        self.encoder = encoder
+        self.on_ready: Optional[Callable[[str, Path], None]] = None
+        self._lock = threading.Lock()
+        self._pending: Set[str] = set()
+        self._executor = ThreadPoolExecutor(max_workers=config.THUMBNAIL_WORKERS, thread_name_prefix="thumbnail")
+
+    def get_path(self, blob_hash: str) -> Optional[Path]:
+        path = self._thumbnail_path(blob_hash)
+        return path if path.exists() else None
+
+    def request(self, blob_hash: str):
+        if self.get_path(blob_hash):
+            return
+        self._submit(blob_hash, self._generate_blob, blob_hash)
+
+    def request_file(self, source_path: str):
+        self._submit(source_path, self._generate_file, source_path)
+
+    def remove(self, blob_hashes: Iterable[str]):
+        for blob_hash in blob_hashes:
+            try:
+                self._thumbnail_path(blob_hash).unlink()
+            except OSError:
+                pass
+
+    def close(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def _submit(self, key: str, worker: Callable, *args):
+        if not self.encoder:
+            return
+        with self._lock:
+            if key in self._pending:
+                return
+            self._pending.add(key)
+        try:
+            self._executor.submit(self._run, key, worker, *args)
+        except RuntimeError:
+            with self._lock:
+                self._pending.discard(key)
+
+    def _run(self, key: str, worker: Callable, *args):
+        try:
+            path = worker(*args)
+        except Exception as e:
+            log.warning("Failed to create thumbnail for %s: %s", key, e)
+            path = None
+        finally:
+            with self._lock:
+                self._pending.discard(key)
+        if path and self.on_ready:
+            try:
+                self.on_ready(key, path)
+            except Exception as e:
+                log.error("Error in thumbnail callback: %s", e, exc_info=True)
+
+    def _generate_blob(self, blob_hash: str) -> Optional[Path]:
+        source = self.blobs.get_path(blob_hash)
+        if not source:
+            return None
+        return self.get_path(blob_hash) or self._render(blob_hash, source)
+
+    def _generate_file(self, source_path: str) -> Optional[Path]:
+        blob_hash = file_hash(Path(source_path))
+        return self.get_path(blob_hash) or self._render(blob_hash, Path(source_path))
+
+    def _render(self, blob_hash: str, source: Path) -> Optional[Path]:
+        target = self._thumbnail_path(blob_hash)
+        target.parent.mkdir(parents=True, exist_ok=True)
+        temp_path = self.root / f".tmp-{uuid.uuid4().hex}"
+        try:
+            if not self.encoder(source, temp_path):
+                log.warning("Failed to write thumbnail for %s", source.name)
+                return None
+            os.replace(temp_path, target)
+        finally:
+            if temp_path.exists():
+                temp_path.unlink()
+        log.debug("Created thumbnail for %s", blob_hash)
+        return target
+
+    def _thumbnail_path(self, blob_hash: str) -> Path:
+        return self.root / blob_hash[:2] / f"{blob_hash}.thumb"
@@ -4,10 +4,94 @@ TCP_BASE_PORT = 55000 # Port mặc định cho TCP server
 TCP_CONNECT_TIMEOUT = 5.0 # Thời gian chờ kết nối TCP
 BUFFER_SIZE = 4096 # Kích thước bộ đệm
 
+POOL_MAX_PER_PEER = 2 # Số kết nối rảnh tối đa giữ lại cho mỗi peer
+POOL_MAX_TOTAL = 64 # Tổng số kết nối rảnh tối đa trong pool
+POOL_IDLE_TIMEOUT = 60.0 # Thời gian (giây) trước khi đóng kết nối rảnh
+LISTENER_IDLE_TIMEOUT = 120.0 # Thời gian (giây) listener giữ kết nối không hoạt động
+
+LISTENER_MODE = "threaded" # Chế độ listener: "threaded" (mỗi kết nối một thread) hoặc "asyncio"
+LISTEN_BACKLOG = 128 # Số kết nối chờ accept tối đa
+LISTENER_WORKERS = 4 # Số thread xử lý tin nhắn cho listener asyncio
+LISTENER_PENDING_EVENTS = 64 # Số tin nhắn chờ xử lý tối đa của mỗi kết nối trước khi listener asyncio ngừng đọc
+
+FRAMING_ENABLED = True # Thương lượng framing nhị phân (length-prefixed) cho kết nối mới
+FRAME_BUFFER_SIZE = 64 * 1024 # Bộ đệm nhận cấp phát sẵn cho mỗi kết nối
+MAX_FRAME_SIZE = 16 * 1024 * 1024 # Kích thước tối đa của một frame hoặc một dòng (byte), đủ cho tin nhắn điều khiển lớn nhất (avatar)
+FRAMING_NEGOTIATE_TIMEOUT = 1.0 # Thời gian chờ peer xác nhận framing
+FRAMING_RETRY_INTERVAL = 300.0 # Thời gian (giây) trước khi thử lại framing với peer cũ
+
+FILE_CHUNK_SIZE = 32 * 1024 # Kích thước mỗi chunk khi truyền file (nhỏ hơn FRAME_BUFFER_SIZE)
+FILE_PROGRESS_STEP = 1024 * 1024 # Số byte giữa hai lần báo tiến độ truyền file
+FILE_TRANSFER_IDLE_TIMEOUT = 300.0 # Thời gian (giây) trước khi tạm dừng file nhận dở dang
+FILE_PARTIAL_MAX_AGE = 7 * 24 * 3600 # Thời gian (giây) giữ file nhận dở dang (.part, manifest) trước khi xóa
+FILE_MANIFEST_INTERVAL = 4 * 1024 * 1024 # Số byte giữa hai lần ghi manifest (checkpoint) khi nhận file
+FILE_ACCEPT_TIMEOUT = 10.0 # Thời gian chờ FILE_ACCEPT từ peer nhận
+FILE_TRANSFER_RETRIES = 5 # Số lần thử tiếp tục truyền file khi mất kết nối
+FILE_HASH_MISMATCH_RETRIES = 1 # Số lần tải lại file khi hash nội dung không khớp với hash được báo trước
+FILE_RETRY_DELAY = 1.0 # Thời gian chờ (giây) trước lần thử lại đầu tiên
+FILE_RETRY_MAX_DELAY = 30.0 # Thời gian chờ tối đa giữa hai lần thử lại
+FILE_HASH_CACHE_SIZE = 256 # Số file gần đây được nhớ hash nội dung (bỏ qua tính lại khi gửi lại)
+
+DELIVERY_WORKERS = 4 # Số thread gửi tin nhắn nền (mỗi peer được gửi tuần tự)
+OUTBOX_RETRY_BASE = 5.0 # Thời gian chờ (giây) trước lần gửi lại đầu tiên cho peer offline
+OUTBOX_RETRY_MAX = 600.0 # Thời gian chờ tối đa giữa hai lần gửi lại
+OUTBOX_FLUSH_JITTER = 2.0 # Độ trễ ngẫu nhiên tối đa trước khi gửi outbox khi peer ONLINE
+OUTBOX_BATCH_SIZE = 100 # Số tin nhắn tối đa gửi liên tiếp trên một kết nối
+OUTBOX_TICK = 5.0 # Chu kỳ (giây) kiểm tra outbox
+OUTBOX_MAX_AGE = 7 * 24 * 3600 # Thời gian (giây) giữ tin nhắn chưa gửi trước khi bỏ
+OUTBOX_SAVE_DELAY = 0.5 # Thời gian (giây) gom các thay đổi outbox trước khi ghi xuống đĩa
+
+STATUS_BROADCAST_CONCURRENCY = 32 # Số peer được gửi trạng thái đồng thời
+STATUS_SEND_TIMEOUT = 3.0 # Thời gian chờ (giây) gửi ONLINE tới một peer
+STATUS_OFFLINE_SEND_TIMEOUT = 1.0 # Thời gian chờ (giây) gửi OFFLINE tới một peer
+STATUS_BROADCAST_DEADLINE = 5.0 # Thời gian tối đa (giây) cho toàn bộ lượt gửi ONLINE
+STATUS_OFFLINE_DEADLINE = 2.0 # Thời gian tối đa (giây) cho toàn bộ lượt gửi OFFLINE
+
+BLOBS_DIRNAME = "blobs" # Thư mục lưu file đính kèm theo hash nội dung (dùng chung cho mọi peer)
+BLOB_REFS_FILENAME = "refs.json" # Tên file đếm tham chiếu của các file đính kèm
+BLOB_REFS_SAVE_DELAY = 1.0 # Thời gian (giây) gom các thay đổi tham chiếu file đính kèm trước khi ghi xuống đĩa
+THUMBNAILS_DIRNAME = "thumbnails" # Thư mục lưu ảnh thu nhỏ của ảnh đính kèm (theo hash nội dung)
+THUMBNAIL_MAX_SIZE = 300 # Cạnh dài tối đa (pixel) của ảnh thu nhỏ
+THUMBNAIL_QUALITY = 85 # Chất lượng JPEG của ảnh thu nhỏ
+THUMBNAIL_WORKERS = 2 # Số thread nền tạo ảnh thu nhỏ
+IMAGE_DECODE_WORKERS = 2 # Số thread nền giải mã và thu nhỏ ảnh cho giao diện
+IMAGE_CACHE_BYTES = 64 * 1024 * 1024 # Dung lượng tối đa (byte) của cache ảnh đã giải mã dùng chung trong giao diện
+AVATAR_CACHE_BYTES = 8 * 1024 * 1024 # Dung lượng tối đa (byte) của cache ảnh đại diện hình tròn đã vẽ sẵn
+
+AVATARS_DIRNAME = "avatars" # Thư mục cache avatar (đặt tên theo hash nội dung)
+AVATAR_MAX_SIZE = 5 * 1024 * 1024 # Kích thước tối đa (byte) của avatar nhận từ peer
+AVATAR_REQUEST_INTERVAL = 30.0 # Thời gian (giây) trước khi gửi lại AVATAR_GET cho cùng một hash
+
+PEER_SAVE_DELAY = 2.0 # Thời gian (giây) gom các thay đổi danh sách peer trước khi ghi xuống đĩa
+CONVERSATION_SAVE_DELAY = 1.0 # Thời gian (giây) gom các thay đổi danh sách hội thoại trước khi ghi xuống đĩa
+
+CHANGE_FEED_SIZE = 1024 # Số thay đổi (peer, cuộc trò chuyện) giữ lại để giao diện đọc theo version; đọc chậm hơn thì tải lại toàn bộ
+CHANGE_FEED_COALESCE_MS = 16 # Thời gian (ms) gom các thay đổi liên tiếp trước khi cập nhật giao diện (khoảng một khung hình)
+
+MESSAGE_LOG_FSYNC_INTERVAL = 1.0 # Thời gian tối thiểu (giây) giữa hai lần fsync log tin nhắn (0 = fsync mỗi tin nhắn)
+MESSAGE_INDEX_INTERVAL = 256 # Số tin nhắn giữa hai mục trong chỉ mục offset
+HISTORY_PAGE_SIZE = 50 # Số tin nhắn tải mỗi lần khi mở hoặc cuộn lên trong cuộc trò chuyện
+MESSAGE_VIEW_CACHE_CONVERSATIONS = 16 # Số cuộc trò chuyện gần đây được giữ sẵn bản ghi hiển thị tin nhắn
+MESSAGE_VIEW_CACHE_MESSAGES = 2000 # Số bản ghi hiển thị tối đa giữ cho mỗi cuộc trò chuyện
+
+SEARCH_RESULT_LIMIT = 50 # Số kết quả tìm kiếm tin nhắn tối đa trả về
+SEARCH_MIN_QUERY_LENGTH = 2 # Số ký tự tối thiểu để bắt đầu tìm trong nội dung tin nhắn
+SEARCH_DEBOUNCE_MS = 250 # Thời gian chờ (ms) sau lần gõ cuối trước khi tìm kiếm
+SEARCH_MAX_EXPANSIONS = 64 # Số từ tối đa được mở rộng từ một tiền tố
+SEARCH_PREFIX_WEIGHT = 0.6 # Trọng số của từ khớp theo tiền tố so với khớp nguyên từ
+SEARCH_MAX_TOKEN_LENGTH = 32 # Độ dài tối đa của một từ trong chỉ mục
+SEARCH_SNIPPET_LENGTH = 120 # Số ký tự nội dung lưu kèm mỗi kết quả tìm kiếm
+
 DATA_ROOT = os.path.join(os.getcwd(), "Data") # Thư mục lưu trữ dữ liệu
 PROFILE_FILENAME = "profile.json" # Tên file lưu trữ thông tin người dùng
 PEERS_FILENAME = "peers.json" # Tên file lưu trữ danh sách peers
 MESSAGES_FILENAME = "messages.json" # Tên file lưu trữ tin nhắn
+MESSAGE_LOG_FILENAME = "messages.jsonl" # Tên file log tin nhắn (mỗi dòng một tin nhắn)
+MESSAGE_INDEX_FILENAME = "messages.idx" # Tên file chỉ mục offset của log tin nhắn
+SQLITE_FILENAME = "storage.db" # Tên file cơ sở dữ liệu SQLite
+CONVERSATIONS_FILENAME = "conversations.json" # Tên file tóm tắt các cuộc trò chuyện (tin nhắn cuối, số chưa đọc)
+SEARCH_INDEX_FILENAME = "search_index.jsonl" # Tên file chỉ mục tìm kiếm nội dung tin nhắn
+STORAGE_BACKEND = "json" # Backend lưu trữ mặc định ("json" hoặc "sqlite"), có thể đổi trong settings.json của từng user
 SETTINGS_FILENAME = "settings.json" # Tên file lưu trữ cấu hình
 
 MESSAGE_PACKET_TYPE = "MESSAGE" # Kiểu gói tin tin nhắn
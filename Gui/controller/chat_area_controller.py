@@ -1,5 +1,4 @@
 import os
-import base64
 from typing import Callable
 
 from PySide6.QtCore import QObject, Signal, Qt, QTimer
@@ -18,7 +17,7 @@ from PySide6.QtWidgets import (
 
 class ChatAreaController(QObject):
 
-    file_attached = Signal(str, str, str, bool)
+    file_attached = Signal(str, str, bool)
     emoji_selected = Signal(str)
     message_sent = Signal(str)
 
@@ -71,19 +70,14 @@ class ChatAreaController(QObject):
             for file_path in selected_files:
                 try:
                     file_name = os.path.basename(file_path)
-                    with open(file_path, 'rb') as f:
-                        file_data = f.read()
-                    
-                    if isinstance(file_data, str):
-                        file_data = file_data.encode('utf-8')
-                        
-                    file_data_base64 = base64.b64encode(file_data).decode('utf-8')
+                    if not os.path.isfile(file_path):
+                        continue
                     
                     file_ext = os.path.splitext(file_name)[1].lower()
                     image_extensions = ['.png', '.jpg', '.jpeg', '.gif', '.bmp', '.webp']
                     is_image = file_ext in image_extensions
                     
-                    self.file_attached.emit(file_path, file_name, file_data_base64, is_image)
+                    self.file_attached.emit(file_path, file_name, is_image)
                 except Exception as e:
                     pass
 
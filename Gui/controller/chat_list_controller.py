@@ -1,29 +1,35 @@
-from PySide6.QtCore import QObject, Signal, Qt
-from PySide6.QtWidgets import QListWidgetItem
-from Gui.view.chat_item import ChatItemWidget
+from PySide6.QtCore import QObject, Signal, Qt, QTimer, QItemSelectionModel
+from Gui.view.conversation_list import ConversationListModel
+from Core.utils import config
 
 class ChatListController(QObject):
     chat_selected = Signal(str, str)
     tab_changed = Signal(str)
     search_performed = Signal(str)
+    message_search_requested = Signal(str)
+    search_result_selected = Signal(str, str, str, float)
     
-    def __init__(self, chat_list_widget):
+    def __init__(self, chat_list_widget, chat_model):
         super().__init__()
         self.chat_list_widget = chat_list_widget
+        self.chat_model = chat_model
         self.search_input = None
         self.tab_labels = {}
         self.current_tab = "DIRECT"
-        self.current_chat_item = None
-        self.all_chat_items = []
+        self.current_peer_id = None
         self._peer_refresh_handler = None
+        self.search_results_widget = None
+        self._pending_search = ""
+        self._search_timer = QTimer(self)
+        self._search_timer.setSingleShot(True)
+        self._search_timer.setInterval(config.SEARCH_DEBOUNCE_MS)
+        self._search_timer.timeout.connect(self._on_search_timer)
         
         self._connect_signals()
     
     def _connect_signals(self):
         
-        self.chat_list_widget.itemClicked.connect(self._on_chat_item_clicked)
-        
-        self.chat_list_widget.itemDoubleClicked.connect(self._on_chat_item_double_clicked)
+        self.chat_list_widget.clicked.connect(self._on_chat_item_clicked)
     
     def set_search_input(self, search_input):
         
@@ -31,6 +37,12 @@ class ChatListController(QObject):
         if self.search_input:
             self.search_input.textChanged.connect(self._on_search_text_changed)
     
+    def set_search_results_widget(self, search_results_widget):
+        
+        self.search_results_widget = search_results_widget
+        if self.search_results_widget:
+            self.search_results_widget.itemClicked.connect(self._on_search_result_clicked)
+    
     def set_tab_labels(self, direct_tab, groups_tab, public_tab):
         
         self.tab_labels = {
@@ -80,141 +92,81 @@ class ChatListController(QObject):
         search_text = text.strip().lower()
         self._filter_chats(search_text)
         self.search_performed.emit(search_text)
-    
-    def _filter_chats(self, search_text):
-        
-        if not self.all_chat_items:
-            self._cache_all_chat_items()
         
-        if not search_text:
-            self._show_all_chats()
-            return
-        
-        for i in range(self.chat_list_widget.count()):
-            self.chat_list_widget.item(i).setHidden(True)
-        
-        for list_item, chat_data in self.all_chat_items:
-            chat_widget = self.chat_list_widget.itemWidget(list_item)
-            if chat_widget and self._chat_matches_search(chat_widget, search_text):
-                list_item.setHidden(False)
+        self._pending_search = search_text
+        if len(search_text) >= config.SEARCH_MIN_QUERY_LENGTH:
+            self._search_timer.start()
+        else:
+            self._search_timer.stop()
+            self.message_search_requested.emit("")
     
-    def _cache_all_chat_items(self):
-        
-        self.all_chat_items = []
-        for i in range(self.chat_list_widget.count()):
-            list_item = self.chat_list_widget.item(i)
-            chat_widget = self.chat_list_widget.itemWidget(list_item)
-            if chat_widget:
-                self.all_chat_items.append((list_item, {
-                    'name': getattr(chat_widget, 'contact_name', ''),
-                    'last_message': getattr(chat_widget, 'last_message', ''),
-                    'time': getattr(chat_widget, 'time_label', '')
-                }))
-    
-    def _chat_matches_search(self, chat_widget, search_text):
-        
-        contact_name = getattr(chat_widget, 'contact_name', '').lower()
-        if search_text in contact_name:
-            return True
+    def _on_search_timer(self):
         
-        last_message = getattr(chat_widget, 'last_message', '').lower()
-        if search_text in last_message:
-            return True
+        self.message_search_requested.emit(self._pending_search)
+    
+    def _on_search_result_clicked(self, item):
         
-        return False
+        data = item.data(Qt.UserRole) if item else None
+        if not data:
+            return
+        peer_id, peer_name, message_id, timestamp = data
+        self.clear_selection()
+        self.search_result_selected.emit(peer_id, peer_name or "", message_id, float(timestamp or 0))
     
-    def _show_all_chats(self):
+    def _filter_chats(self, search_text):
         
-        for list_item, _ in self.all_chat_items:
-            list_item.setHidden(False)
+        self.chat_list_widget.model().setFilterFixedString(search_text)
+        self.restore_selection()
     
-    def _on_chat_item_clicked(self, item):
+    def _on_chat_item_clicked(self, index):
         
-        if not item:
+        if not index.isValid():
             return
-            
-        chat_widget = self.chat_list_widget.itemWidget(item)
-        if not chat_widget:
-            return
-        
-        if self.current_chat_item:
-            try:
-                row = self.chat_list_widget.row(self.current_chat_item)
-                if row >= 0:
-                    old_widget = self.chat_list_widget.itemWidget(self.current_chat_item)
-                    if old_widget and hasattr(old_widget, 'set_selected'):
-                        old_widget.set_selected(False)
-            except (RuntimeError, AttributeError):
-                self.current_chat_item = None
-        
-        if hasattr(chat_widget, 'set_selected'):
-            chat_widget.set_selected(True)
         
-        self.current_chat_item = item
+        self.current_peer_id = index.data(ConversationListModel.PeerIdRole)
+        chat_name = index.data(Qt.DisplayRole) or ''
         
-        chat_id = self._get_chat_id(chat_widget)
-        chat_name = getattr(chat_widget, 'contact_name', '')
-        
-        self.chat_selected.emit(chat_id, chat_name)
+        self.chat_selected.emit(self.current_peer_id, chat_name)
     
-    def _on_chat_item_double_clicked(self, item):
+    def select_chat(self, peer_id):
         
-        chat_widget = self.chat_list_widget.itemWidget(item)
-        if chat_widget:
-            pass
+        self.current_peer_id = peer_id
+        self.restore_selection()
     
-    def _get_chat_id(self, chat_widget):
+    def restore_selection(self):
         
-        peer_id = getattr(chat_widget, 'peer_id', None)
-        if peer_id:
-            return peer_id
-        return getattr(chat_widget, 'contact_name', 'unknown')
-    
-    def add_chat(self, name, last_message, time_str, unread_count=0, selected=False):
+        selection_model = self.chat_list_widget.selectionModel()
+        if not self.current_peer_id:
+            selection_model.clearSelection()
+            return
         
-        parent = self.chat_list_widget.parent()
-        if hasattr(parent, 'add_chat'):
-            parent.add_chat(name, last_message, time_str, unread_count, selected)
-            self._cache_all_chat_items()
+        index = self.chat_list_widget.model().mapFromSource(self.chat_model.index_of(self.current_peer_id))
+        if not index.isValid():
+            selection_model.clearSelection()
+        elif not selection_model.isSelected(index):
+            selection_model.select(index, QItemSelectionModel.ClearAndSelect)
     
     def clear_selection(self):
         
-        if self.current_chat_item:
-            try:
-                row = self.chat_list_widget.row(self.current_chat_item)
-                if row >= 0:
-                    old_widget = self.chat_list_widget.itemWidget(self.current_chat_item)
-                    if old_widget and hasattr(old_widget, 'set_selected'):
-                        old_widget.set_selected(False)
-            except (RuntimeError, AttributeError):
-                pass
-            finally:
-                self.current_chat_item = None
+        self.current_peer_id = None
+        self.chat_list_widget.selectionModel().clearSelection()
     
     def get_current_chat_info(self):
         
-        if not self.current_chat_item:
-            return None
-        
-        try:
-            row = self.chat_list_widget.row(self.current_chat_item)
-            if row < 0:
-                self.current_chat_item = None
-                return None
-        except (RuntimeError, AttributeError):
-            self.current_chat_item = None
+        if not self.current_peer_id:
             return None
         
-        chat_widget = self.chat_list_widget.itemWidget(self.current_chat_item)
-        if not chat_widget:
+        index = self.chat_model.index_of(self.current_peer_id)
+        if not index.isValid():
             return None
         
+        row = self.chat_model.row_at(index.row())
         return {
-            'id': self._get_chat_id(chat_widget),
-            'name': getattr(chat_widget, 'contact_name', ''),
-            'last_message': getattr(chat_widget, 'last_message', ''),
-            'time': getattr(chat_widget, 'time_label', ''),
-            'unread_count': getattr(chat_widget, 'unread_count', 0)
+            'id': row['peer_id'],
+            'name': row.get('peer_name', ''),
+            'last_message': row.get('last_message', ''),
+            'time': row.get('time_str', ''),
+            'unread_count': row.get('unread_count', 0)
         }
 
     def set_peer_refresh_handler(self, handler):
@@ -1,14 +1,16 @@
-from collections import defaultdict
 from typing import Dict, List, Optional
 import logging
 import os
-import base64
+import threading
 import time
 
 from PySide6.QtCore import QObject, Signal, QTimer, Slot
 from PySide6.QtWidgets import QMessageBox, QDialog, QWidget
 
 from Core.core_api import ChatCore
+from Core.models.change import PEER_REMOVED, PEER_STATUS
+from Core.utils import config
+from Gui.utils.image_service import encode_thumbnail
 
 log = logging.getLogger(__name__)
 
@@ -16,11 +18,18 @@ log = logging.getLogger(__name__)
 class MainWindowController(QObject):
     
     chat_list_updated = Signal(list)
+    conversations_changed = Signal(list, list)
+    avatar_changed = Signal(str, str)
     message_received = Signal(dict)
     chat_selected = Signal(str, str)
     show_friend_request_dialog = Signal(str, str)
     show_message_box = Signal(str, str, str)
-    load_chat_history = Signal(str, list)
+    load_chat_history = Signal(str, list, bool)
+    older_history_loaded = Signal(str, list, bool)
+    message_status_changed = Signal(str, str, str)
+    thumbnail_ready = Signal(str, str)
+    message_search_results = Signal(str, list)
+    message_focus_requested = Signal(str, str)
     
     def __init__(self, username: str, display_name: str, tcp_port: int):
         super().__init__()
@@ -36,13 +45,16 @@ class MainWindowController(QObject):
             username=normalized_username,
             display_name=self.display_name,
             tcp_port=self.tcp_port,
+            thumbnail_encoder=encode_thumbnail,
         )
         
         self.chat_core.signals.message_received.connect(self._on_message_received_signal)
-        self.chat_core.signals.peer_updated.connect(self._on_peer_updated_signal)
+        self.chat_core.signals.changes_available.connect(self._on_changes_available)
         self.chat_core.signals.friend_request_received.connect(self._on_friend_request_received_signal)
         self.chat_core.signals.friend_accepted.connect(self._on_friend_accepted_signal)
         self.chat_core.signals.friend_rejected.connect(self._on_friend_rejected_signal)
+        self.chat_core.signals.message_status_changed.connect(self._on_message_status_changed_signal)
+        self.chat_core.signals.thumbnail_ready.connect(self.thumbnail_ready)
         
         self.chat_core.signals.call_request_received.connect(self._on_call_request_received)
         self.chat_core.signals.call_accepted.connect(self._on_call_accepted)
@@ -51,8 +63,8 @@ class MainWindowController(QObject):
         self.chat_core.signals.remote_video_frame.connect(self._on_remote_video_frame)
         
         self.peers: Dict[str, Dict] = {}
-        self.unread_counts = defaultdict(int)
         self.current_peer_id: str = ""
+        self.current_search: str = ""
         self._pending_files = {}
         self._preview_items = {}
         self.pending_friend_requests: Dict[str, str] = {}
@@ -63,7 +75,11 @@ class MainWindowController(QObject):
         self._active_call_window: Optional[QWidget] = None
         self._call_peer_id: Optional[str] = None
         
-        self._peer_refresh_timer = None
+        self._change_version = 0
+        self._change_timer = QTimer(self)
+        self._change_timer.setSingleShot(True)
+        self._change_timer.setInterval(config.CHANGE_FEED_COALESCE_MS)
+        self._change_timer.timeout.connect(self._apply_changes)
     
     def start(self, parent_widget=None):
         try:
@@ -75,43 +91,67 @@ class MainWindowController(QObject):
         self._update_peers_from_core()
         
         self._cleanup_orphaned_chat_folders()
-        
-        self._refresh_chat_list()
-        
-        self._peer_refresh_timer = QTimer()
-        self._peer_refresh_timer.setInterval(5000)
-        self._peer_refresh_timer.timeout.connect(self._update_peers_from_core)
-        self._peer_refresh_timer.start()
     
     def stop(self):
-        if self._peer_refresh_timer:
-            self._peer_refresh_timer.stop()
+        self._change_timer.stop()
         self.chat_core.stop()
     
     def _update_peers_from_core(self):
+        self._change_version = self.chat_core.changes.version
         peers = self.chat_core.get_known_peers()
         self.peers = {peer["peer_id"]: peer for peer in peers}
         self._refresh_chat_list()
+
+    def _on_changes_available(self):
+        if not self._change_timer.isActive():
+            self._change_timer.start()
+
+    def _apply_changes(self):
+        self._change_version, changes = self.chat_core.get_changes(self._change_version)
+        if changes is None:
+            log.info("Change feed overflowed, reloading peers and conversations")
+            self._update_peers_from_core()
+            return
+        
+        conversations: Dict[str, Dict] = {}
+        statuses: Dict[str, bool] = {}
+        removed: List[str] = []
+        stale_avatars: List[tuple] = []
+        for change in changes:
+            peer_id = change.peer_id
+            if change.kind == PEER_REMOVED:
+                self.peers.pop(peer_id, None)
+                conversations.pop(peer_id, None)
+                statuses.pop(peer_id, None)
+                removed.append(peer_id)
+                continue
+            if peer_id in removed:
+                removed.remove(peer_id)
+            peer = change.data.get("peer")
+            if peer:
+                old_avatar = self.peers.get(peer_id, {}).get('avatar_path')
+                if old_avatar and old_avatar != peer.get('avatar_path'):
+                    stale_avatars.append((peer_id, old_avatar))
+                self.peers[peer_id] = peer
+                statuses[peer_id] = peer.get("status") == "online"
+            conversation = change.data.get("conversation")
+            if conversation:
+                conversations[peer_id] = conversation
+            elif change.kind == PEER_STATUS and peer_id in conversations:
+                conversations[peer_id] = dict(conversations[peer_id], is_online=statuses[peer_id])
+        
+        for peer_id, old_avatar in stale_avatars:
+            self.avatar_changed.emit(peer_id, old_avatar)
+        for peer_id, is_online in statuses.items():
+            if peer_id == self.current_peer_id and hasattr(self, '_update_header_status_callback'):
+                self._update_header_status_callback(peer_id, is_online)
+            if peer_id not in conversations and hasattr(self, '_update_peer_status_callback'):
+                self._update_peer_status_callback(peer_id, is_online)
+        if conversations or removed:
+            self.conversations_changed.emit(list(conversations.values()), removed)
     
     def _get_conversations(self) -> List[Dict]:
-        conversations = []
-        
-        for peer_id, peer in self.peers.items():
-            history = self.chat_core.get_message_history(peer_id)
-            last_message = history[-1] if history else None
-            conversations.append({
-                "peer_id": peer_id,
-                "peer_name": peer.get("display_name", "Unknown"),
-                "last_message": last_message["content"] if last_message else "",
-                "last_message_time": last_message["timestamp"] if last_message else 0,
-                "time_str": last_message["time_str"] if last_message else "",
-                "unread_count": self.unread_counts.get(peer_id, 0),
-                "is_online": peer.get("status", "") == "online",
-                "avatar_path": peer.get("avatar_path"),
-            })
-        
-        conversations.sort(key=lambda c: c["last_message_time"], reverse=True)
-        return conversations
+        return self.chat_core.get_conversations()
     
     def _refresh_chat_list(self):
         conversations = self._get_conversations()
@@ -121,11 +161,45 @@ class MainWindowController(QObject):
         if not chat_id:
             return
         self.current_peer_id = chat_id
-        self.unread_counts[chat_id] = 0
-        history = self.chat_core.get_message_history(chat_id)
-        self.load_chat_history.emit(chat_id, history)
+        self.chat_core.mark_conversation_read(chat_id)
+        self._emit_history_page(chat_id)
         self.chat_selected.emit(chat_id, chat_name)
-        self._refresh_chat_list()
+
+    def _emit_history_page(self, peer_id: str):
+        history = self.chat_core.get_message_history(peer_id, limit=config.HISTORY_PAGE_SIZE)
+        has_more = sum(1 for msg in history if not msg.get("status")) >= config.HISTORY_PAGE_SIZE
+        self.load_chat_history.emit(peer_id, history, has_more)
+    
+    def load_older_messages(self, peer_id: str, before_message_id: str):
+        if not peer_id or peer_id != self.current_peer_id:
+            return
+        history = self.chat_core.get_message_history(peer_id, before=before_message_id, limit=config.HISTORY_PAGE_SIZE)
+        self.older_history_loaded.emit(peer_id, history, len(history) >= config.HISTORY_PAGE_SIZE)
+
+    def search_messages(self, query: str):
+        self.current_search = query
+        if not query:
+            self.message_search_results.emit(query, [])
+            return
+        threading.Thread(target=self._run_message_search, args=(query,), daemon=True, name="MessageSearch").start()
+
+    def _run_message_search(self, query: str):
+        try:
+            results = self.chat_core.search_messages(query)
+        except Exception as e:
+            log.warning("Message search for %r failed: %s", query, e, exc_info=True)
+            results = []
+        self.message_search_results.emit(query, results)
+
+    def open_message(self, peer_id: str, peer_name: str, message_id: str, timestamp: float):
+        if not peer_id:
+            return
+        self.current_peer_id = peer_id
+        self.chat_core.mark_conversation_read(peer_id)
+        history = self.chat_core.get_message_history(peer_id, before=timestamp + 0.001, limit=config.HISTORY_PAGE_SIZE)
+        self.load_chat_history.emit(peer_id, history, len(history) >= config.HISTORY_PAGE_SIZE)
+        self.chat_selected.emit(peer_id, peer_name)
+        self.message_focus_requested.emit(peer_id, message_id)
 
     @Slot(str, int)
     def add_friend_by_ip(self, ip: str, port: int):
@@ -158,8 +232,6 @@ class MainWindowController(QObject):
             if success:
                 log.info(f"[Controller] [Add Friend] Successfully added peer at {ip}:{port}")
                 self.show_message_box.emit("info", "Add Friend", f"Added friend at {ip}:{port}")
-                self._update_peers_from_core()
-                self._refresh_chat_list()
             else:
                 log.error(f"[Controller] [Add Friend] Failed to add peer at {ip}:{port}: {result}")
                 self.show_message_box.emit("warning", "Add Friend", f"Failed to add friend: {result}")
@@ -181,18 +253,16 @@ class MainWindowController(QObject):
         success_count = 0
         total_items = len(preview_items) + (1 if message_text else 0)
         
-        for file_name, (file_data_base64, is_image) in preview_items.items():
+        for file_name, (file_path, is_image) in preview_items.items():
             msg_type = "image" if is_image else "file"
             content = "" if is_image else file_name
             
             try:
-                success = self.chat_core.send_message(
+                success = self.chat_core.send_file(
                     self.current_peer_id,
-                    content,
+                    file_path,
                     msg_type=msg_type,
-                    file_name=file_name,
-                    file_data=file_data_base64,
-                    audio_data=None
+                    content=content
                 )
                 
                 if success:
@@ -227,14 +297,14 @@ class MainWindowController(QObject):
         
         return success_count > 0
     
-    def handle_file_attached(self, file_path: str, file_name: str, file_data_base64: str, is_image: bool):
+    def handle_file_attached(self, file_path: str, file_name: str, is_image: bool):
         if not hasattr(self, '_preview_items'):
             self._preview_items = {}
         
-        self._preview_items[file_name] = (file_data_base64, is_image)
+        self._preview_items[file_name] = (file_path, is_image)
         
         if hasattr(self, 'add_preview_callback'):
-            self.add_preview_callback(file_name, file_data_base64, is_image)
+            self.add_preview_callback(file_name, file_path, is_image)
     
     
     def _on_message_received_signal(self, payload: Dict):
@@ -246,11 +316,8 @@ class MainWindowController(QObject):
             timestamp = payload.get("timestamp", 0)
             time_str = payload.get("time_str", "")
             
-            if not is_sender and peer_id != self.current_peer_id:
-                self.unread_counts[peer_id] = self.unread_counts.get(peer_id, 0) + 1
-            
-            file_name = payload.get("file_name")
-            file_data = payload.get("file_data")
+            if not is_sender and peer_id == self.current_peer_id:
+                self.chat_core.mark_conversation_read(peer_id)
             
             msg_type = payload.get("msg_type", "text")
             
@@ -261,17 +328,16 @@ class MainWindowController(QObject):
                     display_content = content
                 
                 payload["display_content"] = display_content
-                
-                if file_name and file_data and not payload.get("is_sender", False):
-                    saved_path = self._save_received_file(peer_id, file_name, file_data)
-                    if saved_path:
-                        payload["local_file_path"] = saved_path
             
             self.message_received.emit(payload)
-            self._refresh_chat_list()
         except Exception as e:
             import traceback
     
+    def _on_message_status_changed_signal(self, peer_id: str, message_id: str, status: str):
+        self.message_status_changed.emit(peer_id, message_id, status)
+        if status == "failed":
+            self.show_message_box.emit("warning", "Network error", "Failed to send message. Peer might be offline.")
+    
     def _get_peer_folder_name(self, peer_id: str) -> str:
         from app.user_manager import _normalize_username
         
@@ -282,41 +348,6 @@ class MainWindowController(QObject):
         
         return _normalize_username(peer_id[:8])
     
-    def _save_received_file(self, peer_id: str, file_name: str, file_data_base64: str):
-        try:
-            if hasattr(self.chat_core, 'router') and hasattr(self.chat_core.router, 'data_manager'):
-                data_manager = self.chat_core.router.data_manager
-                if data_manager:
-                    file_data = base64.b64decode(file_data_base64)
-                    file_path = data_manager.save_file_for_peer(peer_id, file_name, file_data)
-                    return str(file_path)
-            
-        except Exception as e:
-            import traceback
-    
-    def _on_peer_updated_signal(self, peer_info: Dict):
-        try:
-            peer_id = peer_info.get("peer_id", "")
-            if peer_id:
-                old_status = self.peers.get(peer_id, {}).get("status", "")
-                self.peers[peer_id] = peer_info
-                new_status = peer_info.get("status", "")
-                
-                if peer_id == self.current_peer_id and old_status != new_status:
-                    peer_name = peer_info.get("display_name", "Unknown")
-                    self.chat_selected.emit(peer_id, peer_name)
-                    is_online = new_status == "online"
-                    if hasattr(self, '_update_header_status_callback'):
-                        self._update_header_status_callback(peer_id, is_online)
-                
-                is_online = new_status == "online"
-                if hasattr(self, '_update_peer_status_callback'):
-                    self._update_peer_status_callback(peer_id, is_online)
-                
-                self._refresh_chat_list()
-        except Exception as e:
-            import traceback
-    
     def _on_friend_request_received_signal(self, peer_id: str, display_name: str):
         try:
             log.info("Friend request signal received for %s (%s)", display_name, peer_id)
@@ -343,14 +374,9 @@ class MainWindowController(QObject):
         
         success = self.chat_core.accept_friend(peer_id)
         if success:
-            self._update_peers_from_core()
-            self._refresh_chat_list()
-            
             self.current_peer_id = peer_id
-            self.unread_counts[peer_id] = 0
-            history = self.chat_core.get_message_history(peer_id)
-            self.load_chat_history.emit(peer_id, history)
-            self._refresh_chat_list()
+            self.chat_core.mark_conversation_read(peer_id)
+            self._emit_history_page(peer_id)
             
             self.show_message_box.emit("info", "Friend Added", f"You are now friends with {display_name}! Chat window opened.")
         else:
@@ -364,9 +390,6 @@ class MainWindowController(QObject):
         try:
             self.pending_friend_requests.pop(peer_id, None)
             
-            self._update_peers_from_core()
-            self._refresh_chat_list()
-            
             peer_name = "Unknown"
             for peer in self.chat_core.get_known_peers():
                 if peer["peer_id"] == peer_id:
@@ -374,10 +397,8 @@ class MainWindowController(QObject):
                     break
             
             self.current_peer_id = peer_id
-            self.unread_counts[peer_id] = 0
-            history = self.chat_core.get_message_history(peer_id)
-            self.load_chat_history.emit(peer_id, history)
-            self._refresh_chat_list()
+            self.chat_core.mark_conversation_read(peer_id)
+            self._emit_history_page(peer_id)
             
             self.show_message_box.emit("info", "Friend Request Accepted", f"{peer_name} accepted your friend request! Chat window opened.")
         except Exception as e:
@@ -409,40 +430,15 @@ class MainWindowController(QObject):
                 log.info(f"[Controller] Sending OFFLINE to {peer_name} before removing")
                 self.chat_core.router.status_broadcaster.send_status_to_peer(peer_id, "offline")
             
-            if self.chat_core.router:
-                with self.chat_core.router._lock:
-                    if peer_id in self.chat_core.router._peers:
-                        del self.chat_core.router._peers[peer_id]
-                        log.info(f"[Controller] Removed peer {peer_id} from router runtime")
-            
-            if self.chat_core.router and self.chat_core.router.data_manager:
-                self.chat_core.router.data_manager.delete_peer(peer_id)
-                log.info(f"[Controller] Deleted peer {peer_id} from storage")
+            if self.chat_core.remove_peer(peer_id):
+                log.info(f"[Controller] Removed peer {peer_id} from router runtime and storage")
             
             if peer_id in self.peers:
                 del self.peers[peer_id]
             
-            if peer_id in self.unread_counts:
-                del self.unread_counts[peer_id]
-            
-            if self.chat_core.router and self.chat_core.router.data_manager:
-                from pathlib import Path
-                import shutil
-                chat_folder = Path(self.chat_core.router.data_manager.root) / "chats" / peer_id
-                if chat_folder.exists() and chat_folder.is_dir():
-                    try:
-                        shutil.rmtree(str(chat_folder))
-                        log.info(f"[Controller] Deleted chat folder for removed friend: {chat_folder}")
-                    except Exception as e:
-                        log.error(f"[Controller] Failed to delete chat folder {chat_folder}: {e}", exc_info=True)
-                else:
-                    log.warning(f"[Controller] Chat folder does not exist: {chat_folder}")
-            
             if self.current_peer_id == peer_id:
                 self.current_peer_id = None
-                self.load_chat_history.emit("", [])
-            
-            self._update_peers_from_core()
+                self.load_chat_history.emit("", [], False)
             
             self.show_message_box.emit("info", "Friend Removed", f"{peer_name} has been removed from your friends list.")
             
@@ -456,7 +452,6 @@ class MainWindowController(QObject):
                 return
             
             from pathlib import Path
-            import shutil
             
             chats_dir = Path(self.chat_core.router.data_manager.root) / "chats"
             if not chats_dir.exists():
@@ -470,7 +465,7 @@ class MainWindowController(QObject):
                     folder_name = folder_path.name
                     if folder_name not in known_peer_ids:
                         try:
-                            shutil.rmtree(str(folder_path))
+                            self.chat_core.router.data_manager.delete_messages(folder_name)
                             log.info(f"[Controller] Cleaned up orphaned chat folder: {folder_name}")
                             removed_count += 1
                         except Exception as e:
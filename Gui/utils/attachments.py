@@ -0,0 +1,52 @@
+import os
+import platform
+import shutil
+import subprocess
+
+from PySide6.QtCore import QStandardPaths
+from PySide6.QtWidgets import QFileDialog, QMessageBox
+
+
+def _missing_attachment(file_name, local_file_path):
+    if local_file_path and os.path.exists(local_file_path):
+        return False
+    QMessageBox.warning(None, "File Unavailable", f"{file_name} is no longer available on this device.")
+    return True
+
+
+def open_attachment(file_name, local_file_path=None):
+    if _missing_attachment(file_name, local_file_path):
+        return
+    try:
+        if platform.system() == 'Darwin':
+            subprocess.call(('open', local_file_path))
+        elif platform.system() == 'Windows':
+            os.startfile(local_file_path)
+        else:
+            subprocess.call(('xdg-open', local_file_path))
+    except Exception as e:
+        QMessageBox.warning(None, "Open Error", f"Error opening file: {e}")
+
+
+def save_attachment(file_name, local_file_path=None):
+    if _missing_attachment(file_name, local_file_path):
+        return
+    try:
+        downloads_path = QStandardPaths.writableLocation(QStandardPaths.DownloadLocation)
+        if not downloads_path:
+            downloads_path = os.path.expanduser("~")
+
+        file_path, _ = QFileDialog.getSaveFileName(
+            None,
+            "Save File",
+            os.path.join(downloads_path, file_name),
+            "All Files (*)"
+        )
+        if not file_path:
+            return
+
+        shutil.copyfile(local_file_path, file_path)
+
+        QMessageBox.information(None, "Download Complete", f"File saved to:\n{file_path}")
+    except Exception as e:
+        QMessageBox.warning(None, "Download Error", f"Error downloading file: {e}")
@@ -1,17 +1,41 @@
+import logging
+import os
+from collections import OrderedDict
+from typing import Optional, Tuple
+
 from PySide6.QtWidgets import QLabel
-from PySide6.QtGui import QPixmap, QPainter, QPainterPath, QColor, QPen
-from PySide6.QtCore import Qt, QRectF
-
-def load_circular_pixmap(image_path, size=40, border_width=0, border_color="#dddddd"):
-    pixmap = QPixmap(image_path)
-    if pixmap.isNull():
-        pixmap = QPixmap(size, size)
-        pixmap.fill(QColor("#888888"))
-    circular_pixmap = QPixmap(size, size)
-    circular_pixmap.fill(Qt.transparent)
+from PySide6.QtGui import QImage, QPixmap, QPainter, QPainterPath, QColor
+from PySide6.QtCore import Qt
+
+from Core.utils import config
+
+log = logging.getLogger(__name__)
+
+DEFAULT_BORDER_COLOR = "#dddddd"
+
+def file_content_id(path: str) -> Optional[str]:
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return f"{path}@{stat.st_mtime_ns}:{stat.st_size}"
+
+def pixmap_bytes(pixmap: QPixmap) -> int:
+    return pixmap.width() * pixmap.height() * max(pixmap.depth(), 8) // 8
+
+def avatar_key(content_id: str, size: int, border_width: int = 0, border_color: str = DEFAULT_BORDER_COLOR) -> Tuple:
+    return (content_id, size, border_width, border_color.lower() if border_width > 0 else None)
+
+def circular_image(image, size=40, border_width=0, border_color=DEFAULT_BORDER_COLOR):
+    if image.isNull():
+        image = QImage(size, size, QImage.Format_ARGB32_Premultiplied)
+        image.fill(QColor("#888888"))
+    circular = QImage(size, size, QImage.Format_ARGB32_Premultiplied)
+    circular.fill(Qt.transparent)
     
-    painter = QPainter(circular_pixmap)
+    painter = QPainter(circular)
     painter.setRenderHint(QPainter.Antialiasing)
+    painter.setRenderHint(QPainter.SmoothPixmapTransform)
     if border_width > 0:
         painter.setPen(Qt.NoPen)
         painter.setBrush(QColor(border_color))
@@ -23,26 +47,98 @@ def load_circular_pixmap(image_path, size=40, border_width=0, border_color="#ddd
     path.addEllipse(image_inset, image_inset, image_size, image_size)
     painter.setClipPath(path)
 
-    scaled_pixmap = pixmap.scaled(
+    scaled = image.scaled(
         size, size,
         Qt.KeepAspectRatioByExpanding,
         Qt.SmoothTransformation
     )
     
-    scaled_width = scaled_pixmap.width()
-    scaled_height = scaled_pixmap.height()
+    x_offset = (size - scaled.width()) / 2
+    y_offset = (size - scaled.height()) / 2
     
-    x_offset = (size - scaled_width) / 2
-    y_offset = (size - scaled_height) / 2
-    
-    painter.drawPixmap(x_offset, y_offset, scaled_pixmap)
+    painter.drawImage(x_offset, y_offset, scaled)
     
     painter.end()
-    return circular_pixmap
+    return circular
+
+class AvatarCache:
+
+    def __init__(self, max_bytes: int = config.AVATAR_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self._pixmaps: "OrderedDict[Tuple, QPixmap]" = OrderedDict()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, image_path, size=40, border_width=0, border_color=DEFAULT_BORDER_COLOR) -> QPixmap:
+        content_id = file_content_id(image_path) if image_path else None
+        if content_id is None:
+            self.misses += 1
+            return QPixmap.fromImage(circular_image(QImage(), size, border_width, border_color))
+        key = avatar_key(content_id, size, border_width, border_color)
+        pixmap = self.lookup(key)
+        if pixmap is None:
+            pixmap = QPixmap.fromImage(circular_image(QImage(image_path), size, border_width, border_color))
+            self.store(key, pixmap)
+        return pixmap
+
+    def lookup(self, key: Tuple) -> Optional[QPixmap]:
+        pixmap = self._pixmaps.get(key)
+        if pixmap is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._pixmaps.move_to_end(key)
+        return pixmap
+
+    def store(self, key: Tuple, pixmap: QPixmap):
+        previous = self._pixmaps.pop(key, None)
+        if previous is not None:
+            self._bytes -= pixmap_bytes(previous)
+        self._pixmaps[key] = pixmap
+        self._bytes += pixmap_bytes(pixmap)
+        while self._bytes > self.max_bytes and len(self._pixmaps) > 1:
+            _, evicted = self._pixmaps.popitem(last=False)
+            self._bytes -= pixmap_bytes(evicted)
+
+    def invalidate(self, image_path: str):
+        prefix = f"{image_path}@"
+        stale = [key for key in self._pixmaps if key[0].startswith(prefix)]
+        for key in stale:
+            self._bytes -= pixmap_bytes(self._pixmaps.pop(key))
+        if stale:
+            log.debug("Dropped %d cached avatar(s) for %s (hit rate %.1f%%)", len(stale), image_path,
+                      self.stats()["hit_rate"] * 100)
+
+    def clear(self):
+        self._pixmaps.clear()
+        self._bytes = 0
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._pixmaps),
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+_avatar_cache: Optional[AvatarCache] = None
+
+def avatar_cache() -> AvatarCache:
+    global _avatar_cache
+    if _avatar_cache is None:
+        _avatar_cache = AvatarCache()
+    return _avatar_cache
+
+def load_circular_pixmap(image_path, size=40, border_width=0, border_color=DEFAULT_BORDER_COLOR):
+    return avatar_cache().get(image_path, size, border_width, border_color)
 
 class Avatar(QLabel):
     
-    def __init__(self, image_path, size=40, border_width=0, border_color="#dddddd", parent=None):
+    def __init__(self, image_path, size=40, border_width=0, border_color=DEFAULT_BORDER_COLOR, parent=None):
         super().__init__(parent)
         pixmap = load_circular_pixmap(image_path, size, border_width, border_color)
         self.setPixmap(pixmap)
@@ -0,0 +1,146 @@
+import logging
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, Optional, Set, Tuple
+
+from PySide6.QtCore import QObject, Qt, Signal
+from PySide6.QtGui import QImage, QImageReader, QPixmap
+
+from Core.utils import config
+from .avatar import avatar_cache, avatar_key, circular_image, file_content_id, pixmap_bytes
+
+log = logging.getLogger(__name__)
+
+FIT = "fit"
+CIRCLE = "circle"
+
+
+def image_key(content_id: str, size: int, shape: str = FIT) -> str:
+    return f"{content_id}|{size}|{shape}"
+
+
+def encode_thumbnail(source: Path, target: Path) -> bool:
+    reader = QImageReader(str(source))
+    reader.setAutoTransform(True)
+    size = reader.size()
+    limit = config.THUMBNAIL_MAX_SIZE
+    if size.isValid() and (size.width() > limit or size.height() > limit):
+        reader.setScaledSize(size.scaled(limit, limit, Qt.KeepAspectRatio))
+    image = reader.read()
+    if image.isNull():
+        log.warning("Cannot decode image %s: %s", source.name, reader.errorString())
+        return False
+    image_format = "PNG" if image.hasAlphaChannel() else "JPG"
+    return image.save(str(target), image_format, config.THUMBNAIL_QUALITY)
+
+
+class ImageService(QObject):
+    image_ready = Signal(str)
+    _decoded = Signal(str, object)
+
+    def __init__(self, max_bytes: int = config.IMAGE_CACHE_BYTES, workers: int = config.IMAGE_DECODE_WORKERS):
+        super().__init__()
+        self.max_bytes = max_bytes
+        self._cache: "OrderedDict[str, QPixmap]" = OrderedDict()
+        self._cache_bytes = 0
+        self._pending: Set[str] = set()
+        self._failed: Set[str] = set()
+        self._avatar_keys: Dict[str, Tuple] = {}
+        self.avatars = avatar_cache()
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="image-decode")
+        self._decoded.connect(self._on_decoded, Qt.QueuedConnection)
+
+    def get(self, key: str) -> Optional[QPixmap]:
+        pixmap = self._cache.get(key)
+        if pixmap is not None:
+            self._cache.move_to_end(key)
+        return pixmap
+
+    def request_file(self, path: str, size: int, shape: str = FIT) -> Optional[QPixmap]:
+        content_id = file_content_id(path) if path else None
+        if content_id is None:
+            return None
+        return self.request(content_id, size, shape, path=path)
+
+    def request(self, content_id: str, size: int, shape: str = FIT, path: Optional[str] = None) -> Optional[QPixmap]:
+        key = image_key(content_id, size, shape)
+        if shape == CIRCLE:
+            pixmap = self.avatars.lookup(avatar_key(content_id, size))
+        else:
+            pixmap = self.get(key)
+        if pixmap is not None or key in self._failed or key in self._pending:
+            return pixmap
+        self._pending.add(key)
+        if shape == CIRCLE:
+            self._avatar_keys[key] = avatar_key(content_id, size)
+        try:
+            self._executor.submit(self._decode, key, path or content_id, size, shape)
+        except RuntimeError:
+            self._pending.discard(key)
+            self._avatar_keys.pop(key, None)
+        return None
+
+    def failed(self, key: str) -> bool:
+        return key in self._failed
+
+    def invalidate(self, content_id: str):
+        prefix = f"{content_id}|"
+        for key in [key for key in self._cache if key.startswith(prefix)]:
+            self._cache_bytes -= pixmap_bytes(self._cache.pop(key))
+        self._failed = {key for key in self._failed if not key.startswith(prefix)}
+
+    def close(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def _decode(self, key: str, path: str, size: int, shape: str):
+        image = None
+        try:
+            image = self._read(path, size, shape)
+        except Exception as e:
+            log.warning("Failed to decode image %s: %s", key, e)
+        self._decoded.emit(key, image)
+
+    def _read(self, path: str, size: int, shape: str) -> Optional[QImage]:
+        reader = QImageReader(path)
+        reader.setAutoTransform(True)
+        source = reader.size()
+        if source.isValid():
+            if shape == CIRCLE:
+                reader.setScaledSize(source.scaled(size, size, Qt.KeepAspectRatioByExpanding))
+            elif source.width() > size or source.height() > size:
+                reader.setScaledSize(source.scaled(size, size, Qt.KeepAspectRatio))
+        image = reader.read()
+        if image.isNull():
+            return None
+        if shape == CIRCLE:
+            image = circular_image(image, size)
+        return image
+
+    def _on_decoded(self, key: str, image: Optional[QImage]):
+        self._pending.discard(key)
+        avatar = self._avatar_keys.pop(key, None)
+        if image is None or image.isNull():
+            self._failed.add(key)
+            return
+        pixmap = QPixmap.fromImage(image)
+        if avatar is not None:
+            self.avatars.store(avatar, pixmap)
+            self.image_ready.emit(key)
+            return
+        self._cache[key] = pixmap
+        self._cache_bytes += pixmap_bytes(pixmap)
+        while self._cache_bytes > self.max_bytes and len(self._cache) > 1:
+            _, evicted = self._cache.popitem(last=False)
+            self._cache_bytes -= pixmap_bytes(evicted)
+        self.image_ready.emit(key)
+
+
+_service: Optional[ImageService] = None
+
+
+def image_service() -> ImageService:
+    global _service
+    if _service is None:
+        _service = ImageService()
+    return _service
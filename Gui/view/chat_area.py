@@ -1,21 +1,21 @@
 from PySide6.QtWidgets import (
     QFrame, QVBoxLayout, QHBoxLayout, QLabel, 
-    QLineEdit, QPushButton, QScrollArea, QWidget, QMenu
+    QLineEdit, QPushButton, QListView, QAbstractItemView, QWidget, QMenu
 )
-from PySide6.QtCore import Qt, Signal
-from PySide6.QtGui import QIcon, QPixmap, QAction
+from PySide6.QtCore import Qt, Signal, QTimer
+from PySide6.QtGui import QIcon, QAction
 from PySide6.QtCore import QSize
-import os
-import base64
 from ..utils.avatar import load_circular_pixmap
+from ..utils.image_service import CIRCLE, file_content_id, image_key, image_service
 
-from .message_bubble import MessageBubble
+from .message_list import MessageListModel, MessageDelegate
 from Gui.controller.chat_area_controller import ChatAreaController
 
 class ChatArea(QFrame):
     remove_friend_requested = Signal(str)
     voice_call_requested = Signal(str)
     video_call_requested = Signal(str)
+    older_messages_requested = Signal(str, str)
     
     def __init__(self):
         super().__init__()
@@ -26,6 +26,15 @@ class ChatArea(QFrame):
         self.current_peer_id = None
         self.current_peer_name = None
         self.current_peer_avatar = None
+        self._oldest_message_id = None
+        self._has_more_history = False
+        self._loading_history = False
+        self._keep_scroll_from_bottom = None
+        self._focus_message_id = None
+        self._preview_labels = {}
+        self._preview_waiters = {}
+        self.images = image_service()
+        self.images.image_ready.connect(self._on_image_ready)
 
         layout = QVBoxLayout(self)
         layout.setContentsMargins(0, 0, 0, 0)
@@ -33,21 +42,24 @@ class ChatArea(QFrame):
 
         chat_header = self._create_chat_header()
         
-        self.message_area = QScrollArea()
+        self.message_area = QListView()
         self.message_area.setObjectName("MessageArea")
-        self.message_area.setWidgetResizable(True)
         self.message_area.setHorizontalScrollBarPolicy(Qt.ScrollBarAlwaysOff)
-        
-        self.message_content = QWidget()
-        self.message_content.setObjectName("MessageContent")
-        self.message_layout = QVBoxLayout(self.message_content)
-        self.message_layout.setSpacing(10)
-        self.message_layout.addStretch()
-        
-        self.message_area.setWidget(self.message_content)
-        self.message_area.verticalScrollBar().rangeChanged.connect(
-            lambda _min, _max: self.scroll_to_bottom()
-        )
+        self.message_area.setVerticalScrollMode(QAbstractItemView.ScrollPerPixel)
+        self.message_area.setSelectionMode(QAbstractItemView.NoSelection)
+        self.message_area.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.message_area.setFocusPolicy(Qt.NoFocus)
+        self.message_area.setResizeMode(QListView.Adjust)
+        self.message_area.setUniformItemSizes(False)
+        
+        self.message_model = MessageListModel(self)
+        self.message_delegate = MessageDelegate(self.message_area, self.message_model)
+        self.message_area.setModel(self.message_model)
+        self.message_area.setItemDelegate(self.message_delegate)
+        self._default_message_avatar = load_circular_pixmap("Gui/assets/images/avatar1.jpg", size=36)
+        self.message_delegate.set_avatar(self._default_message_avatar)
+        self.message_area.verticalScrollBar().rangeChanged.connect(self._on_scroll_range_changed)
+        self.message_area.verticalScrollBar().valueChanged.connect(self._on_scroll_value_changed)
 
         input_bar = self._create_input_bar()
 
@@ -72,14 +84,31 @@ class ChatArea(QFrame):
         else:
             self.header_status.setText("Offline")
         
-        if avatar_path and os.path.exists(avatar_path):
-            pixmap = load_circular_pixmap(avatar_path, size=40)
-        else:
-            pixmap = load_circular_pixmap("Gui/assets/images/avatar1.jpg", size=40)
-        self.header_avatar.setPixmap(pixmap)
+        self._apply_peer_avatar(use_default=True)
         
         self.header_frame.setVisible(True)
     
+    def _apply_peer_avatar(self, use_default: bool = False):
+        header_pixmap = message_pixmap = None
+        if self.current_peer_avatar:
+            header_pixmap = self.images.request_file(self.current_peer_avatar, 40, CIRCLE)
+            message_pixmap = self.images.request_file(self.current_peer_avatar, 36, CIRCLE)
+        if header_pixmap is not None or use_default:
+            self.header_avatar.setPixmap(header_pixmap or self._default_header_avatar)
+        if message_pixmap is not None or use_default:
+            self.message_delegate.set_avatar(message_pixmap or self._default_message_avatar)
+    
+    def _on_image_ready(self, key: str):
+        file_name = self._preview_waiters.pop(key, None)
+        if file_name is not None:
+            label = self._preview_labels.get(file_name)
+            pixmap = self.images.get(key)
+            if label is not None and pixmap is not None:
+                label.setPixmap(pixmap)
+            return
+        if self.current_peer_avatar and key.startswith(f"{self.current_peer_avatar}@"):
+            self._apply_peer_avatar()
+    
     def hide_header(self):
         self.current_peer_id = None
         self.current_peer_name = None
@@ -105,7 +134,8 @@ class ChatArea(QFrame):
         self.header_avatar = QLabel()
         self.header_avatar.setObjectName("AvatarLabel")
         self.header_avatar.setFixedSize(40, 40)
-        self.header_avatar.setPixmap(load_circular_pixmap("Gui/assets/images/avatar1.jpg", size=40))
+        self._default_header_avatar = load_circular_pixmap("Gui/assets/images/avatar1.jpg", size=40)
+        self.header_avatar.setPixmap(self._default_header_avatar)
         self.header_avatar.setAlignment(Qt.AlignCenter)
         self.header_avatar.setScaledContents(True)
 
@@ -212,6 +242,7 @@ class ChatArea(QFrame):
         main_layout.addWidget(input_frame)
         
         self.preview_items = {}
+        self._thumbnail_waiters = {}
         
         return input_container
 
@@ -222,110 +253,144 @@ class ChatArea(QFrame):
         self.controller.set_emoji_button(self.emoji_icon)
         self.controller.set_send_button(self.send_button)
 
-    def add_message(self, text, is_sender, add_to_top=False, time_str=None, file_name=None, file_data=None, msg_type="text", local_file_path=None):
-        is_sender = bool(is_sender)
-        
-        bubble = MessageBubble(
-            text,
-            is_sender,
-            time_str=time_str,
-            file_name=file_name,
-            file_data=file_data,
-            msg_type=msg_type,
-            local_file_path=local_file_path,
-        )
-        bubble_widget = bubble.get_widget()
-        bubble_widget.setMaximumWidth(420)
-        
-        row_layout = QHBoxLayout()
-        row_layout.setContentsMargins(0, 0, 0, 0)
-        row_layout.setSpacing(10)
-        
-        if is_sender:
-            row_layout.addStretch() 
-            row_layout.addWidget(bubble_widget, 0, Qt.AlignTop | Qt.AlignRight)
-        else:
-            avatar_label = QLabel()
-            avatar_label.setObjectName("ChatAvatarLabel")
-            avatar_label.setFixedSize(36, 36)
-            
-            if self.current_peer_avatar and os.path.exists(self.current_peer_avatar):
-                avatar_pixmap = load_circular_pixmap(self.current_peer_avatar, size=36)
-            else:
-                avatar_pixmap = load_circular_pixmap("Gui/assets/images/avatar1.jpg", size=36)
-            avatar_label.setPixmap(avatar_pixmap)
-
-            row_layout.addWidget(avatar_label)
-            row_layout.addWidget(bubble_widget)
-            row_layout.addStretch()
-            row_layout.setAlignment(Qt.AlignTop | Qt.AlignLeft)
-        
-        self.message_layout.insertLayout(self.message_layout.count() - 1, row_layout)
-        
+    def add_message(self, text, is_sender, time_str=None, file_name=None, msg_type="text", local_file_path=None,
+                    message_id=None, status=None, thumbnail_path=None, thumbnail_key=None, date_str=None):
+        last_row = self.message_model.last_row()
+        if date_str and (last_row is None or last_row.get("date_str") != date_str):
+            self.message_model.append(self._date_row(date_str))
+        self.message_model.append(self._message_row({
+            "content": text,
+            "is_sender": is_sender,
+            "time_str": time_str,
+            "date_str": date_str,
+            "file_name": file_name,
+            "msg_type": msg_type,
+            "local_file_path": local_file_path,
+            "message_id": message_id,
+            "status": status,
+            "thumbnail_path": thumbnail_path,
+            "thumbnail_key": thumbnail_key,
+        }))
         self.scroll_to_bottom()
-        
-    def add_date_separator(self, text):
-        
-        label = QLabel(text)
-        label.setObjectName("DateSeparator")
-        self.message_layout.insertWidget(self.message_layout.count() - 1, label)
 
     def populate_messages(self):
         
         pass
     
-    def load_chat_history(self, messages: list):
+    def load_chat_history(self, messages: list, has_more: bool = False):
         
         self.clear_messages()
+        self._has_more_history = has_more
         
         if not messages:
             return
         
-        current_date = None
+        self.message_model.reset(self._history_rows(messages))
+        self._oldest_message_id = messages[0].get('message_id')
+        self.scroll_to_bottom()
+    
+    def prepend_chat_history(self, messages: list, has_more: bool = False):
+        self._loading_history = False
+        self._has_more_history = has_more
+        if not messages:
+            return
         
+        scroll_bar = self.message_area.verticalScrollBar()
+        self._keep_scroll_from_bottom = scroll_bar.maximum() - scroll_bar.value()
+        
+        top_row = self.message_model.first_row()
+        if top_row and top_row["kind"] == "date" and top_row.get("date_str") == messages[-1].get('date_str'):
+            self.message_model.remove_first()
+        self.message_model.prepend(self._history_rows(messages))
+        self._oldest_message_id = messages[0].get('message_id')
+    
+    def _history_rows(self, messages: list) -> list:
+        rows = []
+        current_date = None
         for msg in messages:
             msg_date = msg.get('date_str')
-            
             if msg_date != current_date:
-                self.add_date_separator(msg_date)
+                rows.append(self._date_row(msg_date))
                 current_date = msg_date
-            
-            is_sender = bool(msg.get('is_sender', False))
-            content = msg.get('content', '')
-            time_str = msg.get('time_str', None)
-            file_name = msg.get('file_name')
-            file_data = msg.get('file_data')
-            msg_type = msg.get('msg_type', 'text')
-            local_file_path = msg.get('local_file_path')
-            self.add_message(
-                content,
-                is_sender,
-                time_str=time_str,
-                file_name=file_name,
-                file_data=file_data,
-                msg_type=msg_type,
-                local_file_path=local_file_path,
-            )
-        
-        self.scroll_to_bottom()
+            rows.append(self._message_row(msg))
+        return rows
     
-    def clear_messages(self):
-        
-        while self.message_layout.count() > 1:
-            item = self.message_layout.takeAt(0)
-            if item.widget():
-                item.widget().deleteLater()
-            elif item.layout():
-                self._clear_layout(item.layout())
+    def _date_row(self, date_str: str) -> dict:
+        return {"kind": "date", "text": date_str, "date_str": date_str}
+    
+    def _message_row(self, msg: dict) -> dict:
+        message_id = msg.get('message_id')
+        thumbnail_key = msg.get('thumbnail_key')
+        if message_id and thumbnail_key and not msg.get('thumbnail_path'):
+            self._thumbnail_waiters.setdefault(thumbnail_key, []).append(message_id)
+        return {
+            "kind": "message",
+            "message_id": message_id,
+            "text": msg.get('content', ''),
+            "is_sender": bool(msg.get('is_sender', False)),
+            "time_str": msg.get('time_str'),
+            "date_str": msg.get('date_str'),
+            "msg_type": msg.get('msg_type', 'text'),
+            "file_name": msg.get('file_name'),
+            "local_file_path": msg.get('local_file_path'),
+            "thumbnail_path": msg.get('thumbnail_path'),
+            "status": msg.get('status'),
+        }
+    
+    def _on_scroll_value_changed(self, value: int):
+        if value != self.message_area.verticalScrollBar().minimum():
+            return
+        if not self._has_more_history or self._loading_history or not self.current_peer_id or not self._oldest_message_id:
+            return
+        self._loading_history = True
+        self.older_messages_requested.emit(self.current_peer_id, self._oldest_message_id)
     
-    def _clear_layout(self, layout):
+    def _on_scroll_range_changed(self, _min: int, _max: int):
+        if self._focus_message_id:
+            self._scroll_to_message(self._focus_message_id)
+            return
+        if self._keep_scroll_from_bottom is None:
+            self.scroll_to_bottom()
+            return
+        self.message_area.verticalScrollBar().setValue(_max - self._keep_scroll_from_bottom)
+        self._keep_scroll_from_bottom = None
+    
+    def update_message_status(self, message_id: str, status: str):
+        self.message_model.update(message_id, status=status)
+    
+    def highlight_message(self, message_id: str):
+        index = self.message_model.update(message_id, highlighted=True)
+        if not index.isValid():
+            return
+        self._focus_message_id = message_id
+        QTimer.singleShot(0, lambda: self._scroll_to_message(message_id))
+        QTimer.singleShot(2000, lambda: self._clear_highlight(message_id))
+
+    def _scroll_to_message(self, message_id: str):
+        index = self.message_model.index_of(message_id)
+        if index.isValid():
+            self.message_area.scrollTo(index, QAbstractItemView.PositionAtCenter)
+
+    def _clear_highlight(self, message_id: str):
+        if self._focus_message_id == message_id:
+            self._focus_message_id = None
+        self.message_model.update(message_id, highlighted=False)
+    
+    def update_thumbnail(self, key: str, thumbnail_path: str):
+        for message_id in self._thumbnail_waiters.pop(key, []):
+            index = self.message_model.update(message_id, thumbnail_path=thumbnail_path)
+            if index.isValid():
+                self.message_delegate.sizeHintChanged.emit(index)
+
+    def clear_messages(self):
         
-        while layout.count():
-            item = layout.takeAt(0)
-            if item.widget():
-                item.widget().deleteLater()
-            elif item.layout():
-                self._clear_layout(item.layout())
+        self._thumbnail_waiters = {}
+        self._oldest_message_id = None
+        self._has_more_history = False
+        self._loading_history = False
+        self._keep_scroll_from_bottom = None
+        self._focus_message_id = None
+        self.message_model.reset([])
 
     def get_controller(self):
         return self.controller
@@ -341,7 +406,7 @@ class ChatArea(QFrame):
         
         self.controller.message_sent.connect(callback)
     
-    def add_preview_item(self, file_name: str, file_data_base64: str, is_image: bool):
+    def add_preview_item(self, file_name: str, file_path: str, is_image: bool):
         preview_item = QWidget()
         preview_item.setObjectName("PreviewItem")
         
@@ -350,24 +415,21 @@ class ChatArea(QFrame):
         item_layout.setSpacing(10)
         
         if is_image:
-            try:
-                image_data = base64.b64decode(file_data_base64)
-                pixmap = QPixmap()
-                pixmap.loadFromData(image_data)
-                
-                max_size = 60
-                if pixmap.width() > max_size or pixmap.height() > max_size:
-                    pixmap = pixmap.scaled(max_size, max_size, Qt.KeepAspectRatio, Qt.SmoothTransformation)
-                
-                image_label = QLabel()
-                image_label.setPixmap(pixmap)
-                image_label.setFixedSize(max_size, max_size)
-                image_label.setStyleSheet("border-radius: 4px;")
-                item_layout.addWidget(image_label)
-            except:
-                icon_label = QLabel("🖼️")
-                icon_label.setObjectName("FileIconLabel")
-                item_layout.addWidget(icon_label)
+            max_size = 60
+            image_label = QLabel("🖼️")
+            image_label.setObjectName("FileIconLabel")
+            image_label.setAlignment(Qt.AlignCenter)
+            image_label.setFixedSize(max_size, max_size)
+            image_label.setStyleSheet("border-radius: 4px;")
+            content_id = file_content_id(file_path)
+            if content_id:
+                pixmap = self.images.request(content_id, max_size, path=file_path)
+                if pixmap is not None:
+                    image_label.setPixmap(pixmap)
+                else:
+                    self._preview_waiters[image_key(content_id, max_size)] = file_name
+            self._preview_labels[file_name] = image_label
+            item_layout.addWidget(image_label)
         else:
             icon_label = QLabel("📄")
             icon_label.setObjectName("FileIconLabel")
@@ -384,7 +446,7 @@ class ChatArea(QFrame):
         remove_btn.clicked.connect(lambda: self.remove_preview_item(file_name))
         item_layout.addWidget(remove_btn)
         
-        self.preview_items[file_name] = (preview_item, file_data_base64, is_image)
+        self.preview_items[file_name] = (preview_item, file_path, is_image)
         self.preview_items_layout.addWidget(preview_item)
         self.preview_area.setVisible(True)
     
@@ -394,6 +456,7 @@ class ChatArea(QFrame):
             self.preview_items_layout.removeWidget(item_widget)
             item_widget.deleteLater()
             del self.preview_items[file_name]
+            self._preview_labels.pop(file_name, None)
             
             if len(self.preview_items) == 0:
                 self.preview_area.setVisible(False)
@@ -408,7 +471,6 @@ class ChatArea(QFrame):
     def scroll_to_bottom(self):
         if not hasattr(self, "message_area"):
             return
-        from PySide6.QtCore import QTimer
         scroll_bar = self.message_area.verticalScrollBar()
         QTimer.singleShot(0, lambda: scroll_bar.setValue(scroll_bar.maximum()))
     
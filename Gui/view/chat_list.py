@@ -1,12 +1,13 @@
 from PySide6.QtWidgets import (
     QFrame, QVBoxLayout, QHBoxLayout, QLabel, 
-    QPushButton, QLineEdit, QListWidget, QListWidgetItem
+    QPushButton, QLineEdit, QListWidget, QListWidgetItem, QListView,
+    QAbstractItemView
 )
-from PySide6.QtCore import QSize, Qt
+from PySide6.QtCore import QSize, Qt, QSortFilterProxyModel
 from PySide6.QtGui import QIcon, QAction
 import os
 
-from .chat_item import ChatItemWidget 
+from .conversation_list import ConversationListModel, ConversationDelegate
 from Gui.controller.chat_list_controller import ChatListController
 from ..utils.avatar import load_circular_pixmap
 
@@ -102,28 +103,57 @@ class ChatList(QFrame):
 
         layout.addWidget(self.search_input)
 
-        self.chat_list_widget = QListWidget()
+        self.search_results_label = QLabel("Messages")
+        self.search_results_label.setObjectName("SearchResultsHeader")
+        self.search_results_label.hide()
+        layout.addWidget(self.search_results_label)
+
+        self.search_results_widget = QListWidget()
+        self.search_results_widget.setObjectName("SearchResults")
+        self.search_results_widget.setWordWrap(True)
+        self.search_results_widget.hide()
+        layout.addWidget(self.search_results_widget, 1)
+
+        self.chat_model = ConversationListModel(self)
+        self.chat_filter_model = QSortFilterProxyModel(self)
+        self.chat_filter_model.setSourceModel(self.chat_model)
+        self.chat_filter_model.setFilterRole(ConversationListModel.FilterRole)
+        self.chat_filter_model.setFilterCaseSensitivity(Qt.CaseInsensitive)
+
+        self.chat_list_widget = QListView()
         self.chat_list_widget.setObjectName("ChatList")
+        self.chat_list_widget.setModel(self.chat_filter_model)
+        self.chat_list_widget.setItemDelegate(ConversationDelegate(self.chat_list_widget, self.chat_model))
         self.chat_list_widget.setSpacing(5)
+        self.chat_list_widget.setUniformItemSizes(True)
+        self.chat_list_widget.setMouseTracking(True)
+        self.chat_list_widget.setSelectionMode(QAbstractItemView.SingleSelection)
+        self.chat_list_widget.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.chat_list_widget.setVerticalScrollMode(QAbstractItemView.ScrollPerPixel)
+        self.chat_list_widget.setHorizontalScrollBarPolicy(Qt.ScrollBarAlwaysOff)
         self.chat_list_widget.setVerticalScrollBarPolicy(Qt.ScrollBarAsNeeded)
 
         layout.addWidget(self.chat_list_widget, 1)
         self.setLayout(layout)
 
-        self.controller = ChatListController(self.chat_list_widget)
+        self.controller = ChatListController(self.chat_list_widget, self.chat_model)
         self.controller.set_search_input(self.search_input)
+        self.controller.set_search_results_widget(self.search_results_widget)
         self.controller.set_tab_labels(self.tab_direct, self.tab_groups, self.tab_public)
 
     def add_chat(self, name, last_message, time_str, unread_count=0, selected=False, is_online=False, peer_id=None, avatar_path=None):
         
-        chat_item_widget = ChatItemWidget(name, last_message, time_str, unread_count, selected, avatar_path=avatar_path)
-        chat_item_widget.set_online_status(is_online)
-        if peer_id:
-            chat_item_widget.peer_id = peer_id
-        list_item = QListWidgetItem(self.chat_list_widget)
-        list_item.setSizeHint(chat_item_widget.sizeHint())
-        self.chat_list_widget.addItem(list_item)
-        self.chat_list_widget.setItemWidget(list_item, chat_item_widget)
+        self.chat_model.upsert({
+            'peer_id': peer_id or name,
+            'peer_name': name,
+            'last_message': last_message,
+            'time_str': time_str,
+            'unread_count': unread_count,
+            'is_online': is_online,
+            'avatar_path': avatar_path,
+        })
+        if selected:
+            self.controller.select_chat(peer_id or name)
 
     def populate_chat_list(self):
         
@@ -131,45 +161,45 @@ class ChatList(QFrame):
     
     def load_conversations(self, conversations: list):
         
-        self.controller.clear_selection()
-        self.chat_list_widget.clear()
-        self.controller.all_chat_items = []
-
+        self.chat_model.apply([self._conversation_row(conv) for conv in conversations])
+        self.controller.restore_selection()
+    
+    def apply_conversation_changes(self, conversations: list, removed_peer_ids: list):
+        
+        for peer_id in removed_peer_ids:
+            self.chat_model.remove(peer_id)
         for conv in conversations:
-            peer_name = conv.get('peer_name', 'Unknown')
-            last_message = conv.get('last_message', '')
-            time_str = conv.get('time_str', '')
-            unread_count = conv.get('unread_count', 0)
-            is_online = conv.get('is_online', False)
-            peer_id = conv.get('peer_id', '')
-            avatar_path = conv.get('avatar_path')
-
-            chat_item_widget = ChatItemWidget(
-                name=peer_name,
-                message=last_message,
-                time=time_str,
-                unread_count=unread_count,
-                is_active=False,
-                avatar_path=avatar_path
-            )
-            chat_item_widget.set_online_status(is_online)
-            chat_item_widget.peer_id = peer_id
-
-            list_item = QListWidgetItem(self.chat_list_widget)
-            list_item.setSizeHint(chat_item_widget.sizeHint())
-            self.chat_list_widget.addItem(list_item)
-            self.chat_list_widget.setItemWidget(list_item, chat_item_widget)
-
-        self.controller._cache_all_chat_items()
+            self.chat_model.place(self._conversation_row(conv))
+        self.controller.restore_selection()
+    
+    def _conversation_row(self, conv: dict) -> dict:
+        return {
+            'peer_id': conv.get('peer_id', ''),
+            'peer_name': conv.get('peer_name', 'Unknown'),
+            'last_message': conv.get('last_message', ''),
+            'last_message_time': conv.get('last_message_time', 0),
+            'time_str': conv.get('time_str', ''),
+            'unread_count': conv.get('unread_count', 0),
+            'is_online': conv.get('is_online', False),
+            'avatar_path': conv.get('avatar_path'),
+        }
+    
+    def show_search_results(self, results: list):
+        
+        self.search_results_widget.clear()
+        for result in results:
+            text = result.get('text', '').replace('\n', ' ')
+            list_item = QListWidgetItem(f"{result.get('peer_name', 'Unknown')} · {result.get('time_str', '')}\n{text}")
+            list_item.setData(Qt.UserRole, (result.get('peer_id'), result.get('peer_name'),
+                                            result.get('message_id'), result.get('timestamp')))
+            self.search_results_widget.addItem(list_item)
+        
+        visible = bool(results)
+        self.search_results_label.setVisible(visible)
+        self.search_results_widget.setVisible(visible)
     
     def update_peer_status(self, peer_id: str, is_online: bool):
-        for i in range(self.chat_list_widget.count()):
-            item = self.chat_list_widget.item(i)
-            if item:
-                widget = self.chat_list_widget.itemWidget(item)
-                if widget and hasattr(widget, 'peer_id') and widget.peer_id == peer_id:
-                    widget.set_online_status(is_online)
-                    break
+        self.chat_model.update(peer_id, is_online=is_online)
 
     def get_controller(self):
         return self.controller
@@ -185,3 +215,11 @@ class ChatList(QFrame):
     def connect_search_performed(self, callback):
         
         self.controller.search_performed.connect(callback)
+
+    def connect_message_search_requested(self, callback):
+        
+        self.controller.message_search_requested.connect(callback)
+
+    def connect_search_result_selected(self, callback):
+        
+        self.controller.search_result_selected.connect(callback)
@@ -0,0 +1,271 @@
+from typing import Dict, List, Optional
+
+from PySide6.QtCore import QAbstractListModel, QModelIndex, QRect, QSize, Qt
+from PySide6.QtGui import QColor, QFont, QFontMetrics, QPainter, QPen, QPixmap
+from PySide6.QtWidgets import QStyle, QStyledItemDelegate
+
+from ..utils.image_service import CIRCLE, image_service
+
+DEFAULT_AVATAR_PATH = "Gui/assets/images/avatar1.jpg"
+CARD_PADDING = 13
+CARD_RADIUS = 8
+AVATAR_SIZE = 40
+AVATAR_GAP = 10
+ONLINE_DOT_SIZE = 12
+TEXT_SPACING = 2
+BADGE_HEIGHT = 16
+BADGE_PADDING = 4
+ROW_HEIGHT = AVATAR_SIZE + CARD_PADDING * 2
+
+CARD_COLOR = QColor("#F1F3F5")
+CARD_HOVER_COLOR = QColor("#B8B8B8")
+CARD_ACTIVE_COLOR = QColor("#3D434A")
+NAME_COLOR = QColor("#333333")
+NAME_ACTIVE_COLOR = QColor("#FFFFFF")
+PREVIEW_COLOR = QColor("#777777")
+PREVIEW_ACTIVE_COLOR = QColor("#DDDDDD")
+TIME_COLOR = QColor("#999999")
+TIME_ACTIVE_COLOR = QColor("#BBBBBB")
+BADGE_COLOR = QColor("#6B47D9")
+ONLINE_COLOR = QColor("#4CAF50")
+AVATAR_PLACEHOLDER_COLOR = QColor("#DDDDDD")
+
+
+def _font(pixel_size, bold=False):
+    font = QFont()
+    font.setPixelSize(pixel_size)
+    font.setBold(bold)
+    return font
+
+
+class ConversationListModel(QAbstractListModel):
+    PeerIdRole = Qt.UserRole
+    FilterRole = Qt.UserRole + 1
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._rows: List[dict] = []
+        self._row_by_id: Dict[str, int] = {}
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._rows)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        row = self._rows[index.row()]
+        if role == Qt.DisplayRole:
+            return row.get("peer_name", "")
+        if role == self.PeerIdRole:
+            return row["peer_id"]
+        if role == self.FilterRole:
+            return f"{row.get('peer_name', '')}\n{row.get('last_message', '')}"
+        return None
+
+    def row_at(self, row: int) -> dict:
+        return self._rows[row]
+
+    def index_of(self, peer_id: str) -> QModelIndex:
+        row = self._row_by_id.get(peer_id)
+        return QModelIndex() if row is None else self.index(row, 0)
+
+    def reset(self, conversations: List[dict]):
+        self.beginResetModel()
+        self._rows = [dict(conversation) for conversation in conversations]
+        self._row_by_id = {}
+        self._reindex(0, len(self._rows))
+        self.endResetModel()
+
+    def apply(self, conversations: List[dict]):
+        if not self._rows:
+            self.reset(conversations)
+            return
+        wanted = {conversation["peer_id"] for conversation in conversations}
+        stale = [row for row, current in enumerate(self._rows) if current["peer_id"] not in wanted]
+        for row in reversed(stale):
+            self.beginRemoveRows(QModelIndex(), row, row)
+            del self._row_by_id[self._rows.pop(row)["peer_id"]]
+            self.endRemoveRows()
+        if stale:
+            self._reindex(stale[0], len(self._rows))
+
+        for position, conversation in enumerate(conversations):
+            current = self._row_by_id.get(conversation["peer_id"])
+            if current is None:
+                self._insert(position, conversation)
+                continue
+            if current != position:
+                self._move(current, position)
+            self._update_row(position, conversation)
+
+    def place(self, conversation: dict):
+        row = self._row_by_id.get(conversation["peer_id"])
+        position = self._sorted_position(conversation.get("last_message_time", 0), skip=row)
+        if row is None:
+            self._insert(position, conversation)
+            return
+        if row != position:
+            self._move(row, position)
+        self._update_row(position, conversation)
+
+    def remove(self, peer_id: str):
+        row = self._row_by_id.pop(peer_id, None)
+        if row is None:
+            return
+        self.beginRemoveRows(QModelIndex(), row, row)
+        del self._rows[row]
+        self._reindex(row, len(self._rows))
+        self.endRemoveRows()
+
+    def upsert(self, conversation: dict):
+        row = self._row_by_id.get(conversation["peer_id"])
+        if row is None:
+            self._insert(len(self._rows), conversation)
+        else:
+            self._update_row(row, conversation)
+
+    def update(self, peer_id: str, **changes) -> QModelIndex:
+        row = self._row_by_id.get(peer_id)
+        if row is None:
+            return QModelIndex()
+        self._update_row(row, changes)
+        return self.index(row, 0)
+
+    def _insert(self, position: int, conversation: dict):
+        self.beginInsertRows(QModelIndex(), position, position)
+        self._rows.insert(position, dict(conversation))
+        self._reindex(position, len(self._rows))
+        self.endInsertRows()
+
+    def _move(self, source: int, destination: int):
+        target = destination if destination < source else destination + 1
+        self.beginMoveRows(QModelIndex(), source, source, QModelIndex(), target)
+        self._rows.insert(destination, self._rows.pop(source))
+        self._reindex(min(source, destination), max(source, destination) + 1)
+        self.endMoveRows()
+
+    def _sorted_position(self, timestamp: float, skip: Optional[int] = None) -> int:
+        low, high = 0, len(self._rows) - (skip is not None)
+        while low < high:
+            middle = (low + high) // 2
+            row = self._rows[middle if skip is None or middle < skip else middle + 1]
+            if row.get("last_message_time", 0) > timestamp:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def _update_row(self, position: int, changes: dict):
+        row = self._rows[position]
+        changed = {key: value for key, value in changes.items() if row.get(key) != value}
+        if not changed:
+            return
+        row.update(changed)
+        index = self.index(position, 0)
+        self.dataChanged.emit(index, index)
+
+    def _reindex(self, start: int, end: int):
+        for position in range(start, end):
+            self._row_by_id[self._rows[position]["peer_id"]] = position
+
+
+class ConversationDelegate(QStyledItemDelegate):
+
+    def __init__(self, view, model: ConversationListModel):
+        super().__init__(view)
+        self.view = view
+        self.model = model
+        self.name_font = _font(14, bold=True)
+        self.preview_font = _font(13)
+        self.time_font = _font(11)
+        self.badge_font = _font(11, bold=True)
+        self.name_metrics = QFontMetrics(self.name_font)
+        self.preview_metrics = QFontMetrics(self.preview_font)
+        self.time_metrics = QFontMetrics(self.time_font)
+        self.badge_metrics = QFontMetrics(self.badge_font)
+        self.images = image_service()
+        self._awaiting_images = False
+        self.images.image_ready.connect(self._on_image_ready)
+
+    def _on_image_ready(self, key: str):
+        if self._awaiting_images:
+            self._awaiting_images = False
+            self.view.viewport().update()
+
+    def sizeHint(self, option, index):
+        return QSize(self.view.viewport().width(), ROW_HEIGHT)
+
+    def paint(self, painter, option, index):
+        source = self.view.model().mapToSource(index)
+        if not source.isValid():
+            return
+        row = self.model.row_at(source.row())
+        active = bool(option.state & QStyle.State_Selected)
+        hovered = bool(option.state & QStyle.State_MouseOver)
+        painter.save()
+        painter.setRenderHint(QPainter.Antialiasing)
+
+        card = option.rect
+        painter.setPen(Qt.NoPen)
+        painter.setBrush(CARD_ACTIVE_COLOR if active else CARD_HOVER_COLOR if hovered else CARD_COLOR)
+        painter.drawRoundedRect(card, CARD_RADIUS, CARD_RADIUS)
+
+        inner = card.adjusted(CARD_PADDING, CARD_PADDING, -CARD_PADDING, -CARD_PADDING)
+        avatar_rect = QRect(inner.left(), inner.top(), AVATAR_SIZE, AVATAR_SIZE)
+        avatar = self._avatar(row.get("avatar_path"))
+        if avatar is not None:
+            painter.drawPixmap(avatar_rect, avatar)
+        else:
+            painter.setBrush(AVATAR_PLACEHOLDER_COLOR)
+            painter.drawEllipse(avatar_rect)
+        if row.get("is_online"):
+            dot = QRect(avatar_rect.right() - ONLINE_DOT_SIZE + 1, avatar_rect.bottom() - ONLINE_DOT_SIZE + 1,
+                        ONLINE_DOT_SIZE, ONLINE_DOT_SIZE)
+            painter.setPen(QPen(QColor("#FFFFFF"), 2))
+            painter.setBrush(ONLINE_COLOR)
+            painter.drawEllipse(dot.adjusted(1, 1, -1, -1))
+
+        side_width = 0
+        time_str = row.get("time_str") or ""
+        if time_str:
+            side_width = self.time_metrics.horizontalAdvance(time_str)
+            painter.setFont(self.time_font)
+            painter.setPen(TIME_ACTIVE_COLOR if active else TIME_COLOR)
+            painter.drawText(QRect(inner.right() - side_width + 1, inner.top(), side_width, self.time_metrics.height()),
+                             Qt.AlignRight | Qt.AlignTop, time_str)
+
+        unread = row.get("unread_count") or 0
+        if unread > 0:
+            badge_text = str(unread)
+            badge_width = max(BADGE_HEIGHT, self.badge_metrics.horizontalAdvance(badge_text) + BADGE_PADDING * 2)
+            badge = QRect(inner.right() - badge_width + 1, inner.top() + self.time_metrics.height() + 5,
+                          badge_width, BADGE_HEIGHT)
+            painter.setPen(Qt.NoPen)
+            painter.setBrush(BADGE_COLOR)
+            painter.drawRoundedRect(badge, BADGE_HEIGHT / 2, BADGE_HEIGHT / 2)
+            painter.setFont(self.badge_font)
+            painter.setPen(QColor("#FFFFFF"))
+            painter.drawText(badge, Qt.AlignCenter, badge_text)
+            side_width = max(side_width, badge_width)
+
+        text_left = avatar_rect.right() + 1 + AVATAR_GAP
+        text_width = max(0, inner.right() + 1 - text_left - (side_width + AVATAR_GAP if side_width else 0))
+        name_height = self.name_metrics.height()
+        painter.setFont(self.name_font)
+        painter.setPen(NAME_ACTIVE_COLOR if active else NAME_COLOR)
+        painter.drawText(QRect(text_left, inner.top(), text_width, name_height), Qt.AlignLeft | Qt.AlignVCenter,
+                         self.name_metrics.elidedText(row.get("peer_name", ""), Qt.ElideRight, text_width))
+        preview = (row.get("last_message") or "").replace("\n", " ")
+        painter.setFont(self.preview_font)
+        painter.setPen(PREVIEW_ACTIVE_COLOR if active else PREVIEW_COLOR)
+        painter.drawText(QRect(text_left, inner.top() + name_height + TEXT_SPACING, text_width, self.preview_metrics.height()),
+                         Qt.AlignLeft | Qt.AlignVCenter,
+                         self.preview_metrics.elidedText(preview, Qt.ElideRight, text_width))
+        painter.restore()
+
+    def _avatar(self, avatar_path: Optional[str]) -> Optional[QPixmap]:
+        pixmap = self.images.request_file(avatar_path, AVATAR_SIZE, CIRCLE) if avatar_path else None
+        if pixmap is not None:
+            return pixmap
+        self._awaiting_images = True
+        return self.images.request_file(DEFAULT_AVATAR_PATH, AVATAR_SIZE, CIRCLE)
@@ -4,6 +4,7 @@ from PySide6.QtCore import Qt
 from .chat_list import ChatList
 from .chat_area import ChatArea
 from .notifications_panel import NotificationsPanel
+from ..utils.avatar import avatar_cache
 from ..controller.main_window_controller import MainWindowController
 
 
@@ -65,29 +66,39 @@ class MainWindow(QMainWindow):
 
     def _setup_controller_signals(self):
         self.controller.chat_list_updated.connect(self._on_chat_list_updated)
+        self.controller.conversations_changed.connect(self._on_conversations_changed)
+        self.controller.avatar_changed.connect(self._on_avatar_changed)
         self.controller.message_received.connect(self._on_message_received)
         self.controller.chat_selected.connect(self._on_chat_selected)
         self.controller.show_friend_request_dialog.connect(self._show_friend_request_dialog)
         self.controller.show_message_box.connect(self._show_message_box)
         self.controller.load_chat_history.connect(self._on_load_chat_history)
+        self.controller.older_history_loaded.connect(self._on_older_history_loaded)
+        self.controller.message_status_changed.connect(self._on_message_status_changed)
+        self.controller.thumbnail_ready.connect(self._on_thumbnail_ready)
+        self.controller.message_search_results.connect(self._on_message_search_results)
+        self.controller.message_focus_requested.connect(self._on_message_focus_requested)
 
     def _setup_component_signals(self):
         chat_list_controller = self.left_sidebar.get_controller()
         chat_list_controller.set_peer_refresh_handler(self.controller._update_peers_from_core)
         self.left_sidebar.connect_chat_selected(self.controller.on_chat_selected)
+        self.left_sidebar.connect_message_search_requested(self.controller.search_messages)
+        self.left_sidebar.connect_search_result_selected(self.controller.open_message)
 
         chat_area_controller = self.center_panel.get_controller()
         chat_area_controller.set_send_handler(self.controller.send_message)
         
-        def handle_file(file_path, file_name, file_data_base64, is_image):
-            self.controller.handle_file_attached(file_path, file_name, file_data_base64, is_image)
+        def handle_file(file_path, file_name, is_image):
+            self.controller.handle_file_attached(file_path, file_name, is_image)
         
         self.center_panel.connect_file_attached(handle_file)
         
-        self.controller.add_preview_callback = lambda name, data, is_img: self.center_panel.add_preview_item(name, data, is_img)
+        self.controller.add_preview_callback = lambda name, path, is_img: self.center_panel.add_preview_item(name, path, is_img)
         self.controller.clear_preview_callback = lambda: self.center_panel.clear_preview()
         
         self.center_panel.remove_friend_requested.connect(self.controller.remove_friend)
+        self.center_panel.older_messages_requested.connect(self.controller.load_older_messages)
         
         self.center_panel.voice_call_requested.connect(self.controller.start_voice_call)
         self.center_panel.video_call_requested.connect(self.controller.start_video_call)
@@ -99,6 +110,18 @@ class MainWindow(QMainWindow):
 
     def _on_chat_list_updated(self, conversations):
         self.left_sidebar.load_conversations(conversations)
+        self._refresh_current_peer_header()
+
+    def _on_conversations_changed(self, conversations, removed_peer_ids):
+        self.left_sidebar.apply_conversation_changes(conversations, removed_peer_ids)
+        current_peer_id = self.controller.current_peer_id
+        if any(conv.get('peer_id') == current_peer_id for conv in conversations):
+            self._refresh_current_peer_header()
+
+    def _on_avatar_changed(self, peer_id: str, old_avatar_path: str):
+        avatar_cache().invalidate(old_avatar_path)
+
+    def _refresh_current_peer_header(self):
         if self.controller.current_peer_id:
             peers = self.controller.peers
             peer_info = peers.get(self.controller.current_peer_id, {})
@@ -125,7 +148,6 @@ class MainWindow(QMainWindow):
         display_content = payload.get("display_content", payload.get("content", ""))
         time_str = payload.get("time_str", "")
         file_name = payload.get("file_name")
-        file_data = payload.get("file_data")
         local_file_path = payload.get("local_file_path")
         msg_type = payload.get("msg_type", "text")
         
@@ -135,11 +157,23 @@ class MainWindow(QMainWindow):
                 is_sender,
                 time_str=time_str,
                 file_name=file_name,
-                file_data=file_data,
                 msg_type=msg_type,
                 local_file_path=local_file_path,
+                message_id=payload.get("message_id"),
+                status=payload.get("status"),
+                thumbnail_path=payload.get("thumbnail_path"),
+                thumbnail_key=payload.get("thumbnail_key"),
+                date_str=payload.get("date_str"),
             )
 
+    def _on_message_status_changed(self, peer_id: str, message_id: str, status: str):
+        if peer_id == self.controller.current_peer_id and self.center_panel:
+            self.center_panel.update_message_status(message_id, status)
+
+    def _on_thumbnail_ready(self, key: str, thumbnail_path: str):
+        if self.center_panel:
+            self.center_panel.update_thumbnail(key, thumbnail_path)
+
     def _on_chat_selected(self, chat_id: str, chat_name: str):
         if chat_id and chat_name:
             peers = self.controller.peers
@@ -160,7 +194,7 @@ class MainWindow(QMainWindow):
         if peer_id == self.controller.current_peer_id:
             self.center_panel.set_peer_status(is_online)
 
-    def _on_load_chat_history(self, peer_id: str, history: list):
+    def _on_load_chat_history(self, peer_id: str, history: list, has_more: bool = False):
         if self.center_panel:
             if peer_id:
                 peers = self.controller.peers
@@ -174,7 +208,19 @@ class MainWindow(QMainWindow):
                     is_online=is_online,
                     avatar_path=avatar_path
                 )
-            self.center_panel.load_chat_history(history)
+            self.center_panel.load_chat_history(history, has_more)
+
+    def _on_older_history_loaded(self, peer_id: str, history: list, has_more: bool):
+        if self.center_panel and peer_id == self.controller.current_peer_id:
+            self.center_panel.prepend_chat_history(history, has_more)
+
+    def _on_message_search_results(self, query: str, results: list):
+        if query == self.controller.current_search and self.left_sidebar:
+            self.left_sidebar.show_search_results(results)
+
+    def _on_message_focus_requested(self, peer_id: str, message_id: str):
+        if self.center_panel and peer_id == self.controller.current_peer_id:
+            self.center_panel.highlight_message(message_id)
 
     def _show_friend_request_dialog(self, peer_id: str, display_name: str):
         if peer_id in self._active_request_dialogs:
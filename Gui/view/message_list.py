@@ -0,0 +1,387 @@
+import os
+from typing import Dict, List, Optional, Set
+
+from PySide6.QtCore import QAbstractListModel, QEvent, QModelIndex, QRect, QSize, Qt
+from PySide6.QtGui import QColor, QFont, QFontMetrics, QPainter, QPen, QPixmap
+from PySide6.QtWidgets import QStyledItemDelegate
+
+from ..utils.attachments import open_attachment, save_attachment
+from ..utils.avatar import file_content_id
+from ..utils.image_service import image_key, image_service
+
+ROW_PADDING_H = 15
+ROW_PADDING_V = 5
+AVATAR_SIZE = 36
+AVATAR_GAP = 10
+BUBBLE_MAX_WIDTH = 420
+TEXT_PADDING_H = 14
+TEXT_PADDING_V = 10
+BUBBLE_RADIUS = 16
+IMAGE_MAX_SIZE = 300
+IMAGE_PLACEHOLDER_SIZE = QSize(200, 150)
+FILE_BOX_WIDTH = 260
+FILE_BOX_PADDING = 12
+FILE_BUTTON_HEIGHT = 32
+DATE_PADDING = 10
+
+SELF_BUBBLE_COLOR = QColor("#6B47D9")
+OTHER_BUBBLE_COLOR = QColor("#F1F3F5")
+OTHER_TEXT_COLOR = QColor("#333333")
+MUTED_TEXT_COLOR = QColor("#999999")
+PLACEHOLDER_COLOR = QColor("#f0f2f5")
+FILE_BOX_COLOR = QColor("#f5f5f5")
+FILE_BORDER_COLOR = QColor("#e0e0e0")
+BUTTON_COLOR = QColor("#007AFF")
+HIGHLIGHT_COLOR = QColor("#F5A623")
+
+STATUS_LABELS = {
+    "pending": "Sending…",
+    "queued": "Waiting for peer",
+    "failed": "Not sent",
+}
+
+
+def _font(pixel_size, bold=False, weight=None):
+    font = QFont()
+    font.setPixelSize(pixel_size)
+    if bold:
+        font.setBold(True)
+    elif weight is not None:
+        font.setWeight(weight)
+    return font
+
+
+class MessageListModel(QAbstractListModel):
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._rows: List[dict] = []
+        self._first_seq = 0
+        self._seq_by_id: Dict[str, int] = {}
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._rows)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid() or role != Qt.DisplayRole:
+            return None
+        return self._rows[index.row()].get("text")
+
+    def row_at(self, row: int) -> dict:
+        return self._rows[row]
+
+    def first_row(self) -> Optional[dict]:
+        return self._rows[0] if self._rows else None
+
+    def last_row(self) -> Optional[dict]:
+        return self._rows[-1] if self._rows else None
+
+    def reset(self, rows: List[dict]):
+        self.beginResetModel()
+        self._rows = list(rows)
+        self._first_seq = 0
+        self._seq_by_id = {}
+        self._index_rows(0, self._rows)
+        self.endResetModel()
+
+    def append(self, row: dict):
+        position = len(self._rows)
+        self.beginInsertRows(QModelIndex(), position, position)
+        self._rows.append(row)
+        self._index_rows(position, [row])
+        self.endInsertRows()
+
+    def prepend(self, rows: List[dict]):
+        if not rows:
+            return
+        self.beginInsertRows(QModelIndex(), 0, len(rows) - 1)
+        self._rows[0:0] = rows
+        self._first_seq -= len(rows)
+        self._index_rows(0, rows)
+        self.endInsertRows()
+
+    def remove_first(self):
+        if not self._rows:
+            return
+        self.beginRemoveRows(QModelIndex(), 0, 0)
+        row = self._rows.pop(0)
+        self._first_seq += 1
+        if row.get("message_id"):
+            self._seq_by_id.pop(row["message_id"], None)
+        self.endRemoveRows()
+
+    def index_of(self, message_id: str) -> QModelIndex:
+        seq = self._seq_by_id.get(message_id)
+        if seq is None:
+            return QModelIndex()
+        return self.index(seq - self._first_seq, 0)
+
+    def update(self, message_id: str, **changes) -> QModelIndex:
+        index = self.index_of(message_id)
+        if not index.isValid():
+            return index
+        row = self._rows[index.row()]
+        row.update(changes)
+        row.pop("_layout", None)
+        self.dataChanged.emit(index, index)
+        return index
+
+    def _index_rows(self, position: int, rows: List[dict]):
+        for offset, row in enumerate(rows):
+            if row.get("message_id"):
+                self._seq_by_id[row["message_id"]] = self._first_seq + position + offset
+
+
+class MessageDelegate(QStyledItemDelegate):
+
+    def __init__(self, view, model: MessageListModel):
+        super().__init__(view)
+        self.view = view
+        self.model = model
+        self.avatar: Optional[QPixmap] = None
+        self.images = image_service()
+        self._image_waiters: Dict[str, Set[str]] = {}
+        self.images.image_ready.connect(self._on_image_ready)
+        self.text_font = _font(14)
+        self.time_font = _font(10)
+        self.date_font = _font(12, bold=True)
+        self.file_name_font = _font(13, weight=QFont.Medium)
+        self.file_type_font = _font(11)
+        self.file_icon_font = _font(24)
+        self.button_font = _font(12, weight=QFont.Medium)
+        self.text_metrics = QFontMetrics(self.text_font)
+        self.time_height = QFontMetrics(self.time_font).height() + 4
+        self.date_height = QFontMetrics(self.date_font).height() + DATE_PADDING * 2
+        self.file_name_metrics = QFontMetrics(self.file_name_font)
+        self.file_type_height = QFontMetrics(self.file_type_font).height()
+        self.file_icon_width = QFontMetrics(self.file_icon_font).horizontalAdvance("📄")
+        self.file_icon_height = QFontMetrics(self.file_icon_font).height()
+
+    def set_avatar(self, pixmap: QPixmap):
+        self.avatar = pixmap
+        self.view.viewport().update()
+
+    def _on_image_ready(self, key: str):
+        for message_id in self._image_waiters.pop(key, ()):
+            index = self.model.update(message_id)
+            if index.isValid():
+                self.sizeHintChanged.emit(index)
+
+    def sizeHint(self, option, index):
+        row = self.model.row_at(index.row())
+        width = self.view.viewport().width()
+        if row["kind"] == "date":
+            return QSize(width, self.date_height)
+        return QSize(width, self._geometry(row, width)["height"])
+
+    def paint(self, painter, option, index):
+        row = self.model.row_at(index.row())
+        painter.save()
+        painter.setRenderHint(QPainter.Antialiasing)
+        painter.setRenderHint(QPainter.SmoothPixmapTransform)
+        painter.translate(option.rect.topLeft())
+        width = option.rect.width()
+
+        if row["kind"] == "date":
+            painter.setFont(self.date_font)
+            painter.setPen(MUTED_TEXT_COLOR)
+            painter.drawText(QRect(0, 0, width, option.rect.height()), Qt.AlignCenter, row.get("text") or "")
+            painter.restore()
+            return
+
+        geometry = self._geometry(row, width)
+        is_sender = row.get("is_sender")
+        if not is_sender and self.avatar is not None:
+            painter.drawPixmap(ROW_PADDING_H, ROW_PADDING_V, self.avatar)
+
+        msg_type = row.get("msg_type")
+        if msg_type == "image" and self._has_attachment(row):
+            self._paint_image(painter, row, geometry["image"])
+        elif msg_type == "file" and self._has_attachment(row):
+            self._paint_file(painter, row, geometry)
+        else:
+            self._paint_text(painter, row, geometry["bubble"], geometry["text"])
+
+        if geometry.get("caption") is not None:
+            painter.setFont(self.text_font)
+            painter.setPen(OTHER_TEXT_COLOR)
+            painter.drawText(geometry["caption"], Qt.TextWordWrap, row.get("text") or "")
+
+        if row.get("highlighted"):
+            painter.setBrush(Qt.NoBrush)
+            painter.setPen(QPen(HIGHLIGHT_COLOR, 2))
+            painter.drawRoundedRect(geometry["content"].adjusted(1, 1, -1, -1), BUBBLE_RADIUS, BUBBLE_RADIUS)
+
+        if geometry.get("time") is not None:
+            painter.setFont(self.time_font)
+            painter.setPen(MUTED_TEXT_COLOR)
+            align = Qt.AlignRight if is_sender else Qt.AlignLeft
+            painter.drawText(geometry["time"], align | Qt.AlignVCenter, self._time_text(row))
+        painter.restore()
+
+    def editorEvent(self, event, model, option, index):
+        if event.type() != QEvent.MouseButtonRelease or event.button() != Qt.LeftButton:
+            return False
+        row = self.model.row_at(index.row())
+        if row["kind"] != "message" or not self._has_attachment(row):
+            return False
+        geometry = self._geometry(row, option.rect.width())
+        pos = event.position().toPoint() - option.rect.topLeft()
+        file_name = row.get("file_name") or "file"
+        if geometry.get("button") is not None and geometry["button"].contains(pos):
+            save_attachment(file_name, row.get("local_file_path"))
+            return True
+        if geometry["content"].contains(pos):
+            open_attachment(file_name, row.get("local_file_path"))
+            return True
+        return False
+
+    def _geometry(self, row: dict, width: int) -> dict:
+        cached = row.get("_layout")
+        if cached and cached[0] == width:
+            return cached[1]
+
+        is_sender = row.get("is_sender")
+        indent = 0 if is_sender else AVATAR_SIZE + AVATAR_GAP
+        available = max(min(BUBBLE_MAX_WIDTH, width - ROW_PADDING_H * 2 - indent), 80)
+        msg_type = row.get("msg_type")
+        text = row.get("text") or ""
+        geometry = {}
+
+        if msg_type == "image" and self._has_attachment(row):
+            size = self._image_size(row, available)
+            content_width, content_height = size.width(), size.height()
+            below = 0
+        elif msg_type == "file" and self._has_attachment(row):
+            content_width = min(FILE_BOX_WIDTH, available)
+            name_width = max(content_width - FILE_BOX_PADDING * 2 - self.file_icon_width - 10, 40)
+            name_height = self.file_name_metrics.boundingRect(
+                QRect(0, 0, name_width, 100000), Qt.TextWordWrap, row.get("file_name") or "").height()
+            info_height = max(name_height + 2 + self.file_type_height, self.file_icon_height)
+            content_height = FILE_BOX_PADDING * 2 + info_height + 6 + FILE_BUTTON_HEIGHT
+            geometry["info_height"] = info_height
+            geometry["name_height"] = name_height
+            caption = self.text_metrics.boundingRect(QRect(0, 0, available, 100000), Qt.TextWordWrap, text) if text else None
+            below = caption.height() + 2 if caption else 0
+        else:
+            text_rect = self.text_metrics.boundingRect(
+                QRect(0, 0, available - TEXT_PADDING_H * 2, 100000), Qt.TextWordWrap, text)
+            content_width = text_rect.width() + TEXT_PADDING_H * 2
+            content_height = text_rect.height() + TEXT_PADDING_V * 2
+            below = 0
+
+        x = width - ROW_PADDING_H - content_width if is_sender else ROW_PADDING_H + indent
+        y = ROW_PADDING_V
+        content = QRect(x, y, content_width, content_height)
+        geometry["content"] = content
+        if msg_type == "image" and self._has_attachment(row):
+            geometry["image"] = content
+        elif msg_type == "file" and self._has_attachment(row):
+            geometry["button"] = QRect(x + FILE_BOX_PADDING, y + content_height - FILE_BOX_PADDING - FILE_BUTTON_HEIGHT,
+                                       content_width - FILE_BOX_PADDING * 2, FILE_BUTTON_HEIGHT)
+            if below:
+                geometry["caption"] = QRect(x, y + content_height + 2, caption.width(), caption.height())
+        else:
+            geometry["bubble"] = content
+            geometry["text"] = QRect(x + TEXT_PADDING_H, y + TEXT_PADDING_V, text_rect.width(), text_rect.height())
+        y += content_height + below
+
+        if row.get("time_str"):
+            time_x = width - ROW_PADDING_H - available if is_sender else ROW_PADDING_H + indent
+            geometry["time"] = QRect(time_x, y + 2, available, self.time_height)
+            y += self.time_height + 2
+        geometry["height"] = max(y, 0 if is_sender else AVATAR_SIZE) + ROW_PADDING_V
+        row["_layout"] = (width, geometry)
+        return geometry
+
+    def _paint_text(self, painter, row, bubble: QRect, text_rect: QRect):
+        is_sender = row.get("is_sender")
+        painter.setPen(Qt.NoPen)
+        painter.setBrush(SELF_BUBBLE_COLOR if is_sender else OTHER_BUBBLE_COLOR)
+        painter.drawRoundedRect(bubble, BUBBLE_RADIUS, BUBBLE_RADIUS)
+        painter.setFont(self.text_font)
+        painter.setPen(Qt.white if is_sender else OTHER_TEXT_COLOR)
+        painter.drawText(text_rect, Qt.TextWordWrap, row.get("text") or "")
+
+    def _paint_image(self, painter, row, rect: QRect):
+        pixmap = self._preview_pixmap(row)
+        if pixmap is None:
+            painter.setPen(Qt.NoPen)
+            painter.setBrush(PLACEHOLDER_COLOR)
+            painter.drawRoundedRect(rect, 12, 12)
+            painter.setFont(self.file_type_font)
+            painter.setPen(MUTED_TEXT_COLOR)
+            painter.drawText(rect, Qt.AlignCenter, "Loading image…")
+            return
+        painter.drawPixmap(rect, pixmap)
+
+    def _paint_file(self, painter, row, geometry: dict):
+        box = geometry["content"]
+        painter.setPen(QPen(FILE_BORDER_COLOR, 1))
+        painter.setBrush(FILE_BOX_COLOR)
+        painter.drawRoundedRect(box.adjusted(0, 0, -1, -1), 8, 8)
+
+        left = box.left() + FILE_BOX_PADDING
+        top = box.top() + FILE_BOX_PADDING
+        painter.setFont(self.file_icon_font)
+        painter.setPen(OTHER_TEXT_COLOR)
+        icon_width = self.file_icon_width
+        painter.drawText(QRect(left, top, icon_width, geometry["info_height"]), Qt.AlignVCenter, "📄")
+
+        info_left = left + icon_width + 10
+        info_width = box.right() - FILE_BOX_PADDING - info_left
+        file_name = row.get("file_name") or ""
+        painter.setFont(self.file_name_font)
+        painter.drawText(QRect(info_left, top, info_width, geometry["name_height"]), Qt.TextWordWrap, file_name)
+
+        extension = os.path.splitext(file_name)[1].upper()[1:] or "FILE"
+        painter.setFont(self.file_type_font)
+        painter.setPen(MUTED_TEXT_COLOR)
+        type_top = top + geometry["name_height"] + 2
+        painter.drawText(QRect(info_left, type_top, info_width, self.file_type_height),
+                         Qt.AlignLeft, f"{extension} File")
+
+        button = geometry["button"]
+        painter.setPen(Qt.NoPen)
+        painter.setBrush(BUTTON_COLOR)
+        painter.drawRoundedRect(button, 6, 6)
+        painter.setFont(self.button_font)
+        painter.setPen(Qt.white)
+        painter.drawText(button, Qt.AlignCenter, "Download")
+
+    def _image_size(self, row: dict, available: int) -> QSize:
+        pixmap = self._preview_pixmap(row)
+        size = pixmap.size() if pixmap is not None else QSize(IMAGE_PLACEHOLDER_SIZE)
+        limit = min(IMAGE_MAX_SIZE, available)
+        if size.width() > limit or size.height() > limit:
+            size = size.scaled(limit, limit, Qt.KeepAspectRatio)
+        return size
+
+    def _preview_pixmap(self, row: dict) -> Optional[QPixmap]:
+        thumbnail_path = row.get("thumbnail_path")
+        file_id = file_content_id(row["local_file_path"]) if row.get("local_file_path") else None
+        if thumbnail_path:
+            key = image_key(thumbnail_path, IMAGE_MAX_SIZE)
+            pixmap = self.images.request(thumbnail_path, IMAGE_MAX_SIZE)
+            if pixmap is not None:
+                return pixmap
+            if not self.images.failed(key):
+                self._wait_for_image(row, key)
+                return self.images.get(image_key(file_id, IMAGE_MAX_SIZE)) if file_id else None
+        if not file_id:
+            return None
+        pixmap = self.images.request(file_id, IMAGE_MAX_SIZE, path=row["local_file_path"])
+        if pixmap is None:
+            self._wait_for_image(row, image_key(file_id, IMAGE_MAX_SIZE))
+        return pixmap
+
+    def _wait_for_image(self, row: dict, key: str):
+        if row.get("message_id"):
+            self._image_waiters.setdefault(key, set()).add(row["message_id"])
+
+    def _has_attachment(self, row: dict) -> bool:
+        return bool(row.get("file_name")) and bool(row.get("local_file_path"))
+
+    def _time_text(self, row: dict) -> str:
+        label = STATUS_LABELS.get(row.get("status"))
+        return f"{row['time_str']} · {label}" if label else row["time_str"]
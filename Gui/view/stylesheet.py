@@ -128,37 +128,36 @@ QLineEdit#SearchBar {
 }
 
 /* Danh sách chat */
-QListWidget#ChatList {
+QListView#ChatList {
     border: none;
     outline: none;
     background-color: transparent;
 }
-QListWidget::item:focus, QListWidget::item:selected {
+
+/* Kết quả tìm kiếm tin nhắn */
+QLabel#SearchResultsHeader {
+    color: #999;
+    font-size: 12px;
+    font-weight: bold;
+    padding: 4px 5px 0px 5px;
+}
+QListWidget#SearchResults {
     border: none;
     outline: none;
     background-color: transparent;
+    font-size: 13px;
 }
-
-/* =========================================== */
-/* === MỤC CHAT (ChatItemWidget) === */
-/* =========================================== */
-
-QFrame#ChatItemWidget {
-    background-color: #F1F3F5; /* Màu xám nhạt */
-    padding: 8px;
-    border-radius: 8px;
+QListWidget#SearchResults::item {
+    padding: 6px 5px;
+    border-bottom: 1px solid #EEEEEE;
 }
-/* Style cho item khi được CHỌN */
-QFrame#ChatItemWidgetActive {
-    background-color: #3D434A; /* Màu nền tối khi active */
-    padding: 8px;
-    border-radius: 8px;
-    background-color: parent;
+QListWidget#SearchResults::item:hover {
+    background-color: #F1F3F5;
 }
 
-QFrame#ChatItemWidget:hover {
-    background-color: #B8B8B8; /* Màu xám siêu nhạt */
-}
+/* =========================================== */
+/* === NHÃN DÙNG CHUNG (mục chat được vẽ bởi ConversationDelegate) === */
+/* =========================================== */
 
 /* Avatar (ảnh đại diện) */
 QLabel#AvatarLabel {
@@ -169,24 +168,6 @@ QLabel#AvatarLabel {
     max-height: 40px;
 }
 
-/* Avatar container với online indicator */
-QFrame#AvatarContainer {
-    background-color: transparent;
-    min-width: 40px;
-    max-width: 40px;
-}
-
-/* Online indicator (dấu chấm đỏ) */
-QLabel#OnlineIndicator {
-    background-color: #4CAF50; /* Màu xanh lá (online) */
-    border-radius: 6px; /* Tròn */
-    border: 2px solid #FFFFFF; /* Viền trắng */
-    min-width: 12px;
-    max-width: 12px;
-    min-height: 12px;
-    max-height: 12px;
-}
-
 /* Tên người dùng */
 QLabel#NameLabel {
     font-size: 14px;
@@ -194,9 +175,6 @@ QLabel#NameLabel {
     color: #333;
     background-color: transparent;
 }
-QFrame#ChatItemWidgetActive QLabel#NameLabel {
-    color: #FFFFFF !important;
-}
 
 /* Tin nhắn cuối */
 QLabel#MessageLabel {
@@ -204,34 +182,7 @@ QLabel#MessageLabel {
     color: #777;
     background-color: transparent;
 }
-QFrame#ChatItemWidgetActive QLabel#MessageLabel {
-    color: #DDD !important;
-}
 
-/* Thời gian */
-QLabel#TimeLabel {
-    font-size: 11px;
-    color: #999;
-    background-color: transparent;
-}
-QFrame#ChatItemWidgetActive QLabel#TimeLabel {
-    color: #BBB !important;
-    background-color: transparent;
-}
-
-/* Số tin nhắn chưa đọc */
-QLabel#UnreadCountLabel {
-    background-color: #6B47D9; /* Màu tím */
-    color: white;
-    font-size: 11px;
-    font-weight: bold;
-    border-radius: 8px; /* (16px / 2) */
-    min-width: 16px;
-    max-width: 25px;
-    min-height: 16px;
-    max-height: 16px;
-    padding: 0 4px;
-}
 /* =========================================== */
 /* === CỘT Ở GIỮA (ChatArea) === */
 /* =========================================== */
@@ -259,54 +210,11 @@ QPushButton#IconButton:hover {
     border-radius: 4px;
 }
 
-QLabel#ChatAvatarLabel {
-    background-color: transparent;
-    min-width: 36px;
-    max-width: 36px;
-    min-height: 36px;
-    max-height: 36px;
-}
-
-/* Khu vực cuộn tin nhắn */
-QScrollArea#MessageArea {
+/* Khu vực tin nhắn (bong bóng chat được vẽ bởi MessageDelegate) */
+QListView#MessageArea {
     border: none;
     background-color: #F8F9FA; /* Nền xám nhạt cho khu vực chat */
 }
-QWidget#MessageContent {
-    background-color: transparent;
-    padding: 15px;
-}
-
-/* Dấu phân cách ngày tháng */
-QLabel#DateSeparator {
-    color: #999;
-    font-size: 12px;
-    font-weight: bold;
-    padding: 10px;
-    qproperty-alignment: 'AlignCenter';
-}
-
-/* =========================================== */
-/* === BONG BÓNG CHAT (MessageBubble) === */
-/* =========================================== */
-QLabel.MessageBubble {
-    font-size: 14px;
-    padding: 10px 14px;
-    max-width: 450px; /* Giới hạn chiều rộng */
-    qproperty-wordWrap: true; 
-}
-/* Tin nhắn của mình (bên phải): Bo 4px ở góc dưới phải */
-QLabel#MessageBubbleSelf {
-    background-color: #6B47D9;
-    color: white;
-    border-radius: 18px 18px 4px 18px;
-}
-/* Tin nhắn của người khác (bên trái): Bo 4px ở góc dưới trái */
-QLabel#MessageBubbleOther {
-    background-color: #F1F3F5;
-    color: #333;
-    border-radius: 18px 18px 18px 4px;
-}
 
 /* Khung nhập tin nhắn */
 QFrame#ChatInputBar {
@@ -474,61 +382,18 @@ QPushButton#PreviewRemoveButton:hover {
 }
 
 /* =========================================== */
-/* === MESSAGE BUBBLE FILE WIDGETS === */
+/* === FILE PREVIEW WIDGETS === */
 /* =========================================== */
-QLabel#MessageImageLabel {
-    background-color: transparent;
-    border: none;
-    border-radius: 12px;
-    padding: 0px;
-}
-
-QWidget#FileContainer {
-    background-color: #f5f5f5;
-    border: 1px solid #e0e0e0;
-    border-radius: 8px;
-    padding: 0px;
-}
-
 QLabel#FileNameLabel {
     font-size: 13px;
     font-weight: 500;
     color: #333;
 }
 
-QLabel#FileTypeLabel {
-    font-size: 11px;
-    color: #999;
-}
-
 QLabel#FileIconLabel {
     font-size: 24px;
 }
 
-QPushButton#FileDownloadButton {
-    background-color: #007AFF;
-    color: white;
-    border: none;
-    border-radius: 6px;
-    padding: 6px 16px;
-    font-size: 12px;
-    font-weight: 500;
-}
-
-QPushButton#FileDownloadButton:hover {
-    background-color: #0051D5;
-}
-
-QPushButton#FileDownloadButton:pressed {
-    background-color: #0040B3;
-}
-
-QLabel#FileErrorLabel {
-    font-size: 12px;
-    color: #666;
-    padding: 5px;
-}
-
 /* =========================================== */
 /* === CALL WINDOW STYLES === */
 /* =========================================== */
@@ -746,18 +611,4 @@ QLabel#FormLabel {
     color: #555;
 }
 
-/* =========================================== */
-/* === MESSAGE TIMESTAMP === */
-/* =========================================== */
-QLabel#MessageTimestamp {
-    font-size: 10px;
-    color: #999;
-    padding: 2px 5px;
-}
-
-QLabel#FileTextLabel {
-    background-color: transparent;
-    padding: 0px;
-}
-
 """
\ No newline at end of file
@@ -1,4 +1,3 @@
-import json
 import os
 import re
 import uuid
@@ -6,6 +5,8 @@ import hashlib
 from dataclasses import dataclass, asdict
 from typing import Dict, Optional, Tuple
 
+from Core.storage.data_manager import DataManager
+
 DATA_DIR = "data"
 
 def _hash_password(password: str) -> str:
@@ -64,28 +65,24 @@ class UserManager:
             folder = os.path.join(DATA_DIR, entry)
             if not os.path.isdir(folder):
                 continue
-            profile_path = os.path.join(folder, "profile.json")
-            if not os.path.exists(profile_path):
-                continue
             try:
-                with open(profile_path, "r", encoding="utf-8") as f:
-                    data = json.load(f)
+                data = DataManager.read_user_profile(entry)
+                if not data:
+                    continue
                 user = User.from_dict(data)
                 if user.username:
                     lookup_key = user.username.lower()
                     self.users[lookup_key] = user
             except Exception as e:
-                print(f"[UserManager] Failed to load {profile_path}: {e}")
+                print(f"[UserManager] Failed to load profile of {folder}: {e}")
 
     def _save_user(self, user: User, folder_name: Optional[str] = None):
         
         if folder_name is None:
             folder_name = user.get_folder_name()
-        folder = os.path.join(DATA_DIR, folder_name)
-        os.makedirs(folder, exist_ok=True)
-        profile_path = os.path.join(folder, "profile.json")
-        with open(profile_path, "w", encoding="utf-8") as f:
-            json.dump(user.to_dict(), f, ensure_ascii=False, indent=2)
+        profile = DataManager.read_user_profile(folder_name)
+        profile.update(user.to_dict())
+        DataManager.write_user_profile(folder_name, profile)
 
     def register(
         self,
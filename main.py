@@ -79,24 +79,19 @@ class ChatApplication:
     def show_main_window(self):
         if not self.current_user:
             return
-        import json
-        import os
         from app.user_manager import _normalize_username
+        from Core.storage.data_manager import DataManager
 
         folder_name = _normalize_username(self.current_user.username)
-        profile_path = os.path.join("data", folder_name, "profile.json")
 
         tcp_port = None
-        if os.path.exists(profile_path):
-            try:
-                with open(profile_path, "r", encoding="utf-8") as f:
-                    profile = json.load(f)
-                    saved_port = profile.get("tcp_port")
-                    if saved_port and isinstance(saved_port, int) and saved_port > 0:
-                        tcp_port = saved_port
-                        print(f"[Main] Loaded TCP port {tcp_port} from profile.json")
-            except Exception as e:
-                print(f"[Main] Failed to load TCP port from profile: {e}")
+        try:
+            saved_port = DataManager.read_user_profile(folder_name).get("tcp_port")
+            if saved_port and isinstance(saved_port, int) and saved_port > 0:
+                tcp_port = saved_port
+                print(f"[Main] Loaded TCP port {tcp_port} from profile")
+        except Exception as e:
+            print(f"[Main] Failed to load TCP port from profile: {e}")
         
         if tcp_port is None:
             tcp_port = self._allocate_tcp_port()
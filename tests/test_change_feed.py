@@ -0,0 +1,75 @@
+import threading
+
+from Core.models.change import CONVERSATION_UPDATED, PEER_ADDED, PEER_STATUS, ChangeFeed
+
+
+def versions(changes):
+    return [change.version for change in changes]
+
+
+def test_empty_feed():
+    feed = ChangeFeed(size=4)
+    assert feed.version == 0
+    assert feed.since(0) == (0, [])
+
+
+def test_since_returns_changes_after_version():
+    feed = ChangeFeed(size=8)
+    feed.publish(PEER_ADDED, "a", {"name": "A"})
+    feed.publish(PEER_STATUS, "a", {"status": "online"})
+    feed.publish(CONVERSATION_UPDATED, "b")
+    version, changes = feed.since(1)
+    assert version == 3
+    assert versions(changes) == [2, 3]
+    assert (changes[0].kind, changes[0].peer_id, changes[0].data) == (PEER_STATUS, "a", {"status": "online"})
+    assert changes[1].data == {}
+
+
+def test_since_current_or_future_version_is_empty():
+    feed = ChangeFeed(size=4)
+    feed.publish(PEER_ADDED, "a")
+    assert feed.since(1) == (1, [])
+    assert feed.since(7) == (1, [])
+
+
+def test_reader_at_oldest_retained_change_gets_everything_kept():
+    feed = ChangeFeed(size=3)
+    for n in range(5):
+        feed.publish(PEER_STATUS, f"p{n}")
+    version, changes = feed.since(2)
+    assert version == 5
+    assert versions(changes) == [3, 4, 5]
+
+
+def test_reader_behind_the_window_must_reload():
+    feed = ChangeFeed(size=3)
+    for n in range(5):
+        feed.publish(PEER_STATUS, f"p{n}")
+    assert feed.since(1) == (5, None)
+    assert feed.since(0) == (5, None)
+
+
+def test_publish_notifies_once_until_read():
+    feed = ChangeFeed(size=4)
+    assert feed.publish(PEER_STATUS, "a")
+    assert not feed.publish(PEER_STATUS, "b")
+    feed.since(0)
+    assert feed.publish(PEER_STATUS, "c")
+    assert not feed.publish(PEER_STATUS, "d")
+
+
+def test_concurrent_publishers_get_unique_versions():
+    feed = ChangeFeed(size=10000)
+
+    def publish():
+        for _ in range(500):
+            feed.publish(PEER_STATUS, "a")
+
+    threads = [threading.Thread(target=publish) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    version, changes = feed.since(0)
+    assert version == 4000
+    assert versions(changes) == list(range(1, 4001))
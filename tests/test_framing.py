@@ -0,0 +1,127 @@
+import os
+
+import pytest
+
+from Core.networking.framing import (
+    EVENT_FRAME,
+    EVENT_LINE,
+    EVENT_NEGOTIATE,
+    FRAME_FILE_CHUNK,
+    FRAME_JSON,
+    MODE_FRAMES,
+    MODE_LINES,
+    MODE_SNIFF,
+    PREAMBLE,
+    FramingError,
+    WireDecoder,
+    encode_frame,
+    frame_header,
+)
+
+
+def feed(decoder, data, step=None):
+    events = []
+    pos = 0
+    while pos < len(data):
+        window = decoder.writable()
+        count = min(len(window), len(data) - pos, step or len(data))
+        window[:count] = data[pos:pos + count]
+        decoder.commit(count)
+        pos += count
+        for event in decoder.events():
+            events.append(tuple(bytes(part) if isinstance(part, memoryview) else part for part in event))
+    return events
+
+
+def test_preamble_switches_to_frames():
+    decoder = WireDecoder(capacity=256)
+    events = feed(decoder, PREAMBLE + encode_frame(FRAME_JSON, b'{"a": 1}'))
+    assert events == [(EVENT_NEGOTIATE,), (EVENT_FRAME, FRAME_JSON, b'{"a": 1}')]
+    assert decoder.mode == MODE_FRAMES
+
+
+def test_plain_json_switches_to_lines():
+    decoder = WireDecoder(capacity=256)
+    events = feed(decoder, b'{"a": 1}\n{"b": 2}\n')
+    assert events == [(EVENT_LINE, b'{"a": 1}'), (EVENT_LINE, b'{"b": 2}')]
+    assert decoder.mode == MODE_LINES
+
+
+def test_partial_preamble_waits_for_more_bytes():
+    decoder = WireDecoder(capacity=256)
+    assert feed(decoder, PREAMBLE[:3]) == []
+    assert decoder.mode == MODE_SNIFF
+    assert feed(decoder, PREAMBLE[3:]) == [(EVENT_NEGOTIATE,)]
+    assert decoder.mode == MODE_FRAMES
+
+
+def test_preamble_prefix_followed_by_other_bytes_is_a_line():
+    decoder = WireDecoder(capacity=256)
+    events = feed(decoder, PREAMBLE[:2] + b"xyz\n")
+    assert events == [(EVENT_LINE, PREAMBLE[:2] + b"xyz")]
+    assert decoder.mode == MODE_LINES
+
+
+def test_frames_fed_one_byte_at_a_time():
+    decoder = WireDecoder(capacity=64)
+    payloads = [b"", b"x", os.urandom(40), b"y" * 57]
+    data = PREAMBLE + b"".join(encode_frame(FRAME_JSON, payload) for payload in payloads)
+    events = feed(decoder, data, step=1)
+    assert events[0] == (EVENT_NEGOTIATE,)
+    assert [event[2] for event in events[1:]] == payloads
+
+
+def test_split_header_and_body():
+    decoder = WireDecoder(capacity=256)
+    frame = encode_frame(FRAME_FILE_CHUNK, b"abcdef")
+    assert feed(decoder, PREAMBLE + frame[:3]) == [(EVENT_NEGOTIATE,)]
+    assert feed(decoder, frame[3:7]) == []
+    assert feed(decoder, frame[7:]) == [(EVENT_FRAME, FRAME_FILE_CHUNK, b"abcdef")]
+
+
+def test_lines_split_inside_multibyte_character():
+    decoder = WireDecoder(capacity=256)
+    line = "chia tách ư".encode("utf-8")
+    cut = line.index("ư".encode("utf-8")) + 1
+    assert feed(decoder, line[:cut]) == []
+    assert feed(decoder, line[cut:] + b"\n") == [(EVENT_LINE, line)]
+
+
+def test_many_frames_through_small_buffer():
+    decoder = WireDecoder(capacity=32)
+    payloads = [os.urandom(n % 25) for n in range(200)]
+    data = PREAMBLE + b"".join(encode_frame(FRAME_JSON, payload) for payload in payloads)
+    events = feed(decoder, data, step=13)
+    assert [event[2] for event in events[1:]] == payloads
+
+
+def test_large_frame_is_reassembled():
+    decoder = WireDecoder(capacity=64, max_frame_size=1 << 20)
+    payload = os.urandom(300000)
+    data = PREAMBLE + encode_frame(FRAME_JSON, b"a") + encode_frame(FRAME_FILE_CHUNK, payload) + encode_frame(FRAME_JSON, b"b")
+    events = feed(decoder, data, step=1000)
+    assert events[1:] == [
+        (EVENT_FRAME, FRAME_JSON, b"a"),
+        (EVENT_FRAME, FRAME_FILE_CHUNK, payload),
+        (EVENT_FRAME, FRAME_JSON, b"b"),
+    ]
+
+
+def test_large_frame_buffer_grows_with_received_data():
+    decoder = WireDecoder(capacity=64, max_frame_size=1 << 20)
+    feed(decoder, PREAMBLE + frame_header(FRAME_JSON, 1 << 20) + b"z" * 10)
+    assert len(decoder.writable()) + 10 <= 64
+    feed(decoder, b"z" * 1000)
+    assert len(decoder.writable()) + 1010 < 4096
+
+
+def test_frame_over_limit_is_rejected():
+    decoder = WireDecoder(capacity=64, max_frame_size=1000)
+    with pytest.raises(FramingError):
+        feed(decoder, PREAMBLE + frame_header(FRAME_JSON, 1001))
+
+
+def test_line_over_limit_is_rejected():
+    decoder = WireDecoder(capacity=64, max_frame_size=256)
+    with pytest.raises(FramingError):
+        feed(decoder, b"x" * 1000)
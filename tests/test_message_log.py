@@ -0,0 +1,141 @@
+import json
+
+import pytest
+
+from Core.storage.message_log import MessageLog, read_log_records
+
+
+def record(n):
+    return {"message_id": f"m{n}", "timestamp": 1000.0 + n, "content": f"tin nhắn {n}"}
+
+
+def make_log(tmp_path, interval=4):
+    return MessageLog(tmp_path / "messages.jsonl", tmp_path / "messages.idx",
+                      legacy_path=tmp_path / "messages.json", index_interval=interval, fsync_interval=3600)
+
+
+@pytest.fixture
+def filled(tmp_path):
+    log = make_log(tmp_path)
+    for n in range(10):
+        log.append(record(n))
+    log.close()
+    return tmp_path
+
+
+def ids(records):
+    return [r["message_id"] for r in records]
+
+
+def test_index_has_one_entry_per_block(filled):
+    index = json.loads((filled / "messages.idx").read_text())
+    assert index["count"] == 10
+    assert len(index["offsets"]) == 3
+    assert index["timestamps"] == [1000.0, 1004.0, 1008.0]
+    with (filled / "messages.jsonl").open("rb") as f:
+        for offset, n in zip(index["offsets"], (0, 4, 8)):
+            f.seek(offset)
+            assert json.loads(f.readline())["message_id"] == f"m{n}"
+
+
+def test_read_before_pages_backwards(filled):
+    log = make_log(filled)
+    page, start = log.read_before(None, 3)
+    assert ids(page) == ["m7", "m8", "m9"] and start == 7
+    page, start = log.read_before(start, 5)
+    assert ids(page) == ["m2", "m3", "m4", "m5", "m6"] and start == 2
+    page, start = log.read_before(start, 5)
+    assert ids(page) == ["m0", "m1"] and start == 0
+    assert log.read_before(0, 5) == ([], 0)
+
+
+def test_find_position_scans_blocks(filled):
+    log = make_log(filled)
+    assert [log.find_position(f"m{n}") for n in (0, 3, 4, 9)] == [0, 3, 4, 9]
+    assert log.find_position("missing") is None
+
+
+def test_find_position_by_time(filled):
+    log = make_log(filled)
+    assert log.find_position_by_time(0) == 0
+    assert log.find_position_by_time(1000.0) == 0
+    assert log.find_position_by_time(1004.0) == 4
+    assert log.find_position_by_time(1005.5) == 6
+    assert log.find_position_by_time(1009.0) == 9
+    assert log.find_position_by_time(5000.0) == 10
+
+
+def test_find_position_by_time_on_block_boundary_with_equal_timestamps(tmp_path):
+    log = make_log(tmp_path)
+    for n in range(8):
+        log.append({"message_id": f"m{n}", "timestamp": 1000.0 if n < 6 else 2000.0})
+    assert log.find_position_by_time(1000.0) == 0
+    assert log.find_position_by_time(1500.0) == 6
+
+
+def test_repair_tail_drops_incomplete_record(filled):
+    with (filled / "messages.jsonl").open("ab") as f:
+        f.write(b'{"message_id": "m10", "timest')
+    log = make_log(filled)
+    assert len(log) == 10
+    assert (filled / "messages.jsonl").read_bytes().endswith(b"\n")
+    log.append(record(10))
+    assert ids(log.read_tail(2)) == ["m9", "m10"]
+
+
+def test_repair_tail_of_single_partial_record(tmp_path):
+    (tmp_path / "messages.jsonl").write_bytes(b'{"message_id": "m0"')
+    log = make_log(tmp_path)
+    assert len(log) == 0
+    assert (tmp_path / "messages.jsonl").read_bytes() == b""
+
+
+def test_index_catches_up_with_records_appended_after_save(filled):
+    with (filled / "messages.jsonl").open("ab") as f:
+        for n in (10, 11):
+            f.write((json.dumps(record(n)) + "\n").encode("utf-8"))
+    log = make_log(filled)
+    assert len(log) == 12
+    assert log.find_position("m11") == 11
+    assert ids(log.read_tail(3)) == ["m9", "m10", "m11"]
+
+
+def test_index_is_rebuilt_when_unusable(filled):
+    (filled / "messages.idx").write_text("{not json")
+    log = make_log(filled)
+    assert len(log) == 10
+    assert ids(log.read_before(5, 2)[0]) == ["m3", "m4"]
+
+
+def test_index_is_rebuilt_for_other_interval(filled):
+    log = make_log(filled, interval=3)
+    assert len(log) == 10
+    assert log.find_position("m7") == 7
+    log.close()
+    assert json.loads((filled / "messages.idx").read_text())["interval"] == 3
+
+
+def test_legacy_json_is_converted(tmp_path):
+    (tmp_path / "messages.json").write_text(json.dumps([record(n) for n in range(5)]), encoding="utf-8")
+    log = make_log(tmp_path)
+    assert ids(log.read_all()) == [f"m{n}" for n in range(5)]
+    assert not (tmp_path / "messages.json").exists()
+    assert (tmp_path / "messages.json.migrated").exists()
+    assert ids(read_log_records(tmp_path / "messages.jsonl")) == [f"m{n}" for n in range(5)]
+
+
+def test_rewrite_updates_records_and_index(filled):
+    log = make_log(filled)
+
+    def drop_content(r):
+        if int(r["message_id"][1:]) % 2:
+            return None
+        return dict(r, content="x")
+
+    assert log.rewrite(drop_content) == 5
+    records = log.read_all()
+    assert [r["content"] for r in records[:2]] == ["x", "tin nhắn 1"]
+    assert log.find_position("m8") == 8
+    assert log.find_position_by_time(1006.0) == 6
+    log.append(record(10))
+    assert ids(log.read_tail(2)) == ["m9", "m10"]
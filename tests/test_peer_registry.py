@@ -0,0 +1,135 @@
+import threading
+
+from Core.storage.peer_registry import PeerRegistry
+
+
+class Store:
+
+    def __init__(self, peers=None, failures=0):
+        self.peers = dict(peers or {})
+        self.loads = 0
+        self.calls = []
+        self.failures = failures
+        self.saved = threading.Event()
+
+    def load(self):
+        self.loads += 1
+        return {peer_id: dict(data) for peer_id, data in self.peers.items()}
+
+    def persist(self, snapshot, dirty, deleted):
+        if self.failures:
+            self.failures -= 1
+            raise OSError("disk full")
+        self.calls.append((set(dirty), set(deleted)))
+        self.peers = snapshot
+        self.saved.set()
+
+
+def registry(store, delay=60.0):
+    return PeerRegistry(store.load, store.persist, delay=delay)
+
+
+def test_loads_lazily_once():
+    store = Store({"a": {"name": "A"}})
+    peers = registry(store)
+    assert store.loads == 0
+    assert peers.get_all() == {"a": {"name": "A"}}
+    peers.put("b", {"name": "B"})
+    assert store.loads == 1
+
+
+def test_get_all_returns_copies():
+    store = Store({"a": {"name": "A"}})
+    peers = registry(store)
+    peers.get_all()["a"]["name"] = "changed"
+    assert peers.get_all() == {"a": {"name": "A"}}
+
+
+def test_unchanged_put_is_not_written():
+    store = Store({"a": {"name": "A"}})
+    peers = registry(store)
+    assert not peers.put("a", {"name": "A"})
+    peers.flush()
+    assert store.calls == []
+
+
+def test_changes_are_batched_until_flush():
+    store = Store()
+    peers = registry(store)
+    for n in range(50):
+        peers.put("a", {"n": n})
+        peers.put(f"p{n}", {"n": n})
+    assert store.calls == []
+    peers.flush()
+    assert len(store.calls) == 1
+    assert store.calls[0][0] == {"a"} | {f"p{n}" for n in range(50)}
+    assert store.peers["a"] == {"n": 49}
+    peers.flush()
+    assert len(store.calls) == 1
+
+
+def test_timer_writes_behind():
+    store = Store()
+    peers = registry(store, delay=0.05)
+    peers.put("a", {"name": "A"})
+    peers.put("b", {"name": "B"})
+    assert store.saved.wait(2.0)
+    assert store.calls == [({"a", "b"}, set())]
+    peers.close()
+
+
+def test_delete_and_readd_track_sets():
+    store = Store({"a": {"name": "A"}, "b": {"name": "B"}})
+    peers = registry(store)
+    peers.put("c", {"name": "C"})
+    peers.delete("c")
+    peers.delete("a")
+    peers.delete("b")
+    peers.put("b", {"name": "B2"})
+    assert not peers.delete("missing")
+    peers.flush()
+    assert store.calls == [({"b"}, {"a", "c"})]
+    assert store.peers == {"b": {"name": "B2"}}
+
+
+def test_replace_all_marks_dropped_peers_deleted():
+    store = Store({"a": {}, "b": {}})
+    peers = registry(store)
+    peers.replace_all({"b": {"x": 1}, "c": {}})
+    peers.flush()
+    assert store.calls == [({"b", "c"}, {"a"})]
+
+
+def test_failed_save_is_retried_with_later_changes():
+    store = Store(failures=1)
+    peers = registry(store)
+    peers.put("a", {"name": "A"})
+    peers.flush()
+    assert store.calls == []
+    assert peers._timer is not None
+    peers.put("b", {"name": "B"})
+    peers.close()
+    assert store.calls == [({"a", "b"}, set())]
+
+
+def test_failed_save_does_not_resurrect_deleted_peer():
+    store = Store({"a": {"name": "A"}}, failures=1)
+    peers = registry(store)
+    peers.put("a", {"name": "A2"})
+    peers.flush()
+    peers.delete("a")
+    peers.flush()
+    assert store.calls == [(set(), {"a"})]
+    assert store.peers == {}
+
+
+def test_close_flushes_and_stops_scheduling():
+    store = Store()
+    peers = registry(store)
+    peers.put("a", {"name": "A"})
+    peers.close()
+    assert store.calls == [({"a"}, set())]
+    peers.put("b", {"name": "B"})
+    assert peers._timer is None
+    peers.flush()
+    assert store.calls[-1] == ({"b"}, set())
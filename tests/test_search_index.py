@@ -0,0 +1,128 @@
+import json
+import unicodedata
+
+import pytest
+
+from Core.models.message import Message
+from Core.storage.search_index import SearchIndex, fold_text, tokenize
+
+
+def message(message_id, text, timestamp=1000.0, msg_type="text", file_name=None):
+    return Message(message_id=message_id, sender_id="a", sender_name="A", receiver_id="b",
+                   content=json.dumps({"text": text}, ensure_ascii=False), timestamp=timestamp,
+                   msg_type=msg_type, file_name=file_name)
+
+
+@pytest.fixture
+def index(tmp_path):
+    index = SearchIndex(tmp_path / "search_index.jsonl")
+    index.build([])
+    yield index
+    index.close()
+
+
+def ids(results):
+    return [result["message_id"] for result in results]
+
+
+def test_fold_text_strips_vietnamese_marks():
+    assert fold_text("Đường phố Hà Nội") == "duong pho ha noi"
+    assert fold_text("tiếng Việt ở đây") == "tieng viet o day"
+    assert fold_text("ĐẶNG ĐỨC") == "dang duc"
+
+
+def test_fold_text_handles_composed_and_decomposed_input():
+    composed = unicodedata.normalize("NFC", "nguyễn")
+    decomposed = unicodedata.normalize("NFD", "nguyễn")
+    assert fold_text(composed) == fold_text(decomposed) == "nguyen"
+
+
+def test_tokenize_splits_on_punctuation_and_caps_length():
+    assert tokenize("Xin chào, thế giới! 2024") == ["xin", "chao", "the", "gioi", "2024"]
+    assert tokenize("a" * 100) == ["a" * 32]
+
+
+def test_accent_insensitive_match(index):
+    index.add("p1", [message("m1", "Chúng ta đi Đà Lạt nhé")])
+    assert ids(index.search("da lat")) == ["m1"]
+    assert ids(index.search("ĐÀ LẠT")) == ["m1"]
+
+
+def test_all_query_words_must_match(index):
+    index.add("p1", [message("m1", "họp nhóm sáng mai"), message("m2", "họp lớp chiều nay")])
+    assert ids(index.search("họp sáng")) == ["m1"]
+    assert index.search("họp tối") == []
+
+
+def test_prefix_matches_last_word(index):
+    index.add("p1", [message("m1", "hẹn gặp lại"), message("m2", "hello")])
+    assert set(ids(index.search("he"))) == {"m1", "m2"}
+    assert ids(index.search("hel")) == ["m2"]
+
+
+def test_exact_word_ranks_above_prefix(index):
+    index.add("p1", [message("m1", "anh ấy", 2000.0), message("m2", "an toàn", 1000.0)])
+    results = index.search("an")
+    assert ids(results) == ["m2", "m1"]
+    assert results[0]["score"] > results[1]["score"]
+
+
+def test_rare_word_outweighs_common_word(index):
+    common = [message(f"c{n}", "cơm", 1000.0 + n) for n in range(20)]
+    index.add("p1", common + [message("rare", "phở", 900.0), message("both", "cơm phở", 800.0)])
+    results = index.search("cơm phở")
+    assert ids(results) == ["both"]
+    assert index.search("phở")[0]["score"] > index.search("cơm")[0]["score"]
+
+
+def test_equal_scores_return_newest_first(index):
+    index.add("p1", [message(f"m{n}", "xin chào", 1000.0 + n) for n in range(5)])
+    assert ids(index.search("chào", limit=3)) == ["m4", "m3", "m2"]
+
+
+def test_peer_filter(index):
+    index.add("p1", [message("m1", "cà phê sáng")])
+    index.add("p2", [message("m2", "cà phê chiều")])
+    assert ids(index.search("ca phe", peer_id="p2")) == ["m2"]
+    assert index.search("ca phe", peer_id="p3") == []
+
+
+def test_file_name_is_searchable(index):
+    index.add("p1", [message("m1", "", msg_type="file", file_name="báo_cáo quý.pdf")])
+    assert ids(index.search("bao")) == ["m1"]
+
+
+def test_non_text_messages_are_skipped(index):
+    index.add("p1", [message("m1", "cuộc gọi video", msg_type="call")])
+    assert index.search("goi") == []
+
+
+def test_remove_peer(index):
+    index.add("p1", [message("m1", "giữ lại")])
+    index.add("p2", [message("m2", "giữ lại")])
+    index.search("giu")
+    index.remove_peer("p1")
+    assert ids(index.search("giu")) == ["m2"]
+
+
+def test_index_survives_reopen(tmp_path, index):
+    index.add("p1", [message("m1", "Sài Gòn mưa")])
+    index.close()
+    reopened = SearchIndex(tmp_path / "search_index.jsonl")
+    assert not reopened.needs_rebuild
+    assert ids(reopened.search("sai gon")) == ["m1"]
+
+
+def test_new_index_needs_build_and_keeps_adds_made_while_building(tmp_path):
+    index = SearchIndex(tmp_path / "search_index.jsonl")
+    assert index.needs_rebuild
+    index.add("p1", [message("m0", "bị bỏ qua")])
+
+    def source():
+        yield "p1", message("m1", "tin cũ", 1000.0)
+        index.add("p1", [message("m2", "tin mới", 2000.0)])
+
+    index.build(source())
+    assert not index.needs_rebuild
+    assert ids(index.search("tin")) == ["m2", "m1"]
+    assert index.search("bo qua") == []